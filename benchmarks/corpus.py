@@ -0,0 +1,92 @@
+"""
+Synthetic but realistic inputs for the AIService micro-benchmarks
+
+Utterances are assembled from the phrasings people actually use with the
+voice box (fillers, several tasks in one breath, relative and absolute
+dates, durations, urgency), seeded so every run sees the same corpus.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+OPENERS = [
+    "", "", "I need to ", "I have to ", "don't forget to ", "remember to ", "also ", "please ",
+    "can you ", "I should ", "I gotta ", "maybe I ", "and ", "I think I "
+]
+ACTIONS = [
+    "buy groceries", "call mom", "finish the quarterly report", "pick up dry cleaning", "book a dentist appointment",
+    "email the landlord about the leak", "review Sarah's pull request", "pay the electricity bill", "go for a run",
+    "prepare slides for the team meeting", "schedule a meeting with John", "renew my passport", "water the plants",
+    "study for the chemistry exam", "clean the garage", "submit the expense report", "walk the dog",
+    "read two chapters of the novel", "fix the bike tire", "plan the birthday party", "do laundry",
+    "write the project proposal", "cancel the gym membership", "order printer ink", "meditate"
+]
+WHEN = [
+    "", "", "", " tomorrow", " today", " tonight", " next week", " next month", " this weekend", " this friday",
+    " next monday", " by friday", " due wednesday", " on july 30", " on the 3rd of june", " on dec 12th",
+    " in 3 days", " in 10 days", " at 5 pm", " at 9:30 am", " tomorrow morning", " this afternoon"
+]
+DURATION = ["", "", "", " for 30 minutes", " for 2 hours", " for 45 min", " for 1 hr", " for 15 minutes"]
+URGENCY = ["", "", "", "", " asap", " it's urgent", " it's important", " immediately"]
+JOINERS = [" and ", ", ", " then ", " also "]
+TIMEZONES = ["America/New_York", "Europe/London", "Asia/Tokyo", "America/Los_Angeles"]
+
+
+def _task(rng: random.Random) -> str:
+    return rng.choice(OPENERS) + rng.choice(ACTIONS) + rng.choice(WHEN) + rng.choice(DURATION) + rng.choice(URGENCY)
+
+
+def _context(rng: random.Random) -> Optional[str]:
+    """The local-time block the frontend sends, on most requests, sometimes with earlier conversation"""
+    if rng.random() < 0.25:
+        return None
+    local = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+    context = (
+        "LOCAL TIME INFORMATION:\n"
+        f"Local Date/Time: {local.strftime('%B %d, %Y at %I:%M:%S %p')}\n"
+        f"Timezone: {rng.choice(TIMEZONES)}\n"
+    )
+    if rng.random() < 0.4:
+        context += f"\nPrevious request: {_task(rng)}\nAssistant: Created 1 task\n"
+    return context
+
+
+def voice_corpus(size: int = 3000, seed: int = 46) -> List[Tuple[str, Optional[str]]]:
+    """(voice_text, context) pairs; about a third say more than one task"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        tasks = [_task(rng) for _ in range(rng.choice([1, 1, 1, 2, 2, 3]))]
+        text = tasks[0]
+        for task in tasks[1:]:
+            text += rng.choice(JOINERS) + task
+        corpus.append((text[0].upper() + text[1:] if rng.random() < 0.5 else text, _context(rng)))
+    return corpus
+
+
+def model_replies(size: int = 3000, seed: int = 46) -> List[str]:
+    """Raw Ollama replies: JSON wrapped in chatter or code fences, with a few broken ones"""
+    rng = random.Random(seed)
+    replies = []
+    for _ in range(size):
+        payload = json.dumps({
+            "tasks": [
+                {"title": rng.choice(ACTIONS).title(), "priority": rng.randint(1, 5),
+                 "estimated_duration": rng.choice([None, 15, 30, 60]), "due_date": None, "tags": ["voice"]}
+                for _ in range(rng.randint(1, 4))
+            ],
+            "confidence": round(rng.random(), 2),
+            "parsing_notes": "Parsed from the user's request",
+        }, indent=rng.choice([None, 2, 4]))
+        shape = rng.random()
+        if shape < 0.4:
+            replies.append(payload)
+        elif shape < 0.7:
+            replies.append(f"Sure! Here is the JSON you asked for:\n{payload}\nLet me know if you need anything else.")
+        elif shape < 0.95:
+            replies.append(f"```json\n{payload}\n```")
+        else:
+            replies.append(payload[: len(payload) // 2])  # cut off mid-stream
+    return replies
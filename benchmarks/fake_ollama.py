@@ -0,0 +1,116 @@
+"""
+Fake Ollama server for benchmarks
+
+Answers /api/generate and /api/embed the way the app expects, with knobs for
+upstream latency, jitter, error rate and streamed replies, so the app can be
+load-tested without a model. Run standalone with:
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.8 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+VOICE_REPLY = {
+    "tasks": [{"title": "Buy groceries", "priority": 2, "estimated_duration": 30, "tags": ["errands"]}],
+    "confidence": 0.9,
+    "parsing_notes": "fake",
+    "conversation_analysis": "fake"
+}
+SCHEDULE_REPLY = {"optimized_schedule": [], "schedule_insights": "fake", "ai_confidence": 0.8}
+EMPTY_REPLY = {"tasks": [], "suggestions": []}
+
+
+def _reply_for(prompt: str) -> dict:
+    if "voice input" in prompt.lower():
+        return VOICE_REPLY
+    if "optimized_schedule" in prompt:
+        return SCHEDULE_REPLY
+    return EMPTY_REPLY
+
+
+def create_app(latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+               stream_chunks: int = 8, embedding_dim: int = 256) -> FastAPI:
+    """A fake Ollama; each call waits latency ± jitter seconds and fails with a 500 at error_rate"""
+    app = FastAPI()
+    app.state.calls = 0
+
+    async def upstream_delay():
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, random.uniform(latency - jitter, latency + jitter)))
+        return random.random() < error_rate
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        failed = await upstream_delay()
+        if failed:
+            return JSONResponse({"error": "fake upstream failure"}, status_code=500)
+        text = "Here is the JSON: " + json.dumps(_reply_for(body.get("prompt", "")))
+        usage = {"prompt_eval_count": len(body.get("prompt", "")) // 4, "eval_count": len(text) // 4}
+        if not body.get("stream", True):
+            return {"model": body.get("model"), "response": text, "done": True, **usage}
+
+        # Ollama streams newline-delimited JSON chunks and reports usage on the last one
+        async def chunks():
+            size = max(1, len(text) // stream_chunks)
+            for start in range(0, len(text), size):
+                yield json.dumps({"model": body.get("model"), "response": text[start:start + size], "done": False}) + "\n"
+                await asyncio.sleep(latency / stream_chunks)
+            yield json.dumps({"model": body.get("model"), "response": "", "done": True, **usage}) + "\n"
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        failed = await upstream_delay()
+        if failed:
+            return JSONResponse({"error": "fake upstream failure"}, status_code=500)
+        texts = body.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        # Deterministic per text, so duplicate detection behaves like it would with a real model
+        embeddings = [[random.Random(text).uniform(-1, 1) for _ in range(embedding_dim)] for text in texts]
+        return {"model": body.get("model"), "embeddings": embeddings, "prompt_eval_count": sum(len(t) // 4 for t in texts)}
+
+    return app
+
+
+def serve(port: int, **knobs) -> str:
+    """Start a fake Ollama on 127.0.0.1:port (0 for any free port) in a daemon thread and return its base URL"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(**knobs), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Fake Ollama did not start on port {port}")
+        time.sleep(0.05)
+    # Port 0 lets the OS pick a free one
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load tests")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per generate/embed call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform ± seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with a 500")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="chunks per streamed reply")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(args.latency, args.jitter, args.error_rate, args.stream_chunks),
+        host="127.0.0.1", port=args.port, log_level="warning"
+    )
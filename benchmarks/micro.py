@@ -0,0 +1,166 @@
+"""
+Micro-benchmarks for AIService's pure-Python text processing
+
+Times the helpers that run on every voice request or fallback over a seeded
+corpus (benchmarks/corpus.py), measures per-call memory with tracemalloc and,
+with --profile, shows where the time goes with cProfile. Results are appended
+to a JSON-lines history; --check fails when a helper got slower than the last
+comparable run by more than --threshold.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --profile --no-record
+    python -m benchmarks.micro --check --threshold 0.2
+"""
+
+import argparse
+import cProfile
+import gc
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.corpus import model_replies, voice_corpus
+from benchmarks.run import BACKEND, ROOT, git_revision, previous_results
+
+sys.path.insert(0, BACKEND)
+from app.services.ai_service import AIService  # noqa: E402
+
+Case = Tuple[str, Callable[..., Any], Sequence[tuple]]
+
+
+def cases(size: int) -> List[Case]:
+    """(name, function, argument tuples) for every benchmarked helper"""
+    service = AIService()
+    voice = voice_corpus(size)
+    replies = model_replies(size)
+
+    def extract_json(reply):
+        try:
+            return service._extract_json(reply)
+        except ValueError:
+            return None
+
+    return [
+        ("create_concise_title", service._create_concise_title, [(text,) for text, _ in voice]),
+        ("extract_date_from_text", service._extract_date_from_text, voice),
+        ("fallback_voice_parsing_with_context", service._fallback_voice_parsing_with_context, voice),
+        ("extract_json", extract_json, [(reply,) for reply in replies]),
+    ]
+
+
+def _one_pass(function: Callable[..., Any], arguments: Sequence[tuple]) -> float:
+    started = time.perf_counter()
+    for args in arguments:
+        function(*args)
+    return time.perf_counter() - started
+
+
+def time_case(function: Callable[..., Any], arguments: Sequence[tuple], repeat: int) -> Dict[str, float]:
+    """Microseconds per call over `repeat` passes of the corpus (after one warm-up pass)"""
+    _one_pass(function, arguments)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # like timeit, keep collector pauses out of the timings
+    try:
+        passes = [_one_pass(function, arguments) / len(arguments) * 1e6 for _ in range(repeat)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min_us": round(min(passes), 3),
+        "mean_us": round(statistics.mean(passes), 3),
+        "stdev_us": round(statistics.stdev(passes), 3) if len(passes) > 1 else 0.0,
+    }
+
+
+def allocations(function: Callable[..., Any], arguments: Sequence[tuple]) -> Dict[str, float]:
+    """Peak bytes allocated during a call (mean and max over the corpus)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for args in arguments:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_mean_bytes": round(statistics.mean(peaks)), "alloc_max_bytes": max(peaks)}
+
+
+def profile(function: Callable[..., Any], arguments: Sequence[tuple], limit: int = 12) -> str:
+    """cProfile of one pass, sorted by own time"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _one_pass(function, arguments)
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("tottime").print_stats(limit)
+    return out.getvalue()
+
+
+def comparable(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return all(a.get(key) == b.get(key) for key in ("benchmark", "corpus_size", "python"))
+
+
+def regressions(results: List[Dict[str, Any]], history: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Helpers whose best time per call is more than `threshold` (0.25 = 25%) worse than the last comparable run"""
+    slower = []
+    for result in results:
+        baseline = next((old for old in reversed(history) if comparable(old, result)), None)
+        if baseline and result["min_us"] > baseline["min_us"] * (1 + threshold):
+            slower.append(f"{result['benchmark']}: {baseline['min_us']}us ({baseline['commit']}) -> {result['min_us']}us")
+    return slower
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="AIService text-processing micro-benchmarks")
+    parser.add_argument("--size", type=int, default=3000, help="utterances and model replies in the corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over the corpus")
+    parser.add_argument("--only", nargs="+", default=None, help="benchmark names to run")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile breakdown per helper")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression against the history")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "micro_results.jsonl"))
+    parser.add_argument("--no-record", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'benchmark':<38}{'min us':>10}{'mean us':>10}{'stdev':>8}{'alloc B':>10}{'max B':>10}")
+    for name, function, arguments in cases(args.size):
+        if args.only and name not in args.only:
+            continue
+        result = {"benchmark": name, "corpus_size": args.size, "python": platform.python_version()}
+        result.update(time_case(function, arguments, args.repeat))
+        result.update(allocations(function, arguments))
+        results.append(result)
+        print(
+            f"{name:<38}{result['min_us']:>10}{result['mean_us']:>10}{result['stdev_us']:>8}"
+            f"{result['alloc_mean_bytes']:>10}{result['alloc_max_bytes']:>10}"
+        )
+        if args.profile:
+            print(profile(function, arguments))
+
+    history = previous_results(args.output)
+    slower = regressions(results, history, args.threshold)
+    for line in slower:
+        print(f"REGRESSION {line}")
+
+    if not args.no_record:
+        revision = git_revision()
+        recorded_at = datetime.now(timezone.utc).isoformat()
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps({**revision, "recorded_at": recorded_at, **result}) + "\n")
+    return 1 if args.check and slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+LifeSync load-testing and benchmark suite
+
+Runs the FastAPI app in-process over httpx's ASGITransport (no server, no
+sockets) against a throwaway SQLite database or a local Postgres, with a fake
+Ollama standing in for the model. Each scenario reports throughput and
+p50/p95/p99 latency, and results are appended to a JSON-lines file keyed by
+git commit so runs can be compared across commits.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios voice_burst --concurrency 32 --ollama-latency 0.8
+    python -m benchmarks.run --database-url postgresql://lifesync:pw@localhost/lifesync_bench
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_ollama import serve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "lifesync_ai_backend")
+PASSWORD = "benchmark-password"
+
+Request = Callable[[httpx.AsyncClient, "BenchContext", int], Awaitable[httpx.Response]]
+SCENARIOS: Dict[str, Dict[str, Any]] = {}
+
+
+def scenario(name: str, requests: int):
+    """Register a scenario: an async function sending request number i"""
+    def register(function: Request) -> Request:
+        SCENARIOS[name] = {"run": function, "requests": requests}
+        return function
+    return register
+
+
+class BenchContext:
+    """Users (and their tokens) shared by every scenario of a run"""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.users: List[Dict[str, str]] = []
+
+    def user(self, i: int) -> Dict[str, str]:
+        return self.users[i % len(self.users)]
+
+
+@scenario("login_storm", 40)
+async def login_storm(client: httpx.AsyncClient, ctx: BenchContext, i: int) -> httpx.Response:
+    return await client.post("/api/v1/auth/login", data={"username": ctx.user(i)["email"], "password": PASSWORD})
+
+
+@scenario("task_list_polling", 500)
+async def task_list_polling(client: httpx.AsyncClient, ctx: BenchContext, i: int) -> httpx.Response:
+    return await client.get("/api/v1/tasks/", headers=ctx.user(i)["headers"])
+
+
+@scenario("voice_burst", 100)
+async def voice_burst(client: httpx.AsyncClient, ctx: BenchContext, i: int) -> httpx.Response:
+    return await client.post(
+        "/api/v1/tasks/voice", json={"voice_text": f"buy groceries and call the bank {i}"}, headers=ctx.user(i)["headers"]
+    )
+
+
+@scenario("schedule_optimization", 100)
+async def schedule_optimization(client: httpx.AsyncClient, ctx: BenchContext, i: int) -> httpx.Response:
+    return await client.get("/api/v1/tasks/optimize/schedule", headers=ctx.user(i)["headers"])
+
+
+async def setup(client: httpx.AsyncClient, ctx: BenchContext, users: int, tasks_per_user: int) -> None:
+    """Register users, log them in and give each some open tasks to list and schedule"""
+    for n in range(users):
+        email = f"bench-{ctx.run_id}-{n}@example.com"
+        response = await client.post("/api/v1/auth/register", json={
+            "email": email, "username": f"bench-{ctx.run_id}-{n}", "password": PASSWORD, "full_name": f"Bench {n}"
+        })
+        response.raise_for_status()
+        response = await client.post("/api/v1/auth/login", data={"username": email, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        ctx.users.append({"email": email, "headers": headers})
+        for t in range(tasks_per_user):
+            response = await client.post("/api/v1/tasks/", json={
+                "title": f"Benchmark task {t}", "priority": t % 5 + 1, "estimated_duration": 15 + (t % 4) * 15
+            }, headers=headers)
+            response.raise_for_status()
+
+
+def summarize(name: str, latencies: List[float], errors: int, wall_seconds: float, concurrency: int) -> Dict[str, Any]:
+    """Throughput and latency percentiles (milliseconds) for one scenario run"""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(wall_seconds, 3),
+        "rps": round(len(latencies) / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: BenchContext, name: str, total: int, concurrency: int) -> Dict[str, Any]:
+    """Send `total` requests from `concurrency` concurrent clients and time each one"""
+    send = SCENARIOS[name]["run"]
+    numbers = iter(range(total))
+    latencies: List[float] = []
+    errors = 0
+
+    async def client_loop():
+        nonlocal errors
+        for i in numbers:
+            started = time.perf_counter()
+            try:
+                response = await send(client, ctx, i)
+                failed = response.status_code >= 400
+            except Exception as e:
+                print(f"{name} request error: {e}")
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - started, concurrency)
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def previous_results(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def comparable(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    keys = ("scenario", "concurrency", "users", "tasks_per_user", "database", "ollama_latency", "ollama_error_rate")
+    return all(a.get(key) == b.get(key) for key in keys)
+
+
+def report(results: List[Dict[str, Any]], history: List[Dict[str, Any]]) -> None:
+    print(f"\n{'scenario':<24}{'reqs':>6}{'conc':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}  vs previous")
+    for result in results:
+        baseline = next((old for old in reversed(history) if comparable(old, result)), None)
+        change = ""
+        if baseline:
+            rps_change = (result["rps"] / baseline["rps"] - 1) * 100 if baseline["rps"] else 0.0
+            p95_change = (result["p95_ms"] / baseline["p95_ms"] - 1) * 100 if baseline["p95_ms"] else 0.0
+            change = f"{baseline['commit']}: rps {rps_change:+.0f}%, p95 {p95_change:+.0f}%"
+        print(
+            f"{result['scenario']:<24}{result['requests']:>6}{result['concurrency']:>6}{result['rps']:>9}"
+            f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}{result['errors']:>8}  {change}"
+        )
+
+
+async def run_all(app, args, database: str) -> List[Dict[str, Any]]:
+    from app.services.ai_logging import interaction_log
+
+    ctx = BenchContext(run_id=str(int(time.time())))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://lifesync.bench", timeout=120) as client:
+        await setup(client, ctx, args.users, args.tasks_per_user)
+        results = []
+        for name in args.scenarios:
+            total = args.requests or SCENARIOS[name]["requests"]
+            result = await run_scenario(client, ctx, name, total, args.concurrency)
+            result.update(
+                users=args.users, tasks_per_user=args.tasks_per_user, database=database,
+                ollama_latency=args.ollama_latency, ollama_error_rate=args.ollama_error_rate
+            )
+            results.append(result)
+    await interaction_log.flush()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="In-process LifeSync benchmarks")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=None, help="requests per scenario (default: per-scenario)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--tasks-per-user", type=int, default=25)
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    parser.add_argument("--ollama-latency", type=float, default=0.05, help="seconds per fake Ollama call")
+    parser.add_argument("--ollama-jitter", type=float, default=0.0)
+    parser.add_argument("--ollama-error-rate", type=float, default=0.0)
+    parser.add_argument("--ollama-stream-chunks", type=int, default=8, help="chunks per streamed reply")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the per-user AI rate limits on (they cap voice bursts)")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results.jsonl"), help="JSON-lines history file")
+    parser.add_argument("--no-record", action="store_true", help="report without appending to the history")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="lifesync-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    ollama_url = serve(
+        0, latency=args.ollama_latency, jitter=args.ollama_jitter,
+        error_rate=args.ollama_error_rate, stream_chunks=args.ollama_stream_chunks
+    )
+
+    # Settings are read when the app is imported, so the environment comes first
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "OLLAMA_BASE_URL": ollama_url,
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "REMINDER_WORKER": "off",
+        "AI_RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+    })
+    sys.path.insert(0, BACKEND)
+    from app.main import app
+
+    database = database_url.split(":", 1)[0].split("+", 1)[0]
+    results = asyncio.run(run_all(app, args, database))
+
+    history = previous_results(args.output)
+    report(results, history)
+    if not args.no_record:
+        revision = git_revision()
+        recorded_at = datetime.now(timezone.utc).isoformat()
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps({**revision, "recorded_at": recorded_at, **result}) + "\n")
+        print(f"\nRecorded {len(results)} results for {revision['commit']}{' (dirty)' if revision['dirty'] else ''} in {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Serialization benchmark for the task list endpoint
+
+Compares, on an in-memory SQLite database, the old GET /tasks path (load full
+ORM objects, validate each into the Task schema, encode with the standard
+JSON encoder) with the current one (select only the schema columns, build
+dicts without validation, encode with orjson), and reports rows per second
+for each stage.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --page-size 500 --repeat 50
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.run import BACKEND
+
+sys.path.insert(0, BACKEND)
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from app.api.v1.endpoints.tasks import TASK_LIST_COLUMNS, _task_dicts  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.core.serialization import FastJSONResponse, orjson, row_dicts  # noqa: E402
+from app.models.models import Task, User  # noqa: E402
+from app.schemas.task import Task as TaskSchema  # noqa: E402
+
+
+def seed(session: Session, rows: int) -> int:
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    session.add(user)
+    session.flush()
+    start = datetime(2024, 3, 1, 9, tzinfo=timezone.utc)
+    session.add_all([
+        Task(
+            user_id=user.id, title=f"Benchmark task {i}", description="Notes from the planning meeting. " * (i % 4),
+            due_date=start + timedelta(hours=i), priority=i % 5 + 1, estimated_duration=15 * (i % 6 + 1),
+            ai_suggested_time=start + timedelta(hours=i, minutes=30), tags=["work", f"project-{i % 7}"],
+            status="pending" if i % 3 else "in_progress", completion_percentage=float(i % 100),
+            recurrence={"freq": "weekly", "interval": 1, "byweekday": [0, 2]} if i % 25 == 0 else None,
+            embedding=b"\0" * 1024,
+        )
+        for i in range(rows)
+    ])
+    session.commit()
+    return user.id
+
+
+def time_stage(function: Callable[[], object], repeat: int) -> float:
+    """Best seconds per call"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, float]:
+    parser = argparse.ArgumentParser(description="GET /tasks serialization benchmark")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    user_id = seed(session, args.page_size)
+    adapter = TypeAdapter(List[TaskSchema])
+
+    def orm_page():
+        session.expunge_all()  # every request starts with an empty identity map
+        return session.query(Task).filter(Task.user_id == user_id).order_by(Task.id).limit(args.page_size).all()
+
+    def projected_page():
+        return session.query(*TASK_LIST_COLUMNS).filter(Task.user_id == user_id).order_by(Task.id).limit(args.page_size).all()
+
+    objects, rows = orm_page(), projected_page()
+    validated = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+    dicts = _task_dicts(row_dicts(rows, TaskSchema, Task))
+    assert JSONResponse(validated).body == FastJSONResponse(dicts).body, "fast path output differs from the schema path"
+
+    stages = {
+        "before: ORM load": lambda: orm_page(),
+        "before: validate + dump": lambda: adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json"),
+        "before: json encode": lambda: JSONResponse(validated),
+        "before: total": lambda: JSONResponse(adapter.dump_python(adapter.validate_python(orm_page(), from_attributes=True), mode="json")),
+        "after: column select": lambda: projected_page(),
+        "after: build dicts": lambda: _task_dicts(row_dicts(rows, TaskSchema, Task)),
+        f"after: {'orjson' if orjson else 'json'} encode": lambda: FastJSONResponse(dicts),
+        "after: total": lambda: FastJSONResponse(_task_dicts(row_dicts(projected_page(), TaskSchema, Task))),
+    }
+    results = {}
+    print(f"{args.page_size} tasks per page, best of {args.repeat}\n")
+    print(f"{'stage':<28}{'ms/page':>10}{'rows/s':>12}")
+    for name, function in stages.items():
+        seconds = time_stage(function, args.repeat)
+        results[name] = args.page_size / seconds
+        print(f"{name:<28}{seconds * 1000:>10.3f}{results[name]:>12.0f}")
+    print(f"\nspeed-up: {results['after: total'] / results['before: total']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Pytest plugin: SQL query budgets
+
+Mark a test with @pytest.mark.query_budget(n) (or pass --query-budget=n for
+every test) and it fails when it runs more than n SQL statements. Repeated
+statement shapes are listed in the failure to point at N+1 lazy loads.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'lifesync_ai_backend'))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--query-budget", type=int, default=None,
+        help="fail any test that runs more SQL statements than this (overridden by the query_budget marker)"
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "query_budget(n): fail the test if it runs more than n SQL statements")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    budget = marker.args[0] if marker else item.config.getoption("--query-budget")
+    if budget is None:
+        yield
+        return
+
+    from app.core.query_profiler import profile_queries
+
+    with profile_queries(process_wide=True) as profile:
+        outcome = yield
+    if outcome.excinfo is None and profile.count > budget:
+        pytest.fail(f"Query budget exceeded: {profile.summary(threshold=2)} (budget {budget})", pytrace=False)
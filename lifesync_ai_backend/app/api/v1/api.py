@@ -1,8 +1,13 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, tasks  # import your endpoint modules
+from app.api.v1.endpoints import auth, tasks, documents, mood, insights, events, jobs  # import your endpoint modules
 
 api_router = APIRouter()
 
 # Include all versioned endpoints
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
-api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
\ No newline at end of file
+api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
+api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
+api_router.include_router(mood.router, prefix="/mood", tags=["mood"])
+api_router.include_router(insights.router, prefix="/insights", tags=["insights"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
\ No newline at end of file
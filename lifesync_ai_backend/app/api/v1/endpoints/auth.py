@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
+import math
 
 from app.core.database import get_db
 from app.models.models import User
 from app.schemas.user import UserCreate, User as UserSchema, Token, UserLogin
 from app.services.auth import verify_password, get_password_hash, create_access_token, verify_token
+from app.services.ai_logging import interaction_user_id
+from app.services.idempotency import seen
+from app.services.rate_limit import take_token
 from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
+from app.core.tracing import span
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -35,16 +42,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    email = verify_token(token)
+    with span("auth.verify_token"):
+        email = verify_token(token)
     if email is None:
         raise credentials_exception
     
-    user = get_user_by_email(db, email=email)
+    with span("auth.load_user"):
+        user = get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
     
+    # Attributes AI calls made while handling this request to the user
+    interaction_user_id.set(user.id)
     return user
 
+def rate_limited(endpoint_class: str):
+    """Dependency spending one of the current user's tokens for an AI endpoint class, answering 429 when they are out"""
+    def check(get_current_user: User = Depends(get_current_user), idempotency_key: Optional[str] = Header(None)):
+        # Retries of a request already taken (same Idempotency-Key) replay its response for free
+        if idempotency_key and seen(endpoint_class, get_current_user.id, idempotency_key):
+            return
+        decision = take_token(get_current_user.id, endpoint_class)
+        if not decision.allowed:
+            RATE_LIMITED.inc(endpoint_class)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Too many {endpoint_class} requests, please wait before trying again",
+                headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+            )
+    return check
+
 @router.post("/register", response_model=UserSchema)
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = get_user_by_email(db, email=user.email)
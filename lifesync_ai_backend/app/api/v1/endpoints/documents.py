@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import uuid
+import aiofiles
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.serialization import FastJSONResponse, row_dicts, schema_columns
+from app.models.models import User, Document
+from app.schemas.document import Document as DocumentSchema, DocumentContent
+from app.api.v1.endpoints.auth import get_current_user, rate_limited
+from app.services.document_service import (
+    SUPPORTED_EXTENSIONS, acquire_blob, apply_blob_results, enqueue_document, release_blob, remove_blob_file
+)
+
+
+router = APIRouter()
+
+DOCUMENT_LIST_COLUMNS = schema_columns(DocumentSchema, Document)  # leaves out the extracted text
+
+def _safe_filename(filename: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename or "")).strip("._")
+    return name or "document"
+
+@router.post(
+    "/upload", response_model=DocumentSchema, status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(rate_limited("documents"))]
+)
+async def upload_document(
+    request: Request,
+    filename: str,
+    document_type: str = None,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream a raw file body to disk and queue it for text and task extraction.
+
+    The body is the file itself (not multipart), so the size limit is enforced
+    chunk by chunk and oversized uploads are cut off without being buffered.
+    """
+
+    filename = _safe_filename(filename)
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type: {extension or 'unknown'}")
+
+    declared_size = request.headers.get("content-length")
+    if declared_size and declared_size.isdigit() and int(declared_size) > settings.max_file_size:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    incoming_dir = os.path.join(settings.upload_dir, ".incoming")
+    os.makedirs(incoming_dir, exist_ok=True)
+    partial_path = os.path.join(incoming_dir, f"{uuid.uuid4().hex}.part")
+
+    # Hash while streaming so identical files can share one stored blob and one extraction
+    digest = hashlib.sha256()
+    file_size = 0
+    # The server hands over the body in small pieces; each aiofiles write is a thread hop, so batch them
+    pending = bytearray()
+    try:
+        async with aiofiles.open(partial_path, "wb") as out:
+            async for chunk in request.stream():
+                file_size += len(chunk)
+                if file_size > settings.max_file_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+                digest.update(chunk)
+                pending += chunk
+                if len(pending) >= settings.upload_chunk_size:
+                    await out.write(bytes(pending))
+                    pending.clear()
+            if pending:
+                await out.write(bytes(pending))
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    if file_size == 0:
+        os.remove(partial_path)
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    content_hash = digest.hexdigest()
+    blob = acquire_blob(db, content_hash, partial_path, file_size, extension)
+    document = Document(
+        user_id=get_current_user.id,
+        filename=filename,
+        file_path=blob.file_path,
+        file_size=file_size,
+        content_hash=content_hash,
+        document_type=document_type,
+        processing_status="pending"
+    )
+    db.add(document)
+    db.commit()
+
+    db.refresh(blob)
+    if blob.processing_status == "completed":
+        # Same content was processed before; reuse its text and tasks
+        apply_blob_results(document, blob)
+        db.commit()
+    else:
+        enqueue_document(document.id)
+
+    db.refresh(document)
+    return document
+
+@router.get("/", response_model=List[DocumentSchema], response_class=FastJSONResponse)
+async def get_documents(
+    skip: int = 0,
+    limit: int = 100,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    rows = db.query(*DOCUMENT_LIST_COLUMNS).filter(
+        Document.user_id == get_current_user.id
+    ).order_by(Document.uploaded_at.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(row_dicts(rows, DocumentSchema, Document))
+
+@router.get("/{document_id}", response_model=DocumentContent)
+async def get_document(
+    document_id: int,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get a document with its processing status and extracted content"""
+    document = db.query(Document).filter(
+        Document.id == document_id, Document.user_id == get_current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: int,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    document = db.query(Document).filter(
+        Document.id == document_id, Document.user_id == get_current_user.id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    content_hash = document.content_hash
+    db.delete(document)
+    db.flush()
+    orphaned_path = release_blob(db, content_hash) if content_hash else None
+    db.commit()
+    if orphaned_path:
+        remove_blob_file(db, content_hash, orphaned_path)
+    return {"message": "Document deleted successfully"}
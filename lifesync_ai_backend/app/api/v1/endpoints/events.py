@@ -0,0 +1,58 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.core.database import SessionLocal
+from app.api.v1.endpoints.auth import get_user_by_email
+from app.services.auth import verify_token
+from app.services.events import broker
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+async def _event_stream(request: Request, user_id: int):
+    queue = broker.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                payload = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {payload}\n\n"
+    finally:
+        broker.unsubscribe(user_id, queue)
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, for EventSource clients that cannot send headers"),
+    authorization: Optional[str] = Header(None)
+):
+    """Server-sent events for the user's task, check-in and reminder changes, so clients can stop polling"""
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    email = verify_token(token) if token else None
+    
+    # Resolve the user with a short-lived session; the stream itself must not hold a connection
+    db = SessionLocal()
+    try:
+        user = get_user_by_email(db, email) if email else None
+    finally:
+        db.close()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return StreamingResponse(
+        _event_stream(request, user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+
+from app.core.database import get_db
+from app.models.models import User
+from app.api.v1.endpoints.auth import get_current_user
+from app.services.insights import get_insights
+from app.services.mood_analytics import user_timezone
+
+
+router = APIRouter()
+
+@router.get("/")
+async def get_productivity_insights(
+    days: int = Query(365, ge=7, le=3650),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """How mood and energy relate to on-time completion and estimate accuracy, by hour of day and weekday"""
+    return get_insights(db, get_current_user.id, days, user_timezone(get_current_user.preferences))
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.models.models import User, Job
+from app.schemas.job import Job as JobSchema
+from app.api.v1.endpoints.auth import get_current_user
+from app.services.jobs import fail_lost_jobs
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def get_job(
+    job_id: str,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Poll a job started with `Prefer: respond-async`; `result` holds the endpoint's response once it completes"""
+    fail_lost_jobs(db, Job.id == job_id, Job.user_id == get_current_user.id)
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == get_current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+from datetime import datetime, timedelta, timezone
+
+from app.core.database import get_db
+from app.core.serialization import FastJSONResponse, row_dicts, schema_columns
+from app.models.models import User, MoodEntry
+from app.schemas.task import TagCount
+from app.schemas.wellness import (
+    MoodEntryCreate, MoodEntry as MoodEntrySchema, MoodTrendPoint, RollingMoodAverage
+)
+from app.api.v1.endpoints.auth import get_current_user
+from app.services.mood_analytics import (
+    current_mood_features, mood_trends, period_starts, rebuild_rollups, record_entry, rolling_averages,
+    user_timezone
+)
+from app.services.tags import mood_tag_counts, sync_mood_tags
+
+
+router = APIRouter()
+
+MOOD_LIST_COLUMNS = schema_columns(MoodEntrySchema, MoodEntry)
+
+@router.post("/", response_model=MoodEntrySchema)
+async def create_mood_entry(
+    entry: MoodEntryCreate,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record a mood check-in and fold it into the daily and weekly rollups"""
+    db_entry = MoodEntry(**entry.dict(), user_id=get_current_user.id, created_at=datetime.now(timezone.utc))
+    sync_mood_tags(db_entry)
+    db.add(db_entry)
+    db.flush()
+    
+    record_entry(db, db_entry, user_timezone(get_current_user.preferences))
+    db.commit()
+    db.refresh(db_entry)
+    return db_entry
+
+@router.get("/", response_model=List[MoodEntrySchema], response_class=FastJSONResponse)
+async def get_mood_entries(
+    skip: int = 0,
+    limit: int = 100,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    rows = db.query(*MOOD_LIST_COLUMNS).filter(
+        MoodEntry.user_id == get_current_user.id
+    ).order_by(MoodEntry.created_at.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(row_dicts(rows, MoodEntrySchema, MoodEntry))
+
+@router.get("/trends", response_model=List[MoodTrendPoint])
+async def get_mood_trends(
+    period: str = Query("day", pattern="^(day|week)$"),
+    days: int = Query(30, ge=1, le=730),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Daily or weekly mood, energy and stress statistics over the last `days` days"""
+    tz = user_timezone(get_current_user.preferences)
+    today = period_starts(datetime.now(timezone.utc), tz)["day"]
+    first = today - timedelta(days=days - 1)
+    if period == "week":
+        first -= timedelta(days=first.weekday())
+    return mood_trends(db, get_current_user.id, period, first, today)
+
+@router.get("/rolling", response_model=List[RollingMoodAverage])
+async def get_rolling_averages(
+    window: int = Query(7, ge=1, le=90),
+    days: int = Query(30, ge=1, le=365),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Trailing `window`-day averages for each of the last `days` days"""
+    tz = user_timezone(get_current_user.preferences)
+    today = period_starts(datetime.now(timezone.utc), tz)["day"]
+    return rolling_averages(db, get_current_user.id, window, today - timedelta(days=days - 1), today)
+
+@router.get("/current")
+async def get_current_mood(
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """The mood features the scheduler uses right now"""
+    return current_mood_features(db, get_current_user.id, user_timezone(get_current_user.preferences))
+
+@router.get("/tags", response_model=List[TagCount])
+async def get_mood_tag_counts(
+    limit: int = Query(100, ge=1, le=1000),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return mood_tag_counts(db, get_current_user.id, limit)
+
+@router.delete("/{entry_id}")
+async def delete_mood_entry(
+    entry_id: int,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    entry = db.query(MoodEntry).filter(MoodEntry.id == entry_id, MoodEntry.user_id == get_current_user.id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Mood entry not found")
+    
+    created_at = entry.created_at
+    db.delete(entry)
+    db.flush()
+    rebuild_rollups(db, get_current_user.id, created_at, user_timezone(get_current_user.preferences))
+    db.commit()
+    return {"message": "Mood entry deleted successfully"}
@@ -1,45 +1,176 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from starlette.background import BackgroundTask
+from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
 from app.models.models import User, Task, TaskCheckIn
-from app.schemas.task import TaskCreate, TaskUpdate, Task as TaskSchema, TaskCheckInCreate, VoiceTaskInput
-from app.api.v1.endpoints.auth import get_current_user
+from app.schemas.task import TaskCreate, TaskUpdate, Task as TaskSchema, TaskCheckInCreate, VoiceTaskInput, SearchResult, TagCount, TaskOccurrence, CalendarDay, RecurrenceRule
+from app.core.serialization import FastJSONResponse, orm_dicts, row_dicts, schema_columns
+from app.api.v1.endpoints.auth import get_current_user, rate_limited
 from app.services.ai_service import AIService
+from app.services.idempotency import idempotent
+from app.services.jobs import accept_job, job_handler, wants_job
+from app.services.rescheduler import persist_schedule, place_new_task, repair_schedule
+from app.services.search import search
+from app.services.embeddings import embedding_bytes, find_duplicates
+from app.services.tags import filter_by_tags, merge_tags, sync_task_tags, tag_counts
+from app.services.mood_analytics import current_mood_features, user_timezone
+from app.services.duration_model import (
+    load_duration_model, minutes_since_started, predict_duration, rebuild_duration_stats, record_completion
+)
+from app.services.recurrence import (
+    expand_occurrences, is_occurrence, materialize_occurrence, normalize_rule, parse_occurrence_key
+)
+from app.services.scheduler import as_utc, coerce_datetime
+from app.services.task_calendar import calendar_days
 
 
 router = APIRouter()
 ai_service = AIService()
 
-@router.post("/", response_model=TaskSchema)
+TASK_LIST_COLUMNS = schema_columns(TaskSchema, Task)
+
+def _recurrence_rule(rule) -> Optional[dict]:
+    try:
+        return normalize_rule(rule.dict(exclude_none=True) if hasattr(rule, "dict") else rule)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid recurrence: {e}")
+
+def _utc_due_date(value, preferences: Optional[dict]) -> Optional[datetime]:
+    """A due date as stored: naive values are the user's wall-clock time, and everything is kept in UTC"""
+    due = coerce_datetime(value, datetime.now(user_timezone(preferences)))
+    return due.astimezone(timezone.utc) if due is not None else None
+
+@router.post("/", response_model=TaskSchema, response_class=FastJSONResponse)
 async def create_task(
     task: TaskCreate,
+    idempotency_key: Optional[str] = Header(None),
     get_current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_task = Task(**task.dict(), user_id=get_current_user.id)
+    return await idempotent(
+        idempotency_key, "create", get_current_user.id, task,
+        lambda: _create_task(task, get_current_user, db)
+    )
+
+async def _create_task(task: TaskCreate, get_current_user: User, db: Session) -> FastJSONResponse:
+    recurrence = _recurrence_rule(task.recurrence)
+    if recurrence and task.due_date is None:
+        raise HTTPException(status_code=422, detail="Recurring tasks need a due_date for their first occurrence")
+    
+    db_task = Task(**task.dict(exclude={"recurrence"}), recurrence=recurrence, user_id=get_current_user.id)
+    db_task.due_date = _utc_due_date(task.due_date, get_current_user.preferences)
+    if db_task.estimated_duration is None:
+        db_task.estimated_duration = predict_duration(load_duration_model(db, get_current_user.id), db_task.tags)
+    sync_task_tags(db_task)
     db.add(db_task)
     db.commit()
+    
+    # Slot the new task into the persisted schedule without touching existing slots
+    place_new_task(db, db_task, get_current_user.preferences or {})
+    db.commit()
     db.refresh(db_task)
-    return db_task
+    # The title embedding only feeds later duplicate checks, so the response doesn't wait on Ollama for it
+    return FastJSONResponse(
+        _task_dicts(orm_dicts([db_task], TaskSchema))[0],
+        background=BackgroundTask(_store_embedding, db_task.id, db_task.title)
+    )
 
-@router.get("/", response_model=List[TaskSchema])
+async def _store_embedding(task_id: int, title: str) -> None:
+    """Embed a task's title after its response has been sent"""
+    embedding = (await ai_service.embed_texts([title]))[0]
+    db = SessionLocal()
+    try:
+        # A title edited again in the meantime has its own embedding on the way
+        db.query(Task).filter(Task.id == task_id, Task.title == title).update(
+            {Task.embedding: embedding_bytes(embedding)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _task_dicts(tasks: List[dict]) -> List[dict]:
+    """Finish unvalidated TaskSchema dicts: stored recurrence rules gain the fields they left at their defaults"""
+    for task in tasks:
+        rule = task["recurrence"]
+        if rule is not None:
+            task["recurrence"] = {name: rule.get(name, field.default) for name, field in RecurrenceRule.model_fields.items()}
+    return tasks
+
+@router.get("/", response_model=List[TaskSchema], response_class=FastJSONResponse)
 async def get_tasks(
     skip: int = 0,
     limit: int = 100,
     status: str = None,
+    tag: Optional[List[str]] = Query(None),
     get_current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Task).filter(Task.user_id == get_current_user.id)
+    # Only the response columns, straight to JSON: rows come from our own schema, so skip per-task validation
+    query = db.query(*TASK_LIST_COLUMNS).filter(Task.user_id == get_current_user.id)
     
     if status:
         query = query.filter(Task.status == status)
     
-    tasks = query.offset(skip).limit(limit).all()
-    return tasks
+    if tag:
+        # Repeat ?tag= to require several tags
+        query = filter_by_tags(query, get_current_user.id, tag)
+    
+    # Explicit order: a covering index may otherwise hand rows back in index order, reshuffling pages
+    rows = query.order_by(Task.id).offset(skip).limit(limit)
+    return FastJSONResponse(_task_dicts(row_dicts(rows, TaskSchema, Task)))
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_tasks(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over the user's tasks and uploaded document content, best matches first"""
+    return search(db, get_current_user.id, q, limit)
+
+@router.get("/tags", response_model=List[TagCount])
+async def get_tag_counts(
+    status: str = None,
+    limit: int = Query(100, ge=1, le=1000),
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Tag facets: how many of the user's tasks carry each tag, most used first"""
+    return tag_counts(db, get_current_user.id, status, limit)
+
+@router.get("/occurrences", response_model=List[TaskOccurrence])
+async def get_occurrences(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Occurrences of the user's recurring tasks in [start, end) (default: the next 7 days), generated on demand"""
+    start = start or datetime.now(timezone.utc)
+    end = end or start + timedelta(days=7)
+    if end <= start or end - start > timedelta(days=366):
+        raise HTTPException(status_code=422, detail="end must be after start and at most a year later")
+    return expand_occurrences(db, get_current_user.id, start, end, user_timezone(get_current_user.preferences))
+
+@router.get("/calendar", response_model=List[CalendarDay])
+async def get_calendar(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Tasks grouped by local day for [start, end] (inclusive; default: the next 7 days)"""
+    tz = user_timezone(get_current_user.preferences)
+    start = start or datetime.now(tz).date()
+    end = end or start + timedelta(days=6)
+    if end < start or (end - start).days > 366:
+        raise HTTPException(status_code=422, detail="end must not be before start and at most a year later")
+    return calendar_days(db, get_current_user.id, start, end, tz)
 
 @router.get("/{task_id}", response_model=TaskSchema)
 async def get_task(
@@ -52,7 +183,7 @@ async def get_task(
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
-@router.put("/{task_id}", response_model=TaskSchema)
+@router.put("/{task_id}", response_model=TaskSchema, response_class=FastJSONResponse)
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
@@ -64,6 +195,15 @@ async def update_task(
         raise HTTPException(status_code=404, detail="Task not found")
     
     update_data = task_update.dict(exclude_unset=True)
+    if "recurrence" in update_data:
+        update_data["recurrence"] = _recurrence_rule(update_data["recurrence"])
+        if update_data["recurrence"] and (update_data.get("due_date") or task.due_date) is None:
+            raise HTTPException(status_code=422, detail="Recurring tasks need a due_date for their first occurrence")
+    if update_data.get("due_date") is not None:
+        update_data["due_date"] = _utc_due_date(update_data["due_date"], get_current_user.preferences)
+    old_start, old_duration, old_status, old_actual = (
+        task.ai_suggested_time, task.estimated_duration, task.status, task.actual_duration
+    )
     
     # Set completion time if task is being marked as completed
     if update_data.get("status") == "completed" and task.status != "completed":
@@ -73,9 +213,28 @@ async def update_task(
     for field, value in update_data.items():
         setattr(task, field, value)
     
+    if "tags" in update_data:
+        sync_task_tags(task)
+    
+    if task.status == "completed" and old_status != "completed":
+        record_completion(db, task)
+    elif task.status == "completed" and task.actual_duration != old_actual:
+        # A corrected duration replaces the sample recorded at completion instead of adding another
+        rebuild_duration_stats(db, task.user_id)
+    
+    if "title" in update_data:
+        # The old title's embedding is dropped now and the new one is stored after the response
+        task.embedding = None
+    
+    if task.status != old_status or task.estimated_duration != old_duration:
+        repair_schedule(db, task, old_start, old_duration, get_current_user.preferences or {})
+    
     db.commit()
     db.refresh(task)
-    return task
+    return FastJSONResponse(
+        _task_dicts(orm_dicts([task], TaskSchema))[0],
+        background=BackgroundTask(_store_embedding, task.id, task.title) if "title" in update_data else None
+    )
 
 @router.delete("/{task_id}")
 async def delete_task(
@@ -88,16 +247,47 @@ async def delete_task(
         raise HTTPException(status_code=404, detail="Task not found")
     
     db.delete(task)
+    repair_schedule(
+        db, task, task.ai_suggested_time, task.estimated_duration,
+        get_current_user.preferences or {}, removed=True
+    )
     db.commit()
     return {"message": "Task deleted successfully"}
 
-@router.post("/voice", response_model=List[TaskSchema])
+@router.post(
+    "/voice", response_model=List[TaskSchema], response_class=FastJSONResponse,
+    dependencies=[Depends(rate_limited("voice"))]
+)
 async def create_tasks_from_voice(
     voice_input: VoiceTaskInput,
+    prefer: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
     get_current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Create tasks from voice/natural language input"""
+    """Create tasks from voice/natural language input.
+
+    With `Prefer: respond-async` the work runs as a job: the answer is 202
+    with the job id, and the tasks arrive on GET /jobs/{id} and the event stream.
+    """
+    user_id = get_current_user.id
+    db.close()  # the request's session is only needed for auth; the work opens its own around the model calls
+    if wants_job(prefer):
+        handler = lambda: accept_job(user_id, "voice", voice_input.model_dump(mode="json"))
+    else:
+        handler = lambda: _voice_response(user_id, voice_input)
+    # A retried request with the same Idempotency-Key gets the first response instead of a second generation
+    return await idempotent(idempotency_key, "voice", user_id, voice_input, handler)
+
+async def _voice_response(user_id: int, voice_input: VoiceTaskInput) -> FastJSONResponse:
+    return FastJSONResponse(await _voice_tasks(user_id, voice_input))
+
+@job_handler("voice")
+async def _voice_job(user_id: int, payload: dict) -> List[dict]:
+    return await _voice_tasks(user_id, VoiceTaskInput(**payload))
+
+async def _voice_tasks(user_id: int, voice_input: VoiceTaskInput) -> List[dict]:
+    """Parse and embed with no database connection checked out, then store the tasks in one short session"""
     
     # Parse voice input using AI
     parsed_data = await ai_service.parse_voice_input(
@@ -105,26 +295,84 @@ async def create_tasks_from_voice(
         voice_input.context
     )
     
-    created_tasks = []
-    
-    for task_data in parsed_data.get("tasks", []):
-        db_task = Task(
-            user_id=get_current_user.id,
-            title=task_data.get("title"),
-            description=task_data.get("description"),
-            priority=task_data.get("priority", 1),
-            estimated_duration=task_data.get("estimated_duration"),
-            due_date=task_data.get("due_date")
-        )
-        db.add(db_task)
-        created_tasks.append(db_task)
-    
-    db.commit()
+    tasks_data = [task_data for task_data in parsed_data.get("tasks", []) if task_data.get("title")]
     
-    for task in created_tasks:
-        db.refresh(task)
+    # Embed the whole batch at once and look every item up against the user's open tasks
+    embeddings = await ai_service.embed_texts([task_data["title"] for task_data in tasks_data])
     
-    return created_tasks
+    db = SessionLocal()
+    try:
+        preferences = db.get(User, user_id).preferences or {}
+        duplicates = find_duplicates(
+            db, user_id, embeddings, settings.duplicate_similarity_threshold
+        ) if tasks_data else []
+        
+        duration_model = load_duration_model(db, user_id)
+        created_tasks = []
+        resulting_tasks = []
+        for task_data, embedding, duplicate in zip(tasks_data, embeddings, duplicates):
+            # The parser hands back ISO strings in the user's local time
+            due_date = _utc_due_date(task_data.get("due_date"), preferences)
+            existing = None
+            if duplicate is not None:
+                kind, target = duplicate
+                existing = resulting_tasks[target] if kind == "batch" else db.query(Task).filter(
+                    Task.id == target, Task.user_id == user_id
+                ).first()
+        
+            if existing is not None and voice_input.merge_duplicates:
+                # Said again: keep one task, filling in anything the repeat adds
+                existing.description = existing.description or task_data.get("description")
+                existing.due_date = existing.due_date or due_date
+                existing.estimated_duration = existing.estimated_duration or task_data.get("estimated_duration")
+                existing.priority = max(existing.priority or 1, task_data.get("priority") or 1)
+                existing.tags = merge_tags(existing.tags, task_data.get("tags"))
+                sync_task_tags(existing)
+                resulting_tasks.append(existing)
+                continue
+        
+            try:
+                recurrence = normalize_rule(task_data.get("recurrence"))
+            except (ValueError, TypeError, AttributeError):
+                recurrence = None
+            if recurrence:
+                # A template needs a concrete first occurrence to anchor the rule
+                due_date = due_date or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        
+            db_task = Task(
+                user_id=user_id,
+                title=task_data.get("title"),
+                description=task_data.get("description"),
+                priority=task_data.get("priority", 1),
+                # A duration the user stated wins; otherwise fall back on their own history
+                estimated_duration=task_data.get("estimated_duration") or predict_duration(duration_model, task_data.get("tags")),
+                due_date=due_date,
+                tags=task_data.get("tags"),
+                recurrence=recurrence,
+                embedding=embedding_bytes(embedding)
+            )
+            sync_task_tags(db_task)
+            db.add(db_task)
+            if existing is not None:
+                db.flush()
+                db_task.duplicate_of = existing.id
+            created_tasks.append(db_task)
+            resulting_tasks.append(db_task)
+        
+        db.commit()
+        
+        for task in created_tasks:
+            place_new_task(db, task, preferences)
+        db.commit()
+        
+        # Merged tasks appear once, in the position they were first mentioned
+        unique_tasks = list({id(task): task for task in resulting_tasks}.values())
+        for task in unique_tasks:
+            db.refresh(task)
+        
+        return _task_dicts(orm_dicts(unique_tasks, TaskSchema))
+    finally:
+        db.close()
 
 @router.post("/{task_id}/check-in")
 async def task_check_in(
@@ -149,52 +397,155 @@ async def task_check_in(
     if check_in.user_response == "started":
         task.status = "in_progress"
     elif check_in.user_response == "completed":
+        was_completed = task.status == "completed"
         task.status = "completed"
         task.completed_at = datetime.utcnow()
         task.completion_percentage = 100.0
+        if not was_completed:
+            if task.actual_duration is None:
+                task.actual_duration = minutes_since_started(db, task)
+            record_completion(db, task)
+            repair_schedule(db, task, task.ai_suggested_time, task.estimated_duration, get_current_user.preferences or {})
     
     db.commit()
     db.refresh(db_check_in)
     
     return {"message": "Check-in recorded successfully", "check_in": db_check_in}
 
-@router.get("/optimize/schedule")
+def _occurrence_template(db: Session, user: User, task_id: int, key: str):
+    """The user's recurring task and the occurrence start named by `key`, or 404"""
+    template = db.query(Task).filter(
+        Task.id == task_id, Task.user_id == user.id, Task.recurrence.isnot(None)
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Recurring task not found")
+    try:
+        start = parse_occurrence_key(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Occurrence not found")
+    if not is_occurrence(template, start, user_timezone(user.preferences)):
+        raise HTTPException(status_code=404, detail="Occurrence not found")
+    return template, start
+
+@router.put("/{task_id}/occurrences/{key}", response_model=TaskSchema, response_class=FastJSONResponse)
+async def update_occurrence(
+    task_id: int,
+    key: str,
+    task_update: TaskUpdate,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Edit one occurrence of a recurring task, materializing it as its own task"""
+    
+    template, start = _occurrence_template(db, get_current_user, task_id, key)
+    if task_update.recurrence is not None:
+        raise HTTPException(status_code=422, detail="Change the recurrence on the recurring task itself")
+    occurrence = materialize_occurrence(db, template, start)
+    db.commit()
+    return await update_task(occurrence.id, task_update, get_current_user, db)
+
+@router.post("/{task_id}/occurrences/{key}/check-in")
+async def occurrence_check_in(
+    task_id: int,
+    key: str,
+    check_in: TaskCheckInCreate,
+    get_current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record a check-in for one occurrence of a recurring task, materializing it as its own task"""
+    
+    template, start = _occurrence_template(db, get_current_user, task_id, key)
+    occurrence = materialize_occurrence(db, template, start)
+    db.commit()
+    return await task_check_in(occurrence.id, check_in, get_current_user, db)
+
+@router.get("/optimize/schedule", dependencies=[Depends(rate_limited("schedule"))])
 async def optimize_schedule(
+    prefer: Optional[str] = Header(None),
     get_current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get AI-optimized schedule for the user's tasks"""
-    
-    # Get pending tasks
-    tasks = db.query(Task).filter(
-        Task.user_id == get_current_user.id,
-        Task.status.in_(["pending", "in_progress"])
-    ).all()
-    
-    # Convert to dict format for AI processing
-    task_data = [
-        {
-            "id": task.id,
-            "title": task.title,
-            "priority": task.priority,
-            "due_date": task.due_date,
-            "estimated_duration": task.estimated_duration
-        }
-        for task in tasks
-    ]
-    
-    # Get user preferences
-    user_preferences = get_current_user.preferences or {}
-    
-    # Get recent mood data (you'd implement this)
-    mood_data = {"mood": 7, "energy": 6}  # Placeholder
+    """Get AI-optimized schedule for the user's tasks (as a job with `Prefer: respond-async`)"""
+    user_id = get_current_user.id
+    db.close()  # the request's session is only needed for auth; the work opens its own around the model call
+    if wants_job(prefer):
+        return await accept_job(user_id, "schedule", {})
+    return await _optimized_schedule(user_id)
+
+@job_handler("schedule")
+async def _schedule_job(user_id: int, payload: dict) -> dict:
+    return await _optimized_schedule(user_id)
+
+async def _optimized_schedule(user_id: int) -> dict:
+    """Gather the schedule inputs, let the model work without a database connection, then persist the slots"""
+    db = SessionLocal()
+    try:
+        # Get pending tasks
+        tasks = db.query(Task).filter(
+            Task.user_id == user_id,
+            Task.status.in_(["pending", "in_progress"]),
+            Task.recurrence.is_(None)
+        ).all()
+        
+        # Fill missing estimates from the user's completion history instead of a flat default
+        duration_model = load_duration_model(db, user_id)
+        predicted = {}
+        for task in tasks:
+            if task.estimated_duration is None:
+                task.estimated_duration = predicted[task.id] = predict_duration(duration_model, task.tags)
+        
+        # Convert to dict format for AI processing
+        task_data = [
+            {
+                "id": task.id,
+                "title": task.title,
+                "priority": task.priority,
+                "due_date": as_utc(task.due_date) if task.due_date is not None else None,
+                "estimated_duration": task.estimated_duration
+            }
+            for task in tasks
+        ]
+        task_ids = [task.id for task in tasks]
+        
+        # Get user preferences
+        user_preferences = db.get(User, user_id).preferences or {}
+        tz = user_timezone(user_preferences)
+        
+        # Recurring tasks contribute their not-yet-materialized occurrences for the coming week
+        now = datetime.now(timezone.utc)
+        for occurrence in expand_occurrences(db, user_id, now, now + timedelta(days=7), tz):
+            if occurrence["task_id"] is None:
+                task_data.append({
+                    "id": f"{occurrence['template_id']}:{occurrence['occurrence_key']}",
+                    "title": occurrence["title"],
+                    "priority": occurrence["priority"],
+                    "fixed_time": occurrence["occurrence_start"],
+                    "estimated_duration": occurrence["estimated_duration"] or predict_duration(duration_model, occurrence["tags"])
+                })
+        
+        # Current mood features from the precomputed rollups
+        mood_data = current_mood_features(db, user_id, tz)
+    finally:
+        db.close()
     
     # Get AI optimization
     optimized_schedule = await ai_service.optimize_daily_schedule(
         task_data,
         user_preferences,
         mood_data,
-        datetime.now()
+        datetime.now(tz)
     )
     
-    return optimized_schedule
\ No newline at end of file
+    # Persist the slots (and the filled-in estimates) so later task changes can be repaired incrementally
+    db = SessionLocal()
+    try:
+        tasks = db.query(Task).filter(Task.id.in_(task_ids)).all()
+        for task in tasks:
+            if task.id in predicted and task.estimated_duration is None:
+                task.estimated_duration = predicted[task.id]
+        persist_schedule(tasks, optimized_schedule.get("optimized_schedule", []), tz)
+        db.commit()
+    finally:
+        db.close()
+    
+    return optimized_schedule
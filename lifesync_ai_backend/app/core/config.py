@@ -11,15 +11,55 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     
     # AI Services
+    ollama_base_url: str = "http://localhost:11434"
+    ollama_model: str = "llama3.1"
+    ollama_embedding_model: str = "nomic-embed-text"
+    embedding_dim: int = 256  # size of the local fallback embeddings
+    duplicate_similarity_threshold: float = 0.85  # cosine similarity at which voice tasks count as duplicates
     openai_api_key: Optional[str] = None
     llama_api_key: Optional[str] = None
+    ai_log_batch_size: int = 100  # AIInteraction rows written per insert
+    ai_log_flush_seconds: float = 2.0  # longest a logged interaction waits before being written
+    ai_log_max_pending: int = 5000  # interactions buffered in memory; more are dropped while the database is slow
+    ollama_concurrency: int = 4  # Ollama calls in flight per worker, handed out round-robin between users (0 = no limit)
+    ai_rate_limit_enabled: bool = True
+    ai_rate_limit_per_minute: float = 10.0  # sustained AI requests per user and endpoint class (voice, schedule, documents)
+    ai_rate_limit_burst: int = 5  # requests allowed back to back before the rate applies
+    idempotency_ttl_seconds: int = 86400  # how long responses are replayed for a repeated Idempotency-Key
+    idempotency_lock_seconds: int = 300  # a claimed key whose request never finished frees up after this
+    idempotency_wait_seconds: float = 60.0  # how long a duplicate waits for the first request before a 409
     
     # File Upload
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    upload_chunk_size: int = 64 * 1024  # uploads are written to disk in blocks of about this size
+    
+    # Background Workers
+    document_worker: str = "local"  # local (process pool) or celery
+    document_workers: int = 2
+    extraction_workers: int = 4  # processes used to extract PDF pages in parallel
+    extraction_chunk_chars: int = 6000  # text handed to the task extractor per LLM call
+    document_lease_seconds: float = 1800.0  # a blob claimed for processing this long ago is assumed abandoned and re-claimable
+    page_cache_dir: Optional[str] = None  # defaults to <upload_dir>/.page_cache
+    page_cache_max_mb: int = 512  # least recently used cached pages are deleted beyond this
+    job_worker: str = "local"  # runs voice/schedule jobs: local (the API's event loop) or celery
+    job_retention_hours: int = 24  # finished jobs older than this are deleted when the user starts a new one
+    job_lease_seconds: float = 600.0  # a job still running this long after it started is assumed lost with its worker and failed
+    
+    # Diagnostics
+    query_profiling: bool = False  # X-Query-Count headers and per-request query logs with N+1 warnings
+    trace_exporter: str = "off"  # off, log (span tree per request), jsonl (spans appended to trace_file) or a registered exporter
+    trace_file: str = "traces.jsonl"
+    trace_sample_rate: float = 1.0  # share of requests traced when the caller sent no traceparent
     
     # Notifications
     redis_url: str = "redis://localhost:6379"
+    reminder_worker: str = "local"  # local (inside the API process), external (python -m app.services.reminders) or off
+    reminder_sink: str = "log"  # log, push (the /events stream) or another registered sink
+    reminder_lead_minutes: int = 10  # due-date reminders fire this long before the task is due
+    reminder_batch_size: int = 500
+    reminder_poll_seconds: float = 1.0
+    reminder_lease_seconds: float = 60.0  # claimed but unacknowledged reminders are retried after this
     
     class Config:
         env_file = ".env"
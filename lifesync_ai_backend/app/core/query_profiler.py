@@ -0,0 +1,118 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REPEAT_THRESHOLD = 5  # the same statement shape this many times in one request is reported as a likely N+1
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with expanded IN lists and literal numbers collapsed, so lazy loads of different rows match"""
+    shape = _IN_LIST.sub("(?)", statement)
+    shape = _NUMBER.sub("N", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class QueryProfile:
+    """Queries run while a profile is active (one request or one test)"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self, threshold: int = REPEAT_THRESHOLD) -> str:
+        line = f"{self.count} queries in {self.seconds * 1000:.1f}ms"
+        for shape, count in self.repeated(threshold):
+            line += f"\n  possible N+1 ({count}x): {shape[:200]}"
+        return line
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+_process_wide: Optional[QueryProfile] = None  # catches threads that do not inherit the context (e.g. TestClient's)
+
+
+def _active() -> Optional[QueryProfile]:
+    return _current.get() or _process_wide
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active()
+    if profile is None:
+        return
+    started = conn.info.get("query_started")
+    if started:
+        profile.seconds += time.perf_counter() - started.pop()
+    profile.count += 1
+    profile.shapes[statement_shape(statement)] += 1
+
+
+def install_query_profiler() -> None:
+    """Count queries for whichever profile is active in the calling context (all engines)"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_queries(process_wide: bool = False) -> Iterator[QueryProfile]:
+    """Profile the queries run inside the block, including from threadpool work started in it.
+
+    process_wide also counts queries from unrelated threads (for tests, not for concurrent requests).
+    """
+    global _process_wide
+    install_query_profiler()
+    profile = QueryProfile()
+    token = _current.set(profile)
+    if process_wide:
+        _process_wide = profile
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        if process_wide:
+            _process_wide = None
+
+
+class QueryProfilerMiddleware:
+    """Opt-in (settings.query_profiling) per-request profile: X-Query-Count / X-Query-Time headers and a log line"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            async def send_with_counts(message):
+                if message["type"] == "http.response.start":
+                    # Queries run after the headers (streaming bodies) are only in the log line
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(profile.count).encode()),
+                        (b"x-query-time", f"{profile.seconds * 1000:.1f}ms".encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_counts)
+            finally:
+                print(f"Queries for {scope['method']} {scope['path']}: {profile.summary()}")
@@ -0,0 +1,30 @@
+import time
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+
+RETRY_SECONDS = 30  # how long to wait before trying an unreachable Redis again
+
+_client: Optional[redis.Redis] = None
+_last_attempt = 0.0
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """The shared Redis client, or None while Redis is unreachable so callers can fall back to in-process structures"""
+    global _client, _last_attempt
+    if _client is not None:
+        return _client
+    if _last_attempt and time.monotonic() - _last_attempt < RETRY_SECONDS:
+        return None
+
+    _last_attempt = time.monotonic()
+    try:
+        client = redis.Redis.from_url(settings.redis_url, socket_connect_timeout=0.5, socket_timeout=2)
+        client.ping()
+    except redis.RedisError as e:
+        print(f"Redis unavailable, using in-process fallback: {e}")
+        return None
+    _client = client
+    return _client
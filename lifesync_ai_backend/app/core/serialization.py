@@ -0,0 +1,56 @@
+import json
+from typing import Any, Dict, Iterable, List, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is slower but produces the same documents
+    orjson = None
+
+# List endpoints return plain dicts built straight from trusted database rows
+# and encode them with orjson, skipping per-object pydantic validation. The
+# output matches what response_model serialization produced for the same rows.
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # OPT_UTC_Z writes UTC datetimes as "...Z", like pydantic
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def schema_columns(schema: Type[BaseModel], model) -> List[Any]:
+    """The columns of `model` backing `schema`'s fields, in field order"""
+    table_columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields if name in table_columns]
+
+
+def row_dicts(rows: Iterable, schema: Type[BaseModel], model) -> List[Dict[str, Any]]:
+    """Rows selected with schema_columns() as response dicts in field order, without validation"""
+    table_columns = model.__table__.columns
+    # Fields without a column (attributes only set on fresh objects) keep their schema default
+    template = {
+        name: None if name in table_columns else field.default for name, field in schema.model_fields.items()
+    }
+    dicts = []
+    for row in rows:
+        item = template.copy()
+        item.update(row._mapping)
+        dicts.append(item)
+    return dicts
+
+
+def orm_dicts(objects: Iterable, schema: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Loaded ORM objects as response dicts, reading only the schema's attributes and skipping validation"""
+    names = list(schema.model_fields)
+    return [{name: getattr(obj, name, None) for name in names} for obj in objects]
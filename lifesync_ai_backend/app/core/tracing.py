@@ -0,0 +1,351 @@
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+# Spans follow the OpenTelemetry data model (W3C trace ids, parent span ids,
+# kinds, attributes, status) without depending on an SDK. A trace is handed
+# to the configured exporter when its local root span ends; spans that end
+# later (streaming bodies, background work) are exported on their own.
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "_trace")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, kind: str = "internal",
+                 trace_id: Optional[str] = None, parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.span_id = "%016x" % random.getrandbits(64)
+        if parent is not None:
+            self.trace_id, self.parent_id, self._trace = parent.trace_id, parent.span_id, parent._trace
+        else:
+            # A local root, possibly continuing a trace started by the caller (traceparent)
+            self.trace_id, self.parent_id, self._trace = trace_id or "%032x" % random.getrandbits(128), parent_id, _Trace(self)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = "unset"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)[:500]
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self._trace.finished(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The span as an OTLP/JSON-style object"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans of unsampled requests and when tracing is off"""
+
+    name = ""
+    start_ns = 0
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    __slots__ = ("root", "spans", "exported")
+
+    def __init__(self, root: Span):
+        self.root = root
+        self.spans: List[Span] = []
+        self.exported = False
+
+    def finished(self, span: Span) -> None:
+        if self.exported:
+            _export([span])
+            return
+        self.spans.append(span)
+        if span is self.root:
+            self.exported = True
+            spans, self.spans = self.spans, []
+            _export(spans)
+
+
+_current: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+_enabled = False  # set by install_tracing()
+
+
+def current_span():
+    """The span active in this context (NOOP_SPAN when there is none)"""
+    return _current.get() or NOOP_SPAN
+
+
+class span:
+    """Context manager running its block in a child of the current span (or a new trace)
+
+        with span("ai.parse_response", attributes) as s:
+            s.set_attribute("ai.outcome", "success")
+    """
+
+    __slots__ = ("name", "kind", "attributes", "_span", "_token")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal"):
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+
+    def __enter__(self):
+        parent = _current.get()
+        if not _enabled or parent is NOOP_SPAN:
+            self._span = NOOP_SPAN
+        elif parent is None:
+            self._span = Span(self.name, kind=self.kind, attributes=self.attributes) if _sampled() else NOOP_SPAN
+        else:
+            self._span = Span(self.name, parent, kind=self.kind, attributes=self.attributes)
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc is not None:
+            self._span.record_error(exc)
+        self._span.end()
+        return False
+
+
+def traced(name: str, kind: str = "internal"):
+    """Decorator running each call of a function (sync or async) in its own span"""
+    def decorate(function):
+        if iscoroutinefunction(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                with span(name, kind=kind):
+                    return await function(*args, **kwargs)
+        else:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with span(name, kind=kind):
+                    return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_span(name: str, start_ns: int, end_ns: Optional[int] = None, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """Add an already finished child span to the current one, for phases only measurable after the fact"""
+    parent = _current.get()
+    if isinstance(parent, Span):
+        child = Span(name, parent, attributes=attributes)
+        child.start_ns = start_ns
+        child.end(end_ns)
+
+
+def trace_headers() -> Dict[str, str]:
+    """W3C traceparent header continuing the current trace in an outgoing request"""
+    traceparent = current_span().traceparent
+    return {"traceparent": traceparent} if traceparent else {}
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent_span_id, sampled) from a traceparent header, or None if it is missing or malformed"""
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def _sampled() -> bool:
+    return settings.trace_sample_rate >= 1.0 or random.random() < settings.trace_sample_rate
+
+
+# Exporters receive lists of finished spans; they run on whichever thread ended the root span
+
+def log_exporter(spans: List[Span]) -> None:
+    """Print each trace as an indented tree of span durations"""
+    children: Dict[Optional[str], List[Span]] = {}
+    ids = {item.span_id for item in spans}
+    for item in sorted(spans, key=lambda s: s.start_ns):
+        children.setdefault(item.parent_id if item.parent_id in ids else None, []).append(item)
+
+    lines = []
+    def walk(parent_id, depth):
+        for item in children.get(parent_id, []):
+            error = " ERROR" if item.status == "error" else ""
+            lines.append(f"{'  ' * depth}{item.name} {(item.end_ns - item.start_ns) / 1e6:.1f}ms{error}")
+            walk(item.span_id, depth + 1)
+    walk(None, 1)
+    print(f"Trace {spans[0].trace_id}:\n" + "\n".join(lines))
+
+
+class JsonlExporter:
+    """Append one OTLP/JSON-style span per line to settings.trace_file for offline analysis"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __call__(self, spans: List[Span]) -> None:
+        payload = "".join(json.dumps(item.to_dict(), default=str) + "\n" for item in spans)
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(payload)
+
+
+_exporters: Dict[str, Callable[[List[Span]], None]] = {"log": log_exporter}
+
+
+def register_exporter(name: str, exporter: Callable[[List[Span]], None]) -> None:
+    _exporters[name] = exporter
+
+
+def _export(spans: List[Span]) -> None:
+    exporter = _exporters.get(settings.trace_exporter)
+    if exporter is None:
+        return
+    try:
+        exporter(spans)
+    except Exception as e:
+        print(f"Trace export error: {e}")
+
+
+# SQL statements become client spans of whatever span is current on the executing thread
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    child = None
+    if isinstance(parent, Span):
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        child = Span(f"db.{verb}", parent, kind="client", attributes={
+            "db.system": conn.dialect.name, "db.statement": statement[:500], "db.executemany": executemany
+        })
+    conn.info.setdefault("trace_spans", []).append(child)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    child = spans.pop() if spans else None
+    if child is not None:
+        child.set_attribute("db.rowcount", cursor.rowcount)
+        child.end()
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    child = spans.pop() if spans else None
+    if child is not None:
+        child.record_error(exception_context.original_exception)
+        child.end()
+
+
+def install_tracing() -> bool:
+    """Turn tracing on when an exporter is configured; returns whether it is on"""
+    global _enabled
+    _enabled = settings.trace_exporter != "off"
+    if settings.trace_exporter == "jsonl" and "jsonl" not in _exporters:
+        register_exporter("jsonl", JsonlExporter(settings.trace_file))
+    if _enabled and not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    return _enabled
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per request, continuing the caller's traceparent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+        sampled = incoming[2] if incoming else _sampled()
+        if not sampled:
+            token = _current.set(NOOP_SPAN)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current.reset(token)
+            return
+
+        root = Span(f"{scope['method']} {scope['path']}", kind="server",
+                    trace_id=incoming[0] if incoming else None, parent_id=incoming[1] if incoming else None,
+                    attributes={"http.request.method": scope["method"], "url.path": scope["path"]})
+        token = _current.set(root)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = "error"
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", root.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except Exception as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            # Named by route template once the router has matched, like the latency metrics
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            root.end()
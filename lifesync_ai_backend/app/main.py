@@ -1,12 +1,28 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render as render_metrics
+from app.core.query_profiler import QueryProfilerMiddleware
+from app.core.tracing import TracingMiddleware, install_tracing
 from app.api.v1.api import api_router
 from app.core.database import engine
 from app.models import models
+from app.services.search import create_search_indexes
+from app.services.tags import backfill_task_tags
+from app.services.reminders import install_reminder_hooks, run_reminder_worker
+from app.services.events import install_event_hooks
+from app.services.ai_logging import interaction_log
+from app.services.jobs import resume_jobs, wait_for_local_jobs
+from app.services.document_service import requeue_stale_documents
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+create_search_indexes(engine)
+backfill_task_tags(engine)
+install_reminder_hooks()
+install_event_hooks()
 
 app = FastAPI(
     title="LifeSync API",
@@ -23,8 +39,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.query_profiling:
+    app.add_middleware(QueryProfilerMiddleware)
+
+if install_tracing():
+    app.add_middleware(TracingMiddleware)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
+_reminder_stop = asyncio.Event()
+
+@app.on_event("startup")
+async def start_reminder_worker():
+    if settings.reminder_worker == "local":
+        app.state.reminder_worker = asyncio.create_task(run_reminder_worker(_reminder_stop))
+
+@app.on_event("startup")
+async def resume_document_processing():
+    # Documents whose worker went away with the last process (pending in a local pool, or a lapsed claim)
+    requeue_stale_documents()
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    # Local jobs live on the event loop and die with the process; their rows outlive it
+    resume_jobs()
+
+@app.on_event("shutdown")
+async def stop_reminder_worker():
+    _reminder_stop.set()
+    if getattr(app.state, "reminder_worker", None) is not None:
+        await app.state.reminder_worker
+
+@app.on_event("shutdown")
+async def finish_local_jobs():
+    await wait_for_local_jobs(timeout=30)
+
+@app.on_event("shutdown")
+async def flush_ai_interactions():
+    await interaction_log.flush()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to LifeSync API"}
@@ -32,3 +88,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
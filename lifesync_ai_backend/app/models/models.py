@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, Float, JSON, Index, LargeBinary, UniqueConstraint, text
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -37,6 +37,11 @@ class Task(Base):
     ai_suggested_time = Column(DateTime(timezone=True))
     completion_percentage = Column(Float, default=0.0)
     tags = Column(JSON)  # Array of tags
+    embedding = deferred(Column(LargeBinary))  # unit-length float32 title embedding
+    recurrence = Column(JSON(none_as_null=True))  # rule making this task a template for repeating occurrences
+    recurrence_parent_id = Column(Integer, ForeignKey("tasks.id", ondelete="SET NULL"), index=True)  # template of a materialized occurrence
+    occurrence_start = Column(DateTime(timezone=True))  # the occurrence this row materializes
+    duplicate_of = Column(Integer, ForeignKey("tasks.id", ondelete="SET NULL"))  # voice-created task that looks like this existing one
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True))
@@ -44,6 +49,43 @@ class Task(Base):
     # Relationships
     owner = relationship("User", back_populates="tasks")
     check_ins = relationship("TaskCheckIn", back_populates="task")
+    tag_rows = relationship("TaskTag", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Persisted schedule lookups walk a user's slots in start order
+        Index("ix_tasks_user_suggested_time", "user_id", "ai_suggested_time"),
+        # Calendar ranges: the INCLUDE columns let PostgreSQL answer them with an index-only scan
+        Index(
+            "ix_tasks_user_due_date", "user_id", "due_date",
+            postgresql_include=["title", "status", "priority", "estimated_duration", "ai_suggested_time"],
+            postgresql_where=text("recurrence IS NULL"),
+            sqlite_where=text("recurrence IS NULL")
+        ),
+        UniqueConstraint("recurrence_parent_id", "occurrence_start", name="uq_tasks_occurrence"),
+    )
+
+class TaskTag(Base):
+    __tablename__ = "task_tags"
+    
+    # Normalized copy of Task.tags so tag filters and counts are index scans instead of JSON decoding
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)  # lowercased, trimmed
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_task_tags_user_tag", "user_id", "tag", "task_id"),
+    )
+
+class DurationStat(Base):
+    __tablename__ = "duration_stats"
+    
+    # Exponentially weighted statistics of log(actual_duration) per user, overall (tag "*") and per tag
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tag = Column(String, primary_key=True)
+    samples = Column(Integer, nullable=False, default=0)
+    log_mean = Column(Float, nullable=False, default=0.0)
+    log_var = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class TaskCheckIn(Base):
     __tablename__ = "task_check_ins"
@@ -73,6 +115,43 @@ class MoodEntry(Base):
     
     # Relationships
     user = relationship("User", back_populates="mood_entries")
+    tag_rows = relationship("MoodTag", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_mood_entries_user_created", "user_id", "created_at"),
+    )
+
+class MoodTag(Base):
+    __tablename__ = "mood_tags"
+    
+    # Normalized copy of MoodEntry.tags, as for task_tags
+    entry_id = Column(Integer, ForeignKey("mood_entries.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_mood_tags_user_tag", "user_id", "tag", "entry_id"),
+    )
+
+class MoodRollup(Base):
+    __tablename__ = "mood_rollups"
+    
+    # Running per-day and per-week aggregates of a user's mood entries, updated as entries are written
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String(4), primary_key=True)  # day, week
+    period_start = Column(Date, primary_key=True)  # the day, or the Monday of the week, in the user's timezone
+    entry_count = Column(Integer, nullable=False, default=0)
+    mood_sum = Column(Integer, nullable=False, default=0)
+    mood_min = Column(Integer)
+    mood_max = Column(Integer)
+    energy_sum = Column(Integer, nullable=False, default=0)
+    energy_min = Column(Integer)
+    energy_max = Column(Integer)
+    stress_count = Column(Integer, nullable=False, default=0)  # stress is optional per entry
+    stress_sum = Column(Integer, nullable=False, default=0)
+    stress_min = Column(Integer)
+    stress_max = Column(Integer)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class Document(Base):
     __tablename__ = "documents"
@@ -82,6 +161,7 @@ class Document(Base):
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer)
+    content_hash = Column(String(64), ForeignKey("document_blobs.content_hash"), index=True)  # SHA-256 of the file
     document_type = Column(String)  # syllabus, schedule, notes, etc.
     processed = Column(Boolean, default=False)
     extracted_content = Column(Text)
@@ -92,14 +172,53 @@ class Document(Base):
     
     # Relationships
     user = relationship("User", back_populates="documents")
+    blob = relationship("DocumentBlob", back_populates="documents")
+
+class DocumentBlob(Base):
+    __tablename__ = "document_blobs"
+    
+    # Uploaded files are stored once per unique content and shared by every Document that references them
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 hex digest
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer)
+    ref_count = Column(Integer, nullable=False, default=0)
+    extracted_content = Column(Text)
+    extracted_tasks = Column(JSON)
+    processing_status = Column(String, default="pending")  # pending, processing, completed, failed
+    claimed_at = Column(DateTime(timezone=True))  # when a worker took the processing claim
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+    
+    # Relationships
+    documents = relationship("Document", back_populates="blob")
 
 class AIInteraction(Base):
     __tablename__ = "ai_interactions"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    interaction_type = Column(String)  # task_suggestion, schedule_optimization, voice_command
+    interaction_type = Column(String)  # schedule_optimization, voice_command, document_extraction, wellness_suggestion, embedding
     input_data = Column(JSON)
     ai_response = Column(JSON)
+    model = Column(String)
+    latency_ms = Column(Float)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    used_fallback = Column(Boolean, default=False)  # the model was unreachable or its reply unusable
     feedback_score = Column(Integer)  # User feedback on AI suggestion
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    # Voice parsing and schedule optimization requests run in job mode (202 + polling) instead of holding the request open
+    id = Column(String(32), primary_key=True)  # uuid4 hex, handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False)  # voice, schedule
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    payload = Column(JSON)  # the request body the job was created from
+    result = Column(JSON)  # the response the synchronous endpoint would have returned
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))  # when a worker claimed it
+    finished_at = Column(DateTime(timezone=True))
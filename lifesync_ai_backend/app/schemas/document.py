@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+class Document(BaseModel):
+    id: int
+    user_id: int
+    filename: str
+    file_size: Optional[int] = None
+    document_type: Optional[str] = None
+    processed: bool
+    processing_status: str
+    extracted_tasks: Optional[List[Dict[str, Any]]] = None
+    uploaded_at: datetime
+    processed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class DocumentContent(Document):
+    extracted_content: Optional[str] = None
@@ -1,6 +1,13 @@
 from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Optional, List, Union
+
+class RecurrenceRule(BaseModel):
+    freq: str  # daily, weekly, monthly
+    interval: int = 1
+    byweekday: Optional[List[Union[int, str]]] = None  # weekly only: 0-6 (Monday first) or day names
+    until: Optional[date] = None
+    count: Optional[int] = None
 
 class TaskBase(BaseModel):
     title: str
@@ -9,6 +16,7 @@ class TaskBase(BaseModel):
     priority: int = 1
     estimated_duration: Optional[int] = None
     tags: Optional[List[str]] = None
+    recurrence: Optional[RecurrenceRule] = None  # makes this task a template; due_date is the first occurrence
 
 class TaskCreate(TaskBase):
     pass
@@ -23,6 +31,7 @@ class TaskUpdate(BaseModel):
     actual_duration: Optional[int] = None
     completion_percentage: Optional[float] = None
     tags: Optional[List[str]] = None
+    recurrence: Optional[RecurrenceRule] = None
 
 class Task(TaskBase):
     id: int
@@ -33,6 +42,9 @@ class Task(TaskBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    duplicate_of: Optional[int] = None  # set on voice-created tasks that look like an existing task
+    recurrence_parent_id: Optional[int] = None
+    occurrence_start: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -46,3 +58,45 @@ class TaskCheckInCreate(BaseModel):
 class VoiceTaskInput(BaseModel):
     voice_text: str
     context: Optional[str] = None  # Additional context for better parsing
+    merge_duplicates: bool = True  # merge near-duplicates into the existing task instead of flagging them
+
+class SearchResult(BaseModel):
+    type: str  # task or document
+    id: int
+    title: str
+    status: Optional[str] = None
+    rank: float
+    title_highlight: Optional[str] = None  # HTML-escaped title with matches wrapped in <mark></mark>
+    snippet: Optional[str] = None  # best-matching fragment of the description or document text, escaped the same way
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+class TaskOccurrence(BaseModel):
+    template_id: int
+    occurrence_key: str  # identifies the occurrence in /tasks/{template_id}/occurrences/{occurrence_key}
+    occurrence_start: datetime
+    task_id: Optional[int] = None  # set once the occurrence has been checked in or edited
+    title: str
+    description: Optional[str] = None
+    priority: Optional[int] = None
+    estimated_duration: Optional[int] = None
+    tags: Optional[List[str]] = None
+    status: str
+    ai_suggested_time: Optional[datetime] = None
+
+class CalendarEntry(BaseModel):
+    id: Optional[int] = None  # None for a recurring occurrence that has not been materialized yet
+    template_id: Optional[int] = None
+    occurrence_key: Optional[str] = None
+    title: str
+    status: str
+    priority: Optional[int] = None
+    due_date: datetime  # in the user's timezone
+    estimated_duration: Optional[int] = None
+    ai_suggested_time: Optional[datetime] = None
+
+class CalendarDay(BaseModel):
+    date: date
+    tasks: List[CalendarEntry]
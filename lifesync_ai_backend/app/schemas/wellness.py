@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 
 class MoodEntryCreate(BaseModel):
@@ -16,3 +16,22 @@ class MoodEntry(MoodEntryCreate):
     
     class Config:
         from_attributes = True
+
+class MoodStats(BaseModel):
+    mean: float
+    min: int
+    max: int
+
+class MoodTrendPoint(BaseModel):
+    period_start: date  # the day, or the Monday of the week
+    count: int
+    mood: Optional[MoodStats] = None
+    energy: Optional[MoodStats] = None
+    stress: Optional[MoodStats] = None
+
+class RollingMoodAverage(BaseModel):
+    date: date
+    count: int  # entries inside the window
+    mood: Optional[float] = None
+    energy: Optional[float] = None
+    stress: Optional[float] = None
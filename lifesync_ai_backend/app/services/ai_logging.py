@@ -0,0 +1,95 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import AIInteraction
+
+# The user an AI call is made for; set by get_current_user for requests and by workers for their jobs
+interaction_user_id: ContextVar[Optional[int]] = ContextVar("interaction_user_id", default=None)
+
+
+def write_interactions(rows: List[Dict[str, Any]]) -> None:
+    """Insert a batch of AIInteraction rows in one statement"""
+    # ai_interactions.user_id is required; calls made outside any user's context are not kept
+    rows = [row for row in rows if row["user_id"] is not None]
+    if not rows:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(insert(AIInteraction), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+class InteractionLog:
+    """Write-behind buffer for AIInteraction rows.
+
+    record() only appends to a bounded in-memory queue; a background task on
+    the same event loop writes batches when `batch_size` rows are waiting or
+    `flush_seconds` after the oldest one arrived. When the queue is full
+    (e.g. the database is down) new rows are dropped and counted instead.
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch: List[Dict[str, Any]] = []
+
+    def record(self, **row: Any) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First call, or a new loop (workers run one asyncio.run per job)
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._batch = []
+            loop.create_task(self._run(self._queue))
+        row.setdefault("user_id", interaction_user_id.get())
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while queue is self._queue:
+            self._batch.append(await queue.get())
+            deadline = loop.time() + self.flush_seconds
+            while len(self._batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._write()
+
+    async def _write(self) -> None:
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(write_interactions, batch)
+        except Exception as e:
+            print(f"AI interaction logging error: {e}")
+            self.dropped += len(batch)
+
+    async def flush(self) -> None:
+        """Write everything buffered on the current loop now (before a worker's loop or the app shuts down)"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        while not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+        await self._write()
+
+
+interaction_log = InteractionLog(settings.ai_log_batch_size, settings.ai_log_flush_seconds, settings.ai_log_max_pending)
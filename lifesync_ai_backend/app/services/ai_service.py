@@ -1,14 +1,101 @@
 import httpx
-from typing import List, Dict, Any
+import numpy as np
+import time
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
+import calendar
 from app.core.config import settings
+from app.services.mood_analytics import user_timezone
+from app.services.scheduler import LocalScheduler
+from app.services.embeddings import hashed_embedding
+from app.services.ai_logging import interaction_log, interaction_user_id
+from app.services.rate_limit import ollama_queue
+from app.core.metrics import AI_UPSTREAM_LATENCY
+from app.core.tracing import current_span, record_span, span, trace_headers, traced
 
 class AIService:
     def __init__(self):
         self.ollama_base_url = settings.ollama_base_url
         self.ollama_model = settings.ollama_model
+        self.embedding_model = settings.ollama_embedding_model
     
+    async def _generate(
+        self, interaction_type: str, prompt: str, options: Dict[str, Any], timeout: float
+    ) -> Optional[Dict[str, Any]]:
+        """Send a prompt to Ollama and return the JSON object in its reply, or None so the caller falls back.
+
+        Every call is logged as an AIInteraction (written behind, off the request path).
+        """
+        # The calling method's span started before it built the prompt, so the gap until now is that phase
+        record_span("ai.build_prompt", current_span().start_ns, attributes={"ai.prompt_chars": len(prompt)})
+        started = time.perf_counter()
+        output, usage, parsed, timed_out = None, {}, None, False
+        try:
+            # Ollama's capacity is shared between users in turn; time spent queueing is not upstream latency
+            async with ollama_queue.slot(interaction_user_id.get()):
+                started = time.perf_counter()
+                with span("ollama.generate", {"ai.model": self.ollama_model, "ai.interaction_type": interaction_type}, kind="client") as request_span:
+                    async with httpx.AsyncClient() as client:
+                        response = await client.post(
+                            f"{self.ollama_base_url}/api/generate",
+                            json={
+                                "model": self.ollama_model,
+                                "prompt": prompt,
+                                "stream": False,
+                                "options": options
+                            },
+                            headers=trace_headers(),
+                            timeout=timeout
+                        )
+                    request_span.set_attribute("http.response.status_code", response.status_code)
+            
+            if response.status_code == 200:
+                with span("ai.parse_response") as parse_span:
+                    usage = response.json()
+                    output = usage.get("response", "")
+                    parse_span.set_attribute("ai.prompt_tokens", usage.get("prompt_eval_count"))
+                    parse_span.set_attribute("ai.completion_tokens", usage.get("eval_count"))
+                    parsed = self._extract_json(output)
+                    if parsed is None:
+                        print(f"JSON parsing error ({interaction_type}): no JSON found in response")
+            else:
+                print(f"Ollama API error: {response.status_code}")
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"JSON parsing error ({interaction_type}): {e}")
+        except httpx.TimeoutException as e:
+            timed_out = True
+            print(f"AI service timeout ({interaction_type}): {e}")
+        except Exception as e:
+            print(f"AI service error ({interaction_type}): {e}")
+        
+        current_span().set_attribute("ai.used_fallback", parsed is None)
+        elapsed = time.perf_counter() - started
+        AI_UPSTREAM_LATENCY.observe(
+            elapsed, interaction_type, "success" if parsed is not None else "timeout" if timed_out else "fallback"
+        )
+        interaction_log.record(
+            interaction_type=interaction_type,
+            model=self.ollama_model,
+            input_data={"prompt": prompt, "options": options},
+            ai_response=parsed if parsed is not None else {"raw_output": output},
+            latency_ms=round(elapsed * 1000, 1),
+            prompt_tokens=usage.get("prompt_eval_count"),
+            completion_tokens=usage.get("eval_count"),
+            used_fallback=parsed is None
+        )
+        return parsed
+    
+    def _extract_json(self, output: str) -> Optional[Dict[str, Any]]:
+        """The JSON object in a model reply, or None if there is none (raises ValueError if it is malformed)"""
+        # Clean the response - sometimes models include extra text
+        json_start = output.find('{')
+        json_end = output.rfind('}') + 1
+        if json_start != -1 and json_end != 0:
+            return json.loads(output[json_start:json_end])
+        return None
+    
+    @traced("ai.optimize_daily_schedule")
     async def optimize_daily_schedule(
         self, 
         tasks: List[Dict], 
@@ -22,8 +109,13 @@ class AIService:
         - User's productivity patterns
         - Current mood and energy
         - Historical completion data
+
+        The deterministic local scheduler runs first; its draft is handed to the
+        model to refine and is returned as-is whenever the model is unavailable.
         """
         
+        draft = LocalScheduler(user_preferences).schedule(tasks, current_time, mood_data=mood_data)
+        
         prompt = f"""You are LifeSync AI, an expert productivity assistant. Analyze and optimize this user's daily schedule.
 
 Current Time: {current_time}
@@ -31,6 +123,9 @@ Current Time: {current_time}
 Tasks to schedule:
 {json.dumps(tasks, indent=2, default=str)}
 
+Draft schedule (already free of overlaps and within working hours and due dates):
+{json.dumps(draft["optimized_schedule"], indent=2)}
+
 User Preferences:
 {json.dumps(user_preferences, indent=2)}
 
@@ -63,56 +158,22 @@ Please provide an optimized schedule with the following JSON format:
 }}
 
 Focus on:
-1. Matching high-energy tasks with user's peak productivity times
-2. Balancing work intensity throughout the day
-3. Including appropriate breaks
-4. Considering task priorities and deadlines
-5. Factoring in current mood and energy levels
+1. Refining the draft schedule rather than starting over; keep every task, leave tasks with a fixed_time at that time and do not create overlaps
+2. Matching high-energy tasks with user's peak productivity times
+3. Balancing work intensity throughout the day
+4. Including appropriate breaks
+5. Considering task priorities and deadlines
+6. Factoring in current mood and energy levels
 
 Respond only with valid JSON."""
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/generate",
-                    json={
-                        "model": self.ollama_model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.7,
-                            "top_p": 0.9,
-                            "max_tokens": 1500
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    ollama_response = response.json()
-                    ai_output = ollama_response.get("response", "")
-                    
-                    # Try to parse JSON from the response
-                    try:
-                        # Clean the response - sometimes models include extra text
-                        json_start = ai_output.find('{')
-                        json_end = ai_output.rfind('}') + 1
-                        if json_start != -1 and json_end != 0:
-                            clean_json = ai_output[json_start:json_end]
-                            return json.loads(clean_json)
-                        else:
-                            raise ValueError("No JSON found in response")
-                    except (json.JSONDecodeError, ValueError) as e:
-                        print(f"JSON parsing error: {e}")
-                        return self._fallback_scheduling(tasks, user_preferences)
-                else:
-                    print(f"Ollama API error: {response.status_code}")
-                    return self._fallback_scheduling(tasks, user_preferences)
-                    
-        except Exception as e:
-            print(f"AI service error: {e}")
-            return self._fallback_scheduling(tasks, user_preferences)
+        ai_result = await self._generate(
+            "schedule_optimization", prompt, {"temperature": 0.7, "top_p": 0.9, "max_tokens": 1500}, timeout=30.0
+        )
+        fixed_ids = {task.get("id") for task in tasks if task.get("fixed_time")}
+        return self._merge_with_draft(ai_result, draft, fixed_ids) if ai_result is not None else draft
     
+    @traced("ai.parse_voice_input")
     async def parse_voice_input(self, voice_text: str, context: str = None) -> Dict[str, Any]:
         """Parse natural language input using Ollama to extract tasks and intentions"""
         
@@ -151,7 +212,8 @@ Extract tasks and return in this exact JSON format:
             "priority": 1-5,
             "estimated_duration": minutes_or_null,
             "due_date": "YYYY-MM-DD" or null,
-            "tags": ["tag1", "tag2"]
+            "tags": ["tag1", "tag2"],
+            "recurrence": {{"freq": "daily|weekly|monthly", "interval": 1, "byweekday": [0-6, Monday=0]}} or null
         }}
     ],
     "confidence": 0.0-1.0,
@@ -194,45 +256,58 @@ Focus on:
 
 Respond only with valid JSON."""
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/generate",
-                    json={
-                        "model": self.ollama_model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.3,  # Lower temperature for more consistent parsing
-                            "max_tokens": 1000  # Increased for context analysis
-                        }
-                    },
-                    timeout=20.0  # Increased timeout for context processing
-                )
-                
-                if response.status_code == 200:
-                    ollama_response = response.json()
-                    ai_output = ollama_response.get("response", "")
-                    
-                    try:
-                        # Extract JSON from response
-                        json_start = ai_output.find('{')
-                        json_end = ai_output.rfind('}') + 1
-                        if json_start != -1 and json_end != 0:
-                            clean_json = ai_output[json_start:json_end]
-                            return json.loads(clean_json)
-                        else:
-                            raise ValueError("No JSON found")
-                    except (json.JSONDecodeError, ValueError):
-                        # Fallback parsing with context
-                        return self._fallback_voice_parsing_with_context(voice_text, context)
-                else:
-                    return self._fallback_voice_parsing_with_context(voice_text, context)
-                    
-        except Exception as e:
-            print(f"Voice parsing error: {e}")
+        ai_result = await self._generate(
+            "voice_command", prompt,
+            {
+                "temperature": 0.3,  # Lower temperature for more consistent parsing
+                "max_tokens": 1000  # Increased for context analysis
+            },
+            timeout=20.0  # Increased timeout for context processing
+        )
+        if ai_result is None:
+            # Fallback parsing with context
             return self._fallback_voice_parsing_with_context(voice_text, context)
+        return ai_result
+    
+    @traced("ai.extract_tasks_from_document")
+    async def extract_tasks_from_document(self, text: str, document_type: str = None) -> Dict[str, Any]:
+        """Extract deadlines and actionable tasks from uploaded document text (syllabi, schedules, notes)"""
+        
+        prompt = f"""You are a task extraction AI. Read this {document_type or "document"} and list every deadline, exam, assignment and other actionable item.
+
+Document Text:
+---
+{text[:12000]}
+---
+
+Extract tasks and return in this exact JSON format:
+{{
+    "tasks": [
+        {{
+            "title": "concise task title",
+            "description": "relevant details from the document",
+            "priority": 1-5,
+            "estimated_duration": minutes_or_null,
+            "due_date": "YYYY-MM-DD" or null,
+            "tags": ["tag1", "tag2"]
+        }}
+    ],
+    "confidence": 0.0-1.0
+}}
+
+Guidelines:
+- Use concise, actionable titles (3-8 words max)
+- Exams, finals and major projects are priority 4-5; readings and small assignments are 2-3
+- Only include due dates that appear in the document
+
+Respond only with valid JSON."""
+
+        ai_result = await self._generate(
+            "document_extraction", prompt, {"temperature": 0.2, "max_tokens": 2000}, timeout=60.0
+        )
+        return ai_result if ai_result is not None else self._fallback_document_task_extraction(text)
     
+    @traced("ai.suggest_wellness_actions")
     async def suggest_wellness_actions(
         self, 
         mood_level: int, 
@@ -276,42 +351,66 @@ Guidelines:
 
 Respond only with valid JSON."""
 
+        ai_result = await self._generate(
+            "wellness_suggestion", prompt, {"temperature": 0.6, "max_tokens": 600}, timeout=15.0
+        )
+        return ai_result if ai_result is not None else self._fallback_wellness_suggestions(mood_level, energy_level, stress_level)
+    
+    @traced("ai.embed_texts")
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with Ollama in one request, one row per text"""
+        
+        if not texts:
+            return np.zeros((0, settings.embedding_dim), dtype=np.float32)
+        
+        started = time.perf_counter()
+        usage, vectors, timed_out = {}, None, False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/generate",
-                    json={
-                        "model": self.ollama_model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.6,
-                            "max_tokens": 600
-                        }
-                    },
-                    timeout=15.0
-                )
+            async with ollama_queue.slot(interaction_user_id.get()):
+                started = time.perf_counter()
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        f"{self.ollama_base_url}/api/embed",
+                        json={
+                            "model": self.embedding_model,
+                            "input": texts
+                        },
+                        headers=trace_headers(),
+                        timeout=10.0
+                    )
                 
-                if response.status_code == 200:
-                    ollama_response = response.json()
-                    ai_output = ollama_response.get("response", "")
-                    
-                    try:
-                        json_start = ai_output.find('{')
-                        json_end = ai_output.rfind('}') + 1
-                        if json_start != -1 and json_end != 0:
-                            clean_json = ai_output[json_start:json_end]
-                            return json.loads(clean_json)
-                        else:
-                            raise ValueError("No JSON found")
-                    except (json.JSONDecodeError, ValueError):
-                        return self._fallback_wellness_suggestions(mood_level, energy_level, stress_level)
-                else:
-                    return self._fallback_wellness_suggestions(mood_level, energy_level, stress_level)
-                    
+                    if response.status_code == 200:
+                        usage = response.json()
+                        embeddings = usage.get("embeddings") or []
+                        if len(embeddings) == len(texts):
+                            vectors = np.asarray(embeddings, dtype=np.float32)
+                
+        except httpx.TimeoutException as e:
+            timed_out = True
+            print(f"Embedding timeout: {e}")
         except Exception as e:
-            print(f"Wellness suggestion error: {e}")
-            return self._fallback_wellness_suggestions(mood_level, energy_level, stress_level)
+            print(f"Embedding error: {e}")
+        
+        elapsed = time.perf_counter() - started
+        used_fallback = vectors is None
+        current_span().set_attribute("ai.texts", len(texts))
+        current_span().set_attribute("ai.used_fallback", used_fallback)
+        AI_UPSTREAM_LATENCY.observe(
+            elapsed, "embedding", "timeout" if timed_out else "fallback" if used_fallback else "success"
+        )
+        if used_fallback:
+            vectors = self._fallback_embeddings(texts)
+        interaction_log.record(
+            interaction_type="embedding",
+            model=self.embedding_model,
+            input_data={"texts": texts},
+            ai_response={"count": len(vectors), "dim": int(vectors.shape[1])},
+            latency_ms=round(elapsed * 1000, 1),
+            prompt_tokens=usage.get("prompt_eval_count"),
+            completion_tokens=None,
+            used_fallback=used_fallback
+        )
+        return vectors
     
     def _fallback_voice_parsing(self, voice_text: str) -> Dict[str, Any]:
         """Simple fallback for voice input parsing when AI is unavailable"""
@@ -370,6 +469,7 @@ Respond only with valid JSON."""
             "parsing_notes": "Fallback parsing used"
         }
     
+    @traced("ai.fallback_voice_parsing")
     def _fallback_voice_parsing_with_context(self, voice_text: str, context: str = None) -> Dict[str, Any]:
         """Enhanced fallback parsing that considers conversation context"""
         
@@ -441,6 +541,47 @@ Respond only with valid JSON."""
             "conversation_analysis": context_analysis or "No conversation context provided"
         }
     
+    def _fallback_document_task_extraction(self, text: str) -> Dict[str, Any]:
+        """Line-based fallback: keep lines that mention coursework keywords and carry a date"""
+        
+        keywords = [
+            'due', 'deadline', 'exam', 'midterm', 'final', 'quiz', 'assignment',
+            'homework', 'project', 'paper', 'essay', 'presentation', 'lab', 'report'
+        ]
+        tasks = []
+        
+        for line in text.splitlines():
+            line = line.strip(" \t-*•")
+            if not line or len(line) > 200:
+                continue
+            line_lower = line.lower()
+            if not any(keyword in line_lower for keyword in keywords):
+                continue
+            
+            due_date = self._extract_date_from_text(line)
+            if due_date is None:
+                continue
+            
+            priority = 5 if any(word in line_lower for word in ['exam', 'midterm', 'final']) else 3
+            tasks.append({
+                "title": self._create_concise_title(line),
+                "description": line,
+                "priority": priority,
+                "estimated_duration": None,
+                "due_date": due_date,
+                "tags": []
+            })
+        
+        return {
+            "tasks": tasks,
+            "confidence": 0.5,
+            "parsing_notes": "Fallback parsing used"
+        }
+    
+    def _fallback_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Deterministic local embeddings when Ollama is unavailable"""
+        return np.stack([hashed_embedding(text, settings.embedding_dim) for text in texts])
+    
     def _create_concise_title(self, task_text: str) -> str:
         """Create a concise, actionable task title from voice input"""
         import re
@@ -586,11 +727,9 @@ Respond only with valid JSON."""
             return next_week.strftime('%Y-%m-%d')
 
         if 'next month' in text_lower:
-            # Simple next month calculation
-            if today.month == 12:
-                next_month = datetime(today.year + 1, 1, today.day)
-            else:
-                next_month = datetime(today.year, today.month + 1, today.day)
+            # Same day next month, or its last day when next month is shorter (January 31 -> February 28/29)
+            year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+            next_month = datetime(year, month, min(today.day, calendar.monthrange(year, month)[1]))
             return next_month.strftime('%Y-%m-%d')
 
         # Pattern 3: "in X days"
@@ -701,57 +840,30 @@ Respond only with valid JSON."""
             "focus_area": focus_area
         }
     
-    def _fallback_scheduling(self, tasks: List[Dict], preferences: Dict) -> Dict[str, Any]:
-        """Simple fallback scheduling when Ollama is unavailable"""
+    @traced("ai.merge_with_draft")
+    def _merge_with_draft(self, ai_result: Dict[str, Any], draft: Dict[str, Any], fixed_ids: frozenset = frozenset()) -> Dict[str, Any]:
+        """Keep the model's refinements but restore any task it dropped from the draft schedule"""
         
-        # Sort by priority and due date
-        sorted_tasks = sorted(
-            tasks, 
-            key=lambda x: (-x.get('priority', 1), x.get('due_date', '9999-12-31'))
-        )
+        if not isinstance(ai_result, dict) or not isinstance(ai_result.get("optimized_schedule"), list):
+            return draft
         
-        schedule = []
-        current_time = datetime.now()
-        
-        # Get user's peak productivity time
-        peak_time = preferences.get('productivity_peak', 'morning')
+        # Fixed-time tasks always keep their draft slot, wherever the model put them
+        ai_result["optimized_schedule"] = [
+            item for item in ai_result["optimized_schedule"]
+            if not isinstance(item, dict) or item.get("task_id") not in fixed_ids
+        ]
+        scheduled_ids = {
+            item.get("task_id") for item in ai_result["optimized_schedule"] if isinstance(item, dict)
+        }
+        for item in draft["optimized_schedule"]:
+            if item["task_id"] not in scheduled_ids:
+                ai_result["optimized_schedule"].append(item)
         
-        for i, task in enumerate(sorted_tasks):
-            # Calculate suggested time based on user preferences
-            if peak_time == 'morning':
-                suggested_hour = 9 + i  # Start at 9 AM
-            elif peak_time == 'afternoon':
-                suggested_hour = 13 + i  # Start at 1 PM
-            else:  # evening
-                suggested_hour = 18 + i  # Start at 6 PM
-            
-            suggested_time = current_time.replace(
-                hour=min(suggested_hour, 22),  # Don't go past 10 PM
-                minute=0,
-                second=0,
-                microsecond=0
-            )
-            
-            schedule.append({
-                "task_id": task.get('id'),
-                "suggested_time": suggested_time.isoformat(),
-                "duration_minutes": task.get('estimated_duration', 60),
-                "reasoning": f"Scheduled during {peak_time} productivity window"
-            })
+        ai_result.setdefault("break_suggestions", draft["break_suggestions"])
+        ai_result.setdefault("unscheduled_task_ids", draft["unscheduled_task_ids"])
+        return ai_result
+    
+    def _fallback_scheduling(self, tasks: List[Dict], preferences: Dict) -> Dict[str, Any]:
+        """Local constraint-based scheduling when Ollama is unavailable"""
         
-        return {
-            "optimized_schedule": schedule,
-            "break_suggestions": [
-                {
-                    "time": (current_time + timedelta(hours=2)).isoformat(),
-                    "duration_minutes": 15,
-                    "type": "short_break"
-                }
-            ],
-            "wellness_recommendations": [
-                "Stay hydrated throughout the day",
-                "Take breaks every 2 hours"
-            ],
-            "schedule_insights": f"Tasks scheduled for {peak_time} based on your preferences",
-            "ai_confidence": 0.7
-        }
+        return LocalScheduler(preferences).schedule(tasks, datetime.now(user_timezone(preferences)))
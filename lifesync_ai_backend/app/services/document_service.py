@@ -0,0 +1,469 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.models import Document, DocumentBlob
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt", ".md"}
+
+PAGE_BATCH_SIZE = 4  # pages extracted per pool task
+MIN_PARALLEL_PAGES = 8  # smaller PDFs are not worth the pool round trip
+DOCX_PARAGRAPHS_PER_PAGE = 40
+MAX_CONCURRENT_EXTRACTIONS = 2  # LLM calls in flight per document
+PAGE_CACHE_PRUNE_TO = 0.9  # share of page_cache_max_mb left after pruning
+# Parts of a page's resources that cannot change its extracted text: the page tree
+# back-reference and embedded font programs (text comes from encodings and ToUnicode maps)
+FINGERPRINT_SKIPPED_KEYS = {"/Parent", "/FontFile", "/FontFile2", "/FontFile3"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_page_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _page_cache_dir() -> str:
+    return settings.page_cache_dir or os.path.join(settings.upload_dir, ".page_cache")
+
+
+def _page_cache_path(fingerprint: str) -> str:
+    return os.path.join(_page_cache_dir(), fingerprint[:2], f"{fingerprint}.txt")
+
+
+def _read_cached_page(fingerprint: str) -> Optional[str]:
+    path = _page_cache_path(fingerprint)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(path)  # recently used pages are the last to be pruned
+    except OSError:
+        return None
+    return text
+
+
+def _write_cached_page(fingerprint: str, text: str) -> None:
+    path = _page_cache_path(fingerprint)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.{os.getpid()}.part"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(partial_path, path)
+
+
+def _prune_page_cache() -> None:
+    """Delete the least recently used cached pages once the cache outgrows page_cache_max_mb"""
+    limit = settings.page_cache_max_mb * 1024 * 1024
+    entries = []
+    total = 0
+    for root, _, names in os.walk(_page_cache_dir()):
+        for name in names:
+            if not name.endswith(".txt"):
+                continue  # another worker's page still being written
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= limit:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit * PAGE_CACHE_PRUNE_TO:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _hash_pdf_object(digest, obj, seen: Dict[Tuple[int, int], int]) -> None:
+    """Feed a PDF object into `digest` by value: references resolved, stream data included"""
+    from PyPDF2.generic import IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        reference = (obj.idnum, obj.generation)
+        if reference in seen:
+            # Shared (e.g. a font used by the page and its forms) or cyclic; its value is already in the digest
+            digest.update(f"<{seen[reference]}>".encode())
+            return
+        seen[reference] = len(seen)
+        obj = obj.get_object()
+
+    if isinstance(obj, dict):
+        digest.update(b"{")
+        for key in sorted(obj):
+            if key not in FINGERPRINT_SKIPPED_KEYS:
+                digest.update(f"{key}:".encode())
+                _hash_pdf_object(digest, obj[key], seen)
+        digest.update(b"}")
+        # Image data never contributes text; everything else (ToUnicode maps, form content) does
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            digest.update(obj.get_data())
+    elif isinstance(obj, list):
+        digest.update(b"[")
+        for item in obj:
+            _hash_pdf_object(digest, item, seen)
+        digest.update(b"]")
+    else:
+        digest.update(f"{type(obj).__name__}:{obj};".encode())
+
+
+def _pdf_page_fingerprint(page) -> str:
+    """Hash everything that determines a page's text: its content stream and its resolved resources.
+
+    Fonts are hashed with their encodings and ToUnicode maps, and Form
+    XObjects with their own content and resources, so identical text from
+    different files shares a cache entry and nothing else does.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    seen: Dict[Tuple[int, int], int] = {}
+    for key in ("/Resources", "/Rotate"):
+        digest.update(f"{key}:".encode())
+        _hash_pdf_object(digest, page.get(key), seen)
+    return digest.hexdigest()
+
+
+def _extract_pdf_pages(file_path: str, page_numbers: List[int]) -> List[str]:
+    """Pool task: open the PDF in this process and extract a batch of pages"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    return [reader.pages[number].extract_text() or "" for number in page_numbers]
+
+
+def _get_page_executor() -> ProcessPoolExecutor:
+    # One pool per worker process, reused for every document it extracts
+    global _page_executor
+    if _page_executor is None:
+        _page_executor = ProcessPoolExecutor(max_workers=settings.extraction_workers)
+    return _page_executor
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """Yield page texts in order, serving unchanged pages from the cache and fanning the rest out to a pool"""
+    global _page_executor
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    fingerprints = [_pdf_page_fingerprint(page) for page in reader.pages]
+    cached = [_read_cached_page(fingerprint) for fingerprint in fingerprints]
+    missing = [number for number, text in enumerate(cached) if text is None]
+
+    # Daemonic workers (e.g. Celery prefork children) cannot start processes of their own
+    parallel = len(missing) >= MIN_PARALLEL_PAGES and not multiprocessing.current_process().daemon
+
+    if parallel:
+        batches = [missing[i:i + PAGE_BATCH_SIZE] for i in range(0, len(missing), PAGE_BATCH_SIZE)]
+        pending = _get_page_executor().map(_extract_pdf_pages, [file_path] * len(batches), batches)
+    else:
+        batches = [[number] for number in missing]
+        pending = ([reader.pages[number].extract_text() or ""] for number in missing)
+
+    extracted: Dict[int, str] = {}
+    batch_iter = iter(batches)
+    for number, text in enumerate(cached):
+        if text is None:
+            # Batches come back in submission order, so this page's batch is the next one
+            while number not in extracted:
+                try:
+                    page_texts = next(pending)
+                except BrokenProcessPool:
+                    _page_executor = None  # a pool process died; the next document gets a fresh pool
+                    raise
+                for page_number, page_text in zip(next(batch_iter), page_texts):
+                    extracted[page_number] = page_text
+                    _write_cached_page(fingerprints[page_number], page_text)
+            text = extracted.pop(number)
+        yield text
+
+    if missing:
+        _prune_page_cache()
+
+
+def iter_document_pages(file_path: str) -> Iterator[str]:
+    """Yield a document's text page by page (paragraph groups for DOCX, one page for plain text)"""
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == ".pdf":
+        yield from iter_pdf_pages(file_path)
+    elif extension == ".docx":
+        import docx
+
+        paragraphs = [paragraph.text for paragraph in docx.Document(file_path).paragraphs]
+        for i in range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_PAGE):
+            yield "\n".join(paragraphs[i:i + DOCX_PARAGRAPHS_PER_PAGE])
+    else:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            yield f.read()
+
+
+def extract_text(file_path: str) -> str:
+    """Extract plain text from a PDF, DOCX or text file"""
+    return "\n".join(iter_document_pages(file_path))
+
+
+async def extract_document(
+    file_path: str, document_type: str = None, user_id: int = None
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Extract text and tasks, sending each chunk to the LLM while later pages are still being extracted"""
+    from app.services.ai_service import AIService
+    from app.services.ai_logging import interaction_log, interaction_user_id
+
+    interaction_user_id.set(user_id)
+    ai_service = AIService()
+    loop = asyncio.get_running_loop()
+    limiter = asyncio.Semaphore(MAX_CONCURRENT_EXTRACTIONS)
+    chunk_chars = settings.extraction_chunk_chars
+    pages = iter_document_pages(file_path)
+
+    async def extract_chunk(chunk: str) -> Dict[str, Any]:
+        async with limiter:
+            return await ai_service.extract_tasks_from_document(chunk, document_type)
+
+    page_texts: List[str] = []
+    buffer: List[str] = []
+    pending = []
+
+    def flush() -> None:
+        chunk = "\n".join(buffer)
+        buffer.clear()
+        if chunk.strip():
+            pending.append(asyncio.create_task(extract_chunk(chunk)))
+
+    while True:
+        # Page extraction blocks on the pool, so pull pages off the event loop
+        page = await loop.run_in_executor(None, next, pages, None)
+        if page is None:
+            break
+        page_texts.append(page)
+        for start in range(0, len(page), chunk_chars):
+            piece = page[start:start + chunk_chars]
+            if buffer and sum(len(part) + 1 for part in buffer) + len(piece) > chunk_chars:
+                flush()
+            buffer.append(piece)
+    flush()
+
+    tasks: List[Dict[str, Any]] = []
+    seen = set()
+    for result in await asyncio.gather(*pending):
+        for task in result.get("tasks", []):
+            key = (str(task.get("title", "")).lower(), task.get("due_date"))
+            if key not in seen:
+                seen.add(key)
+                tasks.append(task)
+
+    # The worker's event loop ends with this job, so write its AI interactions now
+    await interaction_log.flush()
+    return "\n".join(page_texts), tasks
+
+
+def blob_path(content_hash: str, extension: str) -> str:
+    """Content-addressed location of an uploaded file"""
+    return os.path.join(settings.upload_dir, "blobs", content_hash[:2], f"{content_hash}{extension}")
+
+
+def acquire_blob(db: Session, content_hash: str, temp_path: str, file_size: int, extension: str) -> DocumentBlob:
+    """Take a reference on the blob for `content_hash`, storing `temp_path` as its file if it is new.
+
+    The temporary upload is either moved into place or discarded. The caller
+    commits, in the same transaction as the Document that holds the reference.
+    """
+    updated = db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).update(
+        {DocumentBlob.ref_count: DocumentBlob.ref_count + 1}, synchronize_session=False
+    )
+    if updated:
+        os.remove(temp_path)
+    else:
+        path = blob_path(content_hash, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        db.add(DocumentBlob(content_hash=content_hash, file_path=path, file_size=file_size, ref_count=1))
+        try:
+            db.flush()
+        except IntegrityError:
+            # A concurrent upload of the same content created it first; the files are identical
+            db.rollback()
+            db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).update(
+                {DocumentBlob.ref_count: DocumentBlob.ref_count + 1}, synchronize_session=False
+            )
+    return db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).first()
+
+
+def release_blob(db: Session, content_hash: str) -> Optional[str]:
+    """Drop one reference and delete the blob row once nothing points at it.
+
+    Returns the orphaned file's path for `remove_blob_file`, which the caller
+    runs only after committing, so a rolled back delete never loses the file.
+    """
+    db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).update(
+        {DocumentBlob.ref_count: DocumentBlob.ref_count - 1}, synchronize_session=False
+    )
+    blob = db.query(DocumentBlob).filter(
+        DocumentBlob.content_hash == content_hash, DocumentBlob.ref_count <= 0
+    ).with_for_update().first()
+    if blob is None:
+        return None
+    file_path = blob.file_path
+    db.delete(blob)
+    db.flush()
+    return file_path
+
+
+def remove_blob_file(db: Session, content_hash: str, file_path: Optional[str]) -> None:
+    """Delete a released blob's file, unless an upload of the same content has recreated the blob since"""
+    if file_path is None:
+        return
+    if db.query(DocumentBlob.content_hash).filter(DocumentBlob.content_hash == content_hash).first() is not None:
+        return
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def apply_blob_results(document: Document, blob: DocumentBlob) -> None:
+    """Copy a processed blob's shared extraction results onto a document that references it"""
+    document.extracted_content = blob.extracted_content
+    document.extracted_tasks = blob.extracted_tasks
+    document.processed = True
+    document.processing_status = "completed"
+    document.processed_at = blob.processed_at
+
+
+def _share_results(db: Session, blob: DocumentBlob) -> None:
+    db.query(Document).filter(
+        Document.content_hash == blob.content_hash,
+        Document.processing_status != "completed"
+    ).update({
+        Document.extracted_content: blob.extracted_content,
+        Document.extracted_tasks: blob.extracted_tasks,
+        Document.processed: True,
+        Document.processing_status: "completed",
+        Document.processed_at: blob.processed_at,
+    }, synchronize_session=False)
+
+
+def _claimable(now: datetime):
+    stale = now - timedelta(seconds=settings.document_lease_seconds)
+    return or_(
+        DocumentBlob.processing_status.in_(["pending", "failed"]),
+        and_(
+            DocumentBlob.processing_status == "processing",
+            or_(DocumentBlob.claimed_at.is_(None), DocumentBlob.claimed_at < stale)
+        )
+    )
+
+
+def process_document(document_id: int) -> None:
+    """Extract text and tasks for a document's content and share the results with every copy of it.
+
+    Runs inside a worker (local process pool or Celery), never on a request
+    worker, and uses its own database session. Extraction runs at most once
+    per unique file: the worker that claims the blob does the work and fills
+    in every Document referencing it; later jobs for a finished blob only copy.
+    """
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is None or document.content_hash is None:
+            return
+        content_hash = document.content_hash
+        document_type = document.document_type
+        user_id = document.user_id
+
+        # A claim older than the lease belongs to a worker that died mid-extraction
+        now = datetime.now(timezone.utc)
+        claimed = db.query(DocumentBlob).filter(
+            DocumentBlob.content_hash == content_hash,
+            _claimable(now)
+        ).update(
+            {DocumentBlob.processing_status: "processing", DocumentBlob.claimed_at: now},
+            synchronize_session=False
+        )
+        blob = db.query(DocumentBlob).filter(DocumentBlob.content_hash == content_hash).first()
+        if not claimed:
+            if blob is not None and blob.processing_status == "completed":
+                _share_results(db, blob)
+            # Otherwise another worker holds the claim and will share its results
+            db.commit()
+            return
+        db.query(Document).filter(Document.content_hash == content_hash).update(
+            {Document.processing_status: "processing"}, synchronize_session=False
+        )
+        db.commit()
+
+        try:
+            text, tasks = asyncio.run(extract_document(blob.file_path, document_type, user_id))
+        except Exception as e:
+            print(f"Document processing error ({document_id}): {e}")
+            blob.processing_status = "failed"
+            db.query(Document).filter(Document.content_hash == content_hash).update(
+                {Document.processing_status: "failed"}, synchronize_session=False
+            )
+            db.commit()
+            return
+
+        blob.extracted_content = text
+        blob.extracted_tasks = tasks
+        blob.processing_status = "completed"
+        blob.processed_at = datetime.utcnow()
+        db.flush()
+        _share_results(db, blob)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _init_worker_process() -> None:
+    # Forked workers must not reuse the parent's pooled database connections
+    engine.dispose(close=False)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.document_workers,
+            initializer=_init_worker_process
+        )
+    return _executor
+
+
+def enqueue_document(document_id: int) -> None:
+    """Hand a document to the configured worker pool without waiting for it"""
+    if settings.document_worker == "celery":
+        from app.worker import process_document_task
+
+        process_document_task.delay(document_id)
+    else:
+        _get_executor().submit(process_document, document_id)
+
+
+def requeue_stale_documents() -> int:
+    """Enqueue one document per blob left pending or abandoned mid-processing, e.g. by a restart"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Document.content_hash, Document.id).join(DocumentBlob).filter(
+            DocumentBlob.ref_count > 0, _claimable(datetime.now(timezone.utc)),
+            DocumentBlob.processing_status != "failed"
+        ).all()
+    finally:
+        db.close()
+    document_ids = {}
+    for content_hash, document_id in rows:
+        document_ids.setdefault(content_hash, document_id)
+    for document_id in document_ids.values():
+        enqueue_document(document_id)
+    return len(document_ids)
@@ -0,0 +1,126 @@
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, NamedTuple, Optional
+from sqlalchemy.orm import Session
+
+from app.models.models import DurationStat, Task, TaskCheckIn
+from app.services.scheduler import SLOT_GRANULARITY
+from app.services.tags import normalize_tags
+
+ALL_TAGS = "*"
+ALPHA = 0.2  # weight of the newest completion; roughly the last 10 completions matter
+MIN_SAMPLES = 3  # below this a tag (or user) falls back to the wider estimate
+MIN_DURATION = SLOT_GRANULARITY
+MAX_DURATION = 8 * 60
+CACHE_TTL = 60.0  # seconds before another process's updates are picked up
+
+
+class Estimate(NamedTuple):
+    samples: int
+    log_mean: float
+    log_var: float
+
+
+DurationModel = Dict[str, Estimate]
+
+# user_id -> (loaded at, model)
+_models: Dict[int, tuple] = {}
+
+
+def _ew_update(stat: DurationStat, value: float) -> None:
+    samples = stat.samples or 0
+    # Early on, average plainly so the first completions are not swamped by the zero start
+    alpha = max(ALPHA, 1.0 / (samples + 1))
+    diff = value - (stat.log_mean or 0.0)
+    increment = alpha * diff
+    stat.log_mean = (stat.log_mean or 0.0) + increment
+    stat.log_var = (1 - alpha) * ((stat.log_var or 0.0) + diff * increment)
+    stat.samples = samples + 1
+
+
+def record_completion(db: Session, task: Task) -> None:
+    """Fold a completed task's actual duration into the user's overall and per-tag estimates"""
+    if not task.actual_duration or task.actual_duration <= 0:
+        return
+    value = math.log(task.actual_duration)
+    keys = [ALL_TAGS] + normalize_tags(task.tags)
+
+    stats = {
+        stat.tag: stat
+        for stat in db.query(DurationStat).filter(
+            DurationStat.user_id == task.user_id, DurationStat.tag.in_(keys)
+        ).with_for_update()
+    }
+    for key in keys:
+        stat = stats.get(key)
+        if stat is None:
+            stat = DurationStat(user_id=task.user_id, tag=key, samples=0, log_mean=0.0, log_var=0.0)
+            db.add(stat)
+        _ew_update(stat, value)
+    _models.pop(task.user_id, None)
+
+
+def rebuild_duration_stats(db: Session, user_id: int) -> None:
+    """Replay every completed task in completion order, so a corrected actual duration replaces its old sample"""
+    db.query(DurationStat).filter(DurationStat.user_id == user_id).delete(synchronize_session="fetch")
+    stats: Dict[str, DurationStat] = {}
+    completed = db.query(Task.actual_duration, Task.tags).filter(
+        Task.user_id == user_id, Task.status == "completed", Task.actual_duration > 0
+    ).order_by(Task.completed_at, Task.id)
+    for actual_duration, tags in completed:
+        value = math.log(actual_duration)
+        for key in [ALL_TAGS] + normalize_tags(tags):
+            stat = stats.get(key)
+            if stat is None:
+                stat = stats[key] = DurationStat(user_id=user_id, tag=key, samples=0, log_mean=0.0, log_var=0.0)
+            _ew_update(stat, value)
+    db.add_all(stats.values())
+    _models.pop(user_id, None)
+
+
+def minutes_since_started(db: Session, task: Task) -> Optional[int]:
+    """Minutes from the task's latest "started" check-in until now, used as its actual duration"""
+    started = db.query(TaskCheckIn.created_at).filter(
+        TaskCheckIn.task_id == task.id, TaskCheckIn.user_response == "started"
+    ).order_by(TaskCheckIn.created_at.desc()).first()
+    if started is None or started[0] is None:
+        return None
+    started_at = started[0]
+    now = datetime.utcnow() if started_at.tzinfo is None else datetime.now(timezone.utc)
+    minutes = int((now - started_at).total_seconds() // 60)
+    return minutes if 0 < minutes <= 24 * 60 else None
+
+
+def load_duration_model(db: Session, user_id: int) -> DurationModel:
+    """The user's estimates keyed by tag, cached briefly in process"""
+    cached = _models.get(user_id)
+    if cached is not None and time.monotonic() - cached[0] < CACHE_TTL:
+        return cached[1]
+    model = {
+        tag: Estimate(samples, log_mean, log_var)
+        for tag, samples, log_mean, log_var in db.query(
+            DurationStat.tag, DurationStat.samples, DurationStat.log_mean, DurationStat.log_var
+        ).filter(DurationStat.user_id == user_id)
+    }
+    _models[user_id] = (time.monotonic(), model)
+    return model
+
+
+def predict_duration(model: DurationModel, tags: Optional[Iterable[str]] = None) -> Optional[int]:
+    """Typical duration in minutes for a task with these tags, or None without enough history.
+
+    Tags with enough completions are averaged in log space weighted by their sample
+    counts; otherwise the user's overall estimate is used.
+    """
+    estimates = [model[tag] for tag in normalize_tags(tags) if tag in model and model[tag].samples >= MIN_SAMPLES]
+    if not estimates:
+        overall = model.get(ALL_TAGS)
+        if overall is None or overall.samples < MIN_SAMPLES:
+            return None
+        estimates = [overall]
+
+    weight = sum(estimate.samples for estimate in estimates)
+    log_mean = sum(estimate.samples * estimate.log_mean for estimate in estimates) / weight
+    minutes = round(math.exp(log_mean) / SLOT_GRANULARITY) * SLOT_GRANULARITY
+    return min(max(minutes, MIN_DURATION), MAX_DURATION)
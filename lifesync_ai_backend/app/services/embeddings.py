@@ -0,0 +1,119 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.models import Task
+from app.services.rescheduler import ACTIVE_STATUSES
+
+_TOKEN_RE = re.compile(r"\w+")
+INDEX_CACHE_SIZE = 256  # users whose vector index is kept in memory, least recently used evicted first
+
+
+def hashed_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic local embedding: signed feature hashing of words and character trigrams.
+
+    Used whenever Ollama is unavailable, so near-identical phrasings ("Call mom",
+    "call my mom") still land close together without a model.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = _TOKEN_RE.findall(text.lower())
+    features = words + [f"#{word[i:i + 3]}" for word in words for i in range(max(len(word) - 2, 1))]
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is a cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def embedding_bytes(vector: np.ndarray) -> bytes:
+    """Column value for Task.embedding: the unit-length float32 vector"""
+    return normalize(vector).tobytes()
+
+
+class TaskVectorIndex:
+    """A user's active task embeddings as one contiguous float32 matrix of unit rows"""
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray):
+        self.ids = ids
+        self.vectors = vectors
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[int, bytes]], dim: int) -> "TaskVectorIndex":
+        width = dim * 4
+        # Rows embedded by a different model (other dimension) cannot be compared
+        rows = [(task_id, blob) for task_id, blob in rows if blob is not None and len(blob) == width]
+        ids = np.fromiter((task_id for task_id, _ in rows), dtype=np.int64, count=len(rows))
+        vectors = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), dim)
+        return cls(ids, vectors)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nearest(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Best match for each (unit) query row in one matrix product: (task ids, cosine scores)"""
+        if not len(self):
+            return np.full(len(queries), -1, dtype=np.int64), np.zeros(len(queries), dtype=np.float32)
+        scores = queries @ self.vectors.T
+        best = scores.argmax(axis=1)
+        return self.ids[best], scores[np.arange(len(queries)), best]
+
+
+# user_id -> (stamp, index); the stamp changes whenever the user's active embedded tasks do
+_indexes: "OrderedDict[int, Tuple[tuple, TaskVectorIndex]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_task_index(db: Session, user_id: int, dim: int) -> TaskVectorIndex:
+    """Return the user's vector index, reloading it only if their active tasks changed since it was built"""
+    active = (Task.user_id == user_id, Task.status.in_(ACTIVE_STATUSES), Task.embedding.isnot(None))
+    stamp = tuple(db.query(func.count(Task.id), func.max(Task.id), func.max(Task.updated_at)).filter(*active).one())
+    stamp += (dim,)
+
+    with _indexes_lock:
+        cached = _indexes.get(user_id)
+        if cached is not None and cached[0] == stamp:
+            _indexes.move_to_end(user_id)
+            return cached[1]
+
+    index = TaskVectorIndex.from_rows(db.query(Task.id, Task.embedding).filter(*active).all(), dim)
+    with _indexes_lock:
+        _indexes[user_id] = (stamp, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def find_duplicates(
+    db: Session, user_id: int, vectors: np.ndarray, threshold: float
+) -> List[Optional[Tuple[str, int]]]:
+    """For each new task vector, point at what it duplicates: ("task", id) for an existing
+    active task, ("batch", i) for an earlier item of the same batch, or None."""
+    vectors = normalize(vectors)
+    ids, scores = get_task_index(db, user_id, vectors.shape[1]).nearest(vectors)
+    within = vectors @ vectors.T
+
+    matches: List[Optional[Tuple[str, int]]] = []
+    for i in range(len(vectors)):
+        if scores[i] >= threshold:
+            matches.append(("task", int(ids[i])))
+            continue
+        earlier = within[i, :i]
+        if len(earlier) and earlier.max() >= threshold:
+            matches.append(("batch", int(earlier.argmax())))
+        else:
+            matches.append(None)
+    return matches
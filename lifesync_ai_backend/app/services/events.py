@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import redis
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.core.redis import get_redis
+from app.models.models import Task, TaskCheckIn
+from app.services.reminders import Reminder, register_sink
+
+CHANNEL_PREFIX = "events:user:"
+QUEUE_SIZE = 100  # events buffered per connection before it is told to resync
+TASK_FIELDS = (
+    "id", "title", "status", "priority", "due_date", "ai_suggested_time",
+    "completion_percentage", "estimated_duration", "recurrence_parent_id"
+)
+
+
+class EventBroker:
+    """Fans events out to this process's open streams, one bounded queue per connection"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        self._start_listener()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def deliver(self, user_id: int, payload: str) -> None:
+        """Hand an encoded event to the user's local streams; safe to call from any thread"""
+        if self._loop is None or user_id not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._put(user_id, payload)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._put, user_id, payload)
+
+    def _put(self, user_id: int, payload: str) -> None:
+        for queue in list(self._subscribers.get(user_id, ())):
+            if queue.full():
+                # A client this far behind refetches instead of replaying every change
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(json.dumps({"type": "resync"}))
+            else:
+                queue.put_nowait(payload)
+
+    def _start_listener(self) -> None:
+        """Listen for other workers' events on Redis (once per process, when Redis is up)"""
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            client = get_redis()
+            if client is None:
+                return
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{CHANNEL_PREFIX + "*": self._on_message})
+                self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except redis.RedisError as e:
+                print(f"Event listener error: {e}")
+
+    def _on_message(self, message: Dict[str, Any]) -> None:
+        user_id = int(message["channel"].decode()[len(CHANNEL_PREFIX):])
+        self.deliver(user_id, message["data"].decode())
+
+    @property
+    def listening(self) -> bool:
+        return self._listener is not None and self._listener.is_alive()
+
+    @property
+    def has_streams(self) -> bool:
+        return bool(self._subscribers)
+
+
+broker = EventBroker()
+
+
+def publish(events: List[Dict[str, Any]]) -> None:
+    """Send events ({"user_id": ..., "type": ..., ...}) to every worker's streams for their users.
+
+    With Redis they go out over pub/sub, and this process receives its own
+    copy through the listener; without it only local streams are reached.
+    Processes without streams of their own (e.g. Celery workers finishing
+    jobs) publish straight to Redis.
+    """
+    encoded = [(item["user_id"], json.dumps(jsonable_encoder(item))) for item in events]
+    client = get_redis() if broker.listening or not broker.has_streams else None
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id, payload in encoded:
+                pipe.publish(f"{CHANNEL_PREFIX}{user_id}", payload)
+            pipe.execute()
+            return
+        except redis.RedisError as e:
+            print(f"Event publish error: {e}")
+    for user_id, payload in encoded:
+        broker.deliver(user_id, payload)
+
+
+def _task_snapshot(task: Task) -> Dict[str, Any]:
+    return {name: getattr(task, name) for name in TASK_FIELDS}
+
+
+def _collect_events(session: Session, flush_context) -> None:
+    events = session.info.setdefault("push_events", {})
+    for obj in session.new:
+        if isinstance(obj, Task):
+            events[("task", obj.id)] = {"user_id": obj.user_id, "type": "task.created", "task": _task_snapshot(obj)}
+        elif isinstance(obj, TaskCheckIn):
+            # Check-ins are created by task_id, so the owner comes from the loaded task (or one lookup)
+            task = session.identity_map.get(identity_key(Task, obj.task_id))
+            user_id = task.user_id if task is not None else session.execute(
+                select(Task.user_id).where(Task.id == obj.task_id)
+            ).scalar()
+            events[("check_in", obj.id)] = {
+                "user_id": user_id, "type": "check_in.created",
+                "check_in": {"id": obj.id, "task_id": obj.task_id, "user_response": obj.user_response}
+            }
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj, include_collections=False):
+            previous = events.get(("task", obj.id))
+            kind = previous["type"] if previous else "task.updated"
+            events[("task", obj.id)] = {"user_id": obj.user_id, "type": kind, "task": _task_snapshot(obj)}
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            events[("task", obj.id)] = {"user_id": obj.user_id, "type": "task.deleted", "task": {"id": obj.id}}
+
+
+def _after_commit(session: Session) -> None:
+    events = session.info.pop("push_events", None)
+    if events:
+        publish(list(events.values()))
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop("push_events", None)
+
+
+def push_sink(reminders: List[Reminder]) -> None:
+    """Reminder sink that sends reminders down the users' event streams"""
+    publish([{"user_id": reminder.user_id, "type": "reminder", "reminder": reminder._asdict()} for reminder in reminders])
+
+
+def install_event_hooks() -> None:
+    """Publish every committed task and check-in change, wherever in the code it was made"""
+    if not event.contains(Session, "after_flush", _collect_events):
+        event.listen(Session, "after_flush", _collect_events)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_soft_rollback)
+    register_sink("push", push_sink)
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.metrics import IDEMPOTENT_REPLAYS
+from app.core.redis import get_redis
+
+KEY_PREFIX = "idempotency:"
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05  # how often a duplicate checks whether the first request has finished
+SWEEP_EVERY = 1024  # in-memory records are pruned after this many new keys
+REPLAY_HEADER = "Idempotent-Replayed"
+
+# A record is {"fingerprint": ..., "pending": true} while the first request
+# runs, then the stored response {"fingerprint", "status", "body", "media_type"}.
+Record = Dict[str, Any]
+
+
+class RedisIdempotencyStore:
+    """Records shared by every API worker, one string key per user, route and Idempotency-Key"""
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    def claim(self, key: str, record: Record, ttl: int) -> Optional[Record]:
+        """Store `record` if the key is free and return None, otherwise return the existing record"""
+        while True:
+            if self.client.set(KEY_PREFIX + key, json.dumps(record), nx=True, ex=ttl):
+                return None
+            existing = self.client.get(KEY_PREFIX + key)
+            if existing is not None:
+                return json.loads(existing)
+            # Expired between SET and GET; try to claim it again
+
+    def get(self, key: str) -> Optional[Record]:
+        existing = self.client.get(KEY_PREFIX + key)
+        return json.loads(existing) if existing is not None else None
+
+    def put(self, key: str, record: Record, ttl: int) -> None:
+        self.client.set(KEY_PREFIX + key, json.dumps(record), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(KEY_PREFIX + key)
+
+
+class MemoryIdempotencyStore:
+    """In-process fallback: the same records, seen only by this worker"""
+
+    def __init__(self):
+        self._records: Dict[str, Tuple[float, Record]] = {}  # key -> (expires at, record)
+        self._lock = threading.Lock()
+        self._new_keys = 0
+
+    def claim(self, key: str, record: Record, ttl: int) -> Optional[Record]:
+        now = time.monotonic()
+        with self._lock:
+            existing = self._records.get(key)
+            if existing is not None and existing[0] > now:
+                return existing[1]
+            self._records[key] = (now + ttl, record)
+            self._new_keys += 1
+            if self._new_keys >= SWEEP_EVERY:
+                self._records = {k: v for k, v in self._records.items() if v[0] > now}
+                self._new_keys = 0
+            return None
+
+    def get(self, key: str) -> Optional[Record]:
+        existing = self._records.get(key)
+        return existing[1] if existing is not None and existing[0] > time.monotonic() else None
+
+    def put(self, key: str, record: Record, ttl: int) -> None:
+        with self._lock:
+            self._records[key] = (time.monotonic() + ttl, record)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+
+_memory_store = MemoryIdempotencyStore()
+_redis_store: Optional[RedisIdempotencyStore] = None
+
+
+def _store():
+    global _redis_store
+    client = get_redis()
+    if client is None:
+        return _memory_store
+    if _redis_store is None or _redis_store.client is not client:
+        _redis_store = RedisIdempotencyStore(client)
+    return _redis_store
+
+
+def _scoped_key(scope: str, user_id: int, key: str) -> str:
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+    return f"{scope}:{user_id}:{key}"
+
+
+def fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def seen(scope: str, user_id: int, key: Optional[str]) -> bool:
+    """Whether a request with this key already ran or is running (replays skip rate limiting)"""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return False
+    try:
+        return _store().get(f"{scope}:{user_id}:{key}") is not None
+    except redis.RedisError as e:
+        print(f"Idempotency store error: {e}")
+        return _memory_store.get(f"{scope}:{user_id}:{key}") is not None
+
+
+def _replay(record: Record) -> Response:
+    return Response(
+        content=record["body"], status_code=record["status"], media_type=record["media_type"],
+        headers={REPLAY_HEADER: "true"}
+    )
+
+
+async def idempotent(
+    key: Optional[str], scope: str, user_id: int, payload: BaseModel,
+    handler: Callable[[], Awaitable[Response]]
+) -> Response:
+    """Run `handler` once per user, scope and Idempotency-Key and replay its response for repeats.
+
+    A repeat that arrives while the first request is still running waits for
+    it (up to idempotency_wait_seconds, then 409); a repeat with a different
+    body is refused with 422. 5xx responses and exceptions are not stored, so
+    the client's next retry runs the request again.
+    """
+    if key is None:
+        return await handler()
+    scoped = _scoped_key(scope, user_id, key)
+    request_fingerprint = fingerprint(payload)
+    store = _store()
+    deadline = time.monotonic() + settings.idempotency_wait_seconds
+
+    while True:
+        try:
+            existing = store.claim(
+                scoped, {"fingerprint": request_fingerprint, "pending": True}, settings.idempotency_lock_seconds
+            )
+        except redis.RedisError as e:
+            print(f"Idempotency store error: {e}")
+            store = _memory_store
+            continue
+        if existing is None:
+            break
+        if existing["fingerprint"] != request_fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if not existing.get("pending"):
+            IDEMPOTENT_REPLAYS.inc(scope)
+            return _replay(existing)
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        await asyncio.sleep(POLL_SECONDS)
+
+    try:
+        response = await handler()
+    except BaseException:
+        _forget(store, scoped)
+        raise
+    if response.status_code >= 500:
+        _forget(store, scoped)
+        return response
+    record = {
+        "fingerprint": request_fingerprint, "status": response.status_code,
+        "body": response.body.decode("utf-8"), "media_type": response.media_type,
+    }
+    try:
+        store.put(scoped, record, settings.idempotency_ttl_seconds)
+    except redis.RedisError as e:
+        print(f"Idempotency store error: {e}")
+    return response
+
+
+def _forget(store, scoped: str) -> None:
+    try:
+        store.delete(scoped)
+    except redis.RedisError as e:
+        print(f"Idempotency store error: {e}")
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from app.models.models import MoodEntry, Task, TaskCheckIn
+
+SECONDS_PER_DAY = 86400
+MOOD_LOOKBACK_SECONDS = 12 * 3600  # a mood entry describes completions up to 12 hours after it
+MIN_SAMPLES = 3
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+CACHE_SIZE = 256
+
+# (user_id, days, timezone, date) -> (fingerprint, insights), least recently used first
+_cache: "OrderedDict[tuple, Tuple[tuple, Dict[str, Any]]]" = OrderedDict()
+
+
+def _epoch(column):
+    # Seconds since the epoch, computed by the database so rows arrive as plain numbers
+    return extract("epoch", column)
+
+
+def _columns(rows: List[tuple], count: int) -> List[np.ndarray]:
+    """Transpose result rows into float arrays (NULL becomes NaN)"""
+    if not rows:
+        return [np.empty(0) for _ in range(count)]
+    return list(np.array(rows, dtype=float).T)
+
+
+def _local_calendar(seconds: np.ndarray, tz: tzinfo) -> Tuple[np.ndarray, np.ndarray]:
+    """Local hour of day and weekday (Monday=0) for UTC epoch seconds.
+
+    The UTC offset is looked up once per distinct UTC day, not per row.
+    """
+    if not len(seconds):
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    days, inverse = np.unique(seconds // SECONDS_PER_DAY, return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(day * SECONDS_PER_DAY + SECONDS_PER_DAY / 2, tz).utcoffset().total_seconds()
+        for day in days
+    ])
+    local = seconds + offsets[inverse]
+    hours = ((local % SECONDS_PER_DAY) // 3600).astype(int)
+    weekdays = ((local // SECONDS_PER_DAY + 3) % 7).astype(int)  # 1970-01-01 was a Thursday
+    return hours, weekdays
+
+
+def _group_means(groups: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-group mean and count of the finite values"""
+    valid = np.isfinite(values)
+    counts = np.bincount(groups[valid], minlength=size)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts, counts
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> Tuple[Optional[float], int]:
+    valid = np.isfinite(x) & np.isfinite(y)
+    n = int(valid.sum())
+    if n < MIN_SAMPLES or np.ptp(x[valid]) == 0 or np.ptp(y[valid]) == 0:
+        return None, n
+    return float(np.corrcoef(x[valid], y[valid])[0, 1]), n
+
+
+def _number(value: float, digits: int = 3) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _fingerprint(db: Session, user_id: int) -> tuple:
+    """Changes whenever the user's tasks, check-ins or mood entries do"""
+    tasks = select(func.count(Task.id), func.max(Task.id), func.max(Task.updated_at)).where(Task.user_id == user_id)
+    check_ins = select(func.count(TaskCheckIn.id), func.max(TaskCheckIn.id)).join(
+        Task, Task.id == TaskCheckIn.task_id
+    ).where(Task.user_id == user_id)
+    moods = select(func.count(MoodEntry.id), func.max(MoodEntry.id)).where(MoodEntry.user_id == user_id)
+    return tuple(db.execute(tasks).one()) + tuple(db.execute(check_ins).one()) + tuple(db.execute(moods).one())
+
+
+def _load(db: Session, user_id: int, since: datetime):
+    completed = db.execute(
+        select(
+            Task.id, _epoch(Task.completed_at), _epoch(Task.due_date), Task.actual_duration, Task.estimated_duration
+        ).where(
+            Task.user_id == user_id, Task.status == "completed", Task.completed_at >= since
+        ).order_by(Task.id)
+    ).all()
+    check_ins = db.execute(
+        select(TaskCheckIn.task_id, TaskCheckIn.mood_at_checkin, TaskCheckIn.energy_at_checkin).join(
+            Task, Task.id == TaskCheckIn.task_id
+        ).where(Task.user_id == user_id, Task.status == "completed", Task.completed_at >= since)
+    ).all()
+    moods = db.execute(
+        select(_epoch(MoodEntry.created_at), MoodEntry.mood_level, MoodEntry.energy_level, MoodEntry.stress_level).where(
+            MoodEntry.user_id == user_id,
+            MoodEntry.created_at >= since - timedelta(seconds=MOOD_LOOKBACK_SECONDS)
+        ).order_by(MoodEntry.created_at)
+    ).all()
+    return _columns(completed, 5), _columns(check_ins, 3), _columns(moods, 4)
+
+
+def compute_insights(db: Session, user_id: int, days: int, tz: tzinfo) -> Dict[str, Any]:
+    """Correlate mood and energy with when and how well tasks get completed"""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    (task_ids, completed_at, due_at, actual, estimated), check_ins, moods = _load(db, user_id, since)
+    n = len(task_ids)
+
+    lateness_hours = (completed_at - due_at) / 3600  # NaN where there is no due date
+    on_time = np.where(np.isfinite(lateness_hours), (lateness_hours <= 0).astype(float), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        duration_ratio = np.where(estimated > 0, actual / estimated, np.nan)
+
+    # Mean check-in mood and energy per completed task (task ids are sorted)
+    checkin_task, checkin_mood, checkin_energy = check_ins
+    features: Dict[str, np.ndarray] = {}
+    if n:
+        position = np.searchsorted(task_ids, checkin_task)
+        for name, values in (("checkin_mood", checkin_mood), ("checkin_energy", checkin_energy)):
+            means, _ = _group_means(position, values, n)
+            features[name] = means
+    else:
+        features["checkin_mood"] = features["checkin_energy"] = np.empty(0)
+
+    # Latest mood entry logged before each completion, if recent enough
+    mood_at, mood_level, energy_level, stress_level = moods
+    if len(mood_at):
+        latest = np.searchsorted(mood_at, completed_at, side="right") - 1
+        index = np.maximum(latest, 0)
+        recent = (latest >= 0) & (completed_at - mood_at[index] <= MOOD_LOOKBACK_SECONDS)
+    else:
+        index, recent = np.zeros(n, dtype=int), np.zeros(n, dtype=bool)
+    for name, values in (("mood", mood_level), ("energy", energy_level), ("stress", stress_level)):
+        features[name] = np.where(recent, values[index], np.nan) if len(mood_at) else np.full(n, np.nan)
+
+    outcomes = {"lateness_hours": lateness_hours, "on_time": on_time, "duration_ratio": duration_ratio}
+    hours, weekdays = _local_calendar(completed_at, tz)
+
+    def breakdown(groups: np.ndarray, size: int, labels: List[Any], key: str) -> List[Dict[str, Any]]:
+        counts = np.bincount(groups, minlength=size)
+        stats = {name: _group_means(groups, values, size)[0] for name, values in {**outcomes, **features}.items()}
+        return [
+            {key: labels[i], "completed": int(counts[i]), **{name: _number(means[i]) for name, means in stats.items()}}
+            for i in range(size) if counts[i]
+        ]
+
+    correlations = []
+    for feature, x in features.items():
+        for outcome, y in outcomes.items():
+            r, samples = _pearson(x, y)
+            if r is not None:
+                correlations.append({"feature": feature, "outcome": outcome, "r": round(r, 3), "samples": samples})
+    correlations.sort(key=lambda item: -abs(item["r"]))
+
+    return {
+        "days": days,
+        "completed_tasks": n,
+        "on_time_rate": _number(np.nanmean(on_time)) if np.isfinite(on_time).any() else None,
+        "median_duration_ratio": _number(np.nanmedian(duration_ratio)) if np.isfinite(duration_ratio).any() else None,
+        "by_hour": breakdown(hours, 24, list(range(24)), "hour"),
+        "by_weekday": breakdown(weekdays, 7, WEEKDAYS, "weekday"),
+        "correlations": correlations,
+    }
+
+
+def get_insights(db: Session, user_id: int, days: int, tz: tzinfo) -> Dict[str, Any]:
+    """Cached compute_insights; recomputed only when the user's data has changed"""
+    key = (user_id, days, str(tz), datetime.now(timezone.utc).date())
+    fingerprint = _fingerprint(db, user_id)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        _cache.move_to_end(key)
+        return cached[1]
+
+    insights = compute_insights(db, user_id, days, tz)
+    _cache[key] = (fingerprint, insights)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return insights
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from fastapi import status
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.serialization import FastJSONResponse, dumps
+from app.models.models import Job
+from app.services.ai_logging import interaction_log, interaction_user_id
+from app.services.events import publish
+
+# Job mode for slow AI endpoints: the request stores a Job row, answers 202
+# with its id and returns. The work runs on the API's event loop (local) or
+# in a Celery worker, and its result is kept on the row for polling
+# (GET /jobs/{id}) and announced on the user's event stream.
+
+JOB_URL = "/api/v1/jobs/{}"
+LOST_JOB_ERROR = "The worker running this job stopped before it finished"
+
+JobHandler = Callable[[int, Dict[str, Any]], Awaitable[Any]]
+
+HANDLERS: Dict[str, JobHandler] = {}
+_local_jobs: Set[asyncio.Task] = set()
+
+
+def job_handler(kind: str):
+    """Register `async def handler(user_id, payload)` as the work behind a job kind"""
+    def register(handler: JobHandler) -> JobHandler:
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def wants_job(prefer: Optional[str]) -> bool:
+    """Whether the client asked for job mode with `Prefer: respond-async` (RFC 7240)"""
+    return bool(prefer) and "respond-async" in [p.split("=")[0].strip().lower() for p in prefer.split(",")]
+
+
+def submit_job(user_id: int, kind: str, payload: Dict[str, Any]) -> str:
+    """Store a pending job, clear out the user's expired ones and hand it to the configured worker"""
+    job_id = uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.job_retention_hours)
+        db.query(Job).filter(Job.user_id == user_id, Job.finished_at < cutoff).delete(synchronize_session=False)
+        db.add(Job(id=job_id, user_id=user_id, kind=kind, status="pending", payload=payload))
+        db.commit()
+    finally:
+        db.close()
+    enqueue_job(job_id)
+    return job_id
+
+
+async def accept_job(user_id: int, kind: str, payload: Dict[str, Any]) -> FastJSONResponse:
+    """Submit a job and answer 202 with where to poll for it"""
+    job_id = submit_job(user_id, kind, payload)
+    return FastJSONResponse(
+        {"id": job_id, "kind": kind, "status": "pending"},
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": JOB_URL.format(job_id)}
+    )
+
+
+def enqueue_job(job_id: str) -> None:
+    if settings.job_worker == "celery":
+        from app.worker import run_job_task
+
+        run_job_task.delay(job_id)
+    else:
+        # A fresh context, so the job is not traced or profiled as part of the request that queued it
+        task = asyncio.get_running_loop().create_task(run_job(job_id), context=contextvars.Context())
+        _local_jobs.add(task)  # the loop only keeps weak references to its tasks
+        task.add_done_callback(_local_jobs.discard)
+
+
+async def run_job(job_id: str) -> None:
+    """Run a pending job and store its result; no database connection is held while the handler works"""
+    db = SessionLocal()
+    try:
+        # Claiming pending -> running keeps a redelivered Celery message from running the job twice
+        claimed = db.query(Job).filter(Job.id == job_id, Job.status == "pending").update(
+            {Job.status: "running", Job.started_at: datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        job = db.query(Job.user_id, Job.kind, Job.payload).filter(Job.id == job_id).first()
+        db.commit()
+    finally:
+        db.close()
+    if not claimed or job is None:
+        return
+
+    interaction_user_id.set(job.user_id)
+    try:
+        # Stored exactly as the synchronous endpoint would have encoded it
+        result = json.loads(dumps(await HANDLERS[job.kind](job.user_id, job.payload or {})))
+        outcome, error = "completed", None
+    except Exception as e:
+        print(f"Job error ({job_id}): {e}")
+        result, outcome, error = None, "failed", str(e)
+
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id).update({
+            Job.status: outcome, Job.result: result, Job.error: error,
+            Job.finished_at: datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    publish([{"user_id": job.user_id, "type": f"job.{outcome}", "job": {"id": job_id, "kind": job.kind}}])
+
+
+def fail_lost_jobs(db, *criteria) -> int:
+    """Mark jobs running past job_lease_seconds as failed; their worker died (a retry could repeat side effects)"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.job_lease_seconds)
+    lost = db.query(Job.id, Job.user_id, Job.kind).filter(
+        Job.status == "running", Job.started_at < cutoff, *criteria
+    ).all()
+    if not lost:
+        return 0
+    db.query(Job).filter(Job.id.in_([job.id for job in lost]), Job.status == "running").update({
+        Job.status: "failed", Job.error: LOST_JOB_ERROR, Job.finished_at: datetime.now(timezone.utc)
+    }, synchronize_session=False)
+    db.commit()
+    publish([{"user_id": job.user_id, "type": "job.failed", "job": {"id": job.id, "kind": job.kind}} for job in lost])
+    return len(lost)
+
+
+def resume_jobs() -> int:
+    """At startup: fail jobs lost with a dead worker and queue again the ones that never started"""
+    db = SessionLocal()
+    try:
+        fail_lost_jobs(db)
+        pending = [job_id for job_id, in db.query(Job.id).filter(Job.status == "pending")]
+    finally:
+        db.close()
+    # Claiming keeps a job that another worker also picks up from running twice
+    for job_id in pending:
+        enqueue_job(job_id)
+    return len(pending)
+
+
+def process_job(job_id: str) -> None:
+    """Entry point for Celery workers: one event loop per job"""
+    async def run() -> None:
+        await run_job(job_id)
+        # The worker's event loop ends with this job, so write its AI interactions now
+        await interaction_log.flush()
+
+    asyncio.run(run())
+
+
+async def wait_for_local_jobs(timeout: float) -> None:
+    """Give jobs running on this event loop a chance to finish before shutdown"""
+    if _local_jobs:
+        await asyncio.wait(list(_local_jobs), timeout=timeout)
@@ -0,0 +1,211 @@
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import MoodEntry, MoodRollup
+from app.services.scheduler import as_utc
+
+PERIOD_DAYS = {"day": 1, "week": 7}
+METRICS = {
+    # rollup column prefix: MoodEntry attribute
+    "mood": "mood_level",
+    "energy": "energy_level",
+    "stress": "stress_level",
+}
+
+
+def user_timezone(preferences: Optional[Dict]) -> tzinfo:
+    """The user's IANA timezone from preferences["timezone"], or UTC"""
+    name = (preferences or {}).get("timezone")
+    try:
+        return ZoneInfo(name) if name else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def period_starts(moment: datetime, tz: tzinfo) -> Dict[str, date]:
+    """The local day and the Monday of the local week that `moment` falls in"""
+    day = as_utc(moment).astimezone(tz).date()
+    return {"day": day, "week": day - timedelta(days=day.weekday())}
+
+
+def _bucket(db: Session, user_id: int, period: str, period_start: date):
+    return db.query(MoodRollup).filter(
+        MoodRollup.user_id == user_id,
+        MoodRollup.period == period,
+        MoodRollup.period_start == period_start
+    )
+
+
+def _lower(column, value):
+    return case((or_(column.is_(None), column > value), value), else_=column)
+
+
+def _higher(column, value):
+    return case((or_(column.is_(None), column < value), value), else_=column)
+
+
+def _increments(entry: MoodEntry) -> Dict:
+    values = {MoodRollup.entry_count: MoodRollup.entry_count + 1}
+    for metric, attribute in METRICS.items():
+        value = getattr(entry, attribute)
+        if value is None:
+            continue
+        values[getattr(MoodRollup, f"{metric}_sum")] = getattr(MoodRollup, f"{metric}_sum") + value
+        values[getattr(MoodRollup, f"{metric}_min")] = _lower(getattr(MoodRollup, f"{metric}_min"), value)
+        values[getattr(MoodRollup, f"{metric}_max")] = _higher(getattr(MoodRollup, f"{metric}_max"), value)
+    if entry.stress_level is not None:
+        values[MoodRollup.stress_count] = MoodRollup.stress_count + 1
+    return values
+
+
+def record_entry(db: Session, entry: MoodEntry, tz: tzinfo) -> None:
+    """Fold a new entry into its day and week rollups; the caller commits with the entry"""
+    for period, period_start in period_starts(entry.created_at, tz).items():
+        if _bucket(db, entry.user_id, period, period_start).update(_increments(entry), synchronize_session=False):
+            continue
+        rollup = MoodRollup(
+            user_id=entry.user_id, period=period, period_start=period_start,
+            entry_count=1, stress_count=0 if entry.stress_level is None else 1,
+            mood_sum=0, energy_sum=0, stress_sum=0
+        )
+        for metric, attribute in METRICS.items():
+            value = getattr(entry, attribute)
+            if value is not None:
+                setattr(rollup, f"{metric}_sum", value)
+                setattr(rollup, f"{metric}_min", value)
+                setattr(rollup, f"{metric}_max", value)
+        try:
+            with db.begin_nested():
+                db.add(rollup)
+        except IntegrityError:
+            # A concurrent entry created the bucket first
+            _bucket(db, entry.user_id, period, period_start).update(_increments(entry), synchronize_session=False)
+
+
+def rebuild_rollups(db: Session, user_id: int, moment: datetime, tz: tzinfo) -> None:
+    """Recompute the day and week buckets containing `moment` from their entries (after a delete,
+    since a minimum or maximum cannot be taken back incrementally)"""
+    for period, period_start in period_starts(moment, tz).items():
+        start = datetime.combine(period_start, time(), tz)
+        end = datetime.combine(period_start + timedelta(days=PERIOD_DAYS[period]), time(), tz)
+        columns = [func.count(MoodEntry.id), func.count(MoodEntry.stress_level)]
+        for attribute in METRICS.values():
+            column = getattr(MoodEntry, attribute)
+            columns += [func.coalesce(func.sum(column), 0), func.min(column), func.max(column)]
+        row = db.query(*columns).filter(
+            MoodEntry.user_id == user_id,
+            MoodEntry.created_at >= start.astimezone(timezone.utc),
+            MoodEntry.created_at < end.astimezone(timezone.utc)
+        ).one()
+
+        bucket = _bucket(db, user_id, period, period_start)
+        if not row[0]:
+            bucket.delete(synchronize_session=False)
+            continue
+        rollup = bucket.first() or MoodRollup(user_id=user_id, period=period, period_start=period_start)
+        rollup.entry_count, rollup.stress_count = row[0], row[1]
+        for i, metric in enumerate(METRICS):
+            setattr(rollup, f"{metric}_sum", row[2 + 3 * i])
+            setattr(rollup, f"{metric}_min", row[3 + 3 * i])
+            setattr(rollup, f"{metric}_max", row[4 + 3 * i])
+        db.add(rollup)
+
+
+def _count(row: MoodRollup, metric: str) -> int:
+    return row.stress_count if metric == "stress" else row.entry_count
+
+
+def _stats(row: MoodRollup, metric: str) -> Optional[Dict[str, float]]:
+    count = _count(row, metric)
+    if not count:
+        return None
+    return {
+        "mean": round(getattr(row, f"{metric}_sum") / count, 2),
+        "min": getattr(row, f"{metric}_min"),
+        "max": getattr(row, f"{metric}_max"),
+    }
+
+
+def _rollups(db: Session, user_id: int, period: str, first: date, last: date) -> List[MoodRollup]:
+    return db.query(MoodRollup).filter(
+        MoodRollup.user_id == user_id,
+        MoodRollup.period == period,
+        MoodRollup.period_start >= first,
+        MoodRollup.period_start <= last
+    ).order_by(MoodRollup.period_start).all()
+
+
+def mood_trends(db: Session, user_id: int, period: str, first: date, last: date) -> List[Dict[str, Any]]:
+    """Per-day or per-week mood, energy and stress statistics, oldest first; periods without entries are omitted"""
+    return [
+        {
+            "period_start": row.period_start,
+            "count": row.entry_count,
+            **{metric: _stats(row, metric) for metric in METRICS},
+        }
+        for row in _rollups(db, user_id, period, first, last)
+    ]
+
+
+def rolling_averages(db: Session, user_id: int, window_days: int, first: date, last: date) -> List[Dict[str, Any]]:
+    """Trailing `window_days` averages for every day in [first, last], weighted by entry count"""
+    rows = {row.period_start: row for row in _rollups(db, user_id, "day", first - timedelta(days=window_days - 1), last)}
+    sums = {metric: 0 for metric in METRICS}
+    counts = {metric: 0 for metric in METRICS}
+
+    def shift(day: date, sign: int) -> None:
+        row = rows.get(day)
+        if row is not None:
+            for metric in METRICS:
+                sums[metric] += sign * getattr(row, f"{metric}_sum")
+                counts[metric] += sign * _count(row, metric)
+
+    for offset in range(window_days - 1):
+        shift(first - timedelta(days=window_days - 1 - offset), 1)
+
+    averages = []
+    day = first
+    while day <= last:
+        shift(day, 1)
+        averages.append({
+            "date": day,
+            "count": counts["mood"],
+            **{metric: round(sums[metric] / counts[metric], 2) if counts[metric] else None for metric in METRICS},
+        })
+        shift(day - timedelta(days=window_days - 1), -1)
+        day += timedelta(days=1)
+    return averages
+
+
+def current_mood_features(db: Session, user_id: int, tz: tzinfo, now: datetime = None) -> Dict[str, Any]:
+    """Mood features for scheduling: today's averages (else the last 7 days'), 7-day averages and week-over-week trend"""
+    today = period_starts(now or datetime.now(timezone.utc), tz)["day"]
+    rows = _rollups(db, user_id, "day", today - timedelta(days=13), today)
+    if not rows:
+        return {}
+
+    def mean(selected: List[MoodRollup], metric: str) -> Optional[float]:
+        count = sum(_count(row, metric) for row in selected)
+        return round(sum(getattr(row, f"{metric}_sum") for row in selected) / count, 1) if count else None
+
+    this_week = [row for row in rows if row.period_start > today - timedelta(days=7)]
+    last_week = [row for row in rows if row.period_start <= today - timedelta(days=7)]
+    today_rows = [row for row in this_week if row.period_start == today]
+
+    features: Dict[str, Any] = {"entries_today": today_rows[0].entry_count if today_rows else 0}
+    for metric in METRICS:
+        current = mean(today_rows, metric) if today_rows else None
+        week = mean(this_week, metric)
+        previous = mean(last_week, metric)
+        if current is not None or week is not None:
+            features[metric] = current if current is not None else week
+        if week is not None:
+            features[f"{metric}_7d"] = week
+            if previous is not None:
+                features[f"{metric}_trend"] = round(week - previous, 1)
+    return features
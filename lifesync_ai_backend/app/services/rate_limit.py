@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable, NamedTuple, Optional, Tuple
+
+import redis
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+KEY_PREFIX = "ratelimit:"
+SWEEP_EVERY = 1024  # in-memory buckets are pruned after this many new keys
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float  # seconds until a token is available (0 when allowed)
+
+
+# Refill the bucket for the time since its last use, then take one token if
+# there is one. Redis's own clock keeps every API worker on the same timeline.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisTokenBuckets:
+    """Token buckets shared by every API worker, one hash per user and endpoint class"""
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._take = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> Decision:
+        allowed, retry_after = self._take(keys=[KEY_PREFIX + key], args=[rate, burst])
+        return Decision(bool(allowed), float(retry_after))
+
+
+class MemoryTokenBuckets:
+    """In-process fallback: the same buckets, enforced per worker process"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+        self._new_keys = 0
+
+    def take(self, key: str, rate: float, burst: int) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                tokens = float(burst)
+                self._new_keys += 1
+                if self._new_keys >= SWEEP_EVERY:
+                    self._sweep(now, rate, burst)
+            else:
+                tokens = min(burst, state[0] + (now - state[1]) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return Decision(True, 0.0)
+            self._buckets[key] = (tokens, now)
+            return Decision(False, (1 - tokens) / rate)
+
+    def _sweep(self, now: float, rate: float, burst: int) -> None:
+        # Buckets idle long enough to have refilled are indistinguishable from new ones
+        idle = burst / rate
+        self._buckets = {key: state for key, state in self._buckets.items() if now - state[1] < idle}
+        self._new_keys = 0
+
+
+_memory_buckets = MemoryTokenBuckets()
+_redis_buckets: Optional[RedisTokenBuckets] = None
+
+
+def take_token(user_id: int, endpoint_class: str) -> Decision:
+    """Spend one of the user's tokens for an endpoint class (voice, schedule, documents)"""
+    global _redis_buckets
+    if not settings.ai_rate_limit_enabled:
+        return Decision(True, 0.0)
+    key = f"{endpoint_class}:{user_id}"
+    rate, burst = settings.ai_rate_limit_per_minute / 60.0, settings.ai_rate_limit_burst
+    client = get_redis()
+    if client is not None:
+        if _redis_buckets is None or _redis_buckets.client is not client:
+            _redis_buckets = RedisTokenBuckets(client)
+        try:
+            return _redis_buckets.take(key, rate, burst)
+        except redis.RedisError as e:
+            print(f"Rate limit error: {e}")
+    return _memory_buckets.take(key, rate, burst)
+
+
+class FairQueue:
+    """A fixed number of slots handed out round-robin between users.
+
+    Callers beyond the free slots wait in a FIFO per user; each freed slot
+    goes to the next user in turn, so one user's burst queues behind everyone
+    else's next request instead of in front of it. State is per event loop.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.active = 0
+        self._waiting: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable):
+        if self.slots <= 0:
+            yield
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Workers run one event loop per job; slots never outlive their loop
+            self._loop, self.active, self._waiting = loop, 0, OrderedDict()
+
+        if self.active < self.slots and not self._waiting:
+            self.active += 1
+        else:
+            waiter = loop.create_future()
+            self._waiting.setdefault(key, deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()  # the slot was handed over just as the caller gave up
+                else:
+                    self._forget(key, waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def _forget(self, key: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._waiting.get(key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[key]
+
+    def _release(self) -> None:
+        while self._waiting:
+            key, queue = self._waiting.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._waiting[key] = queue  # the user goes to the back of the line
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes straight to the waiter
+                return
+        self.active -= 1
+
+
+ollama_queue = FairQueue(settings.ollama_concurrency)
@@ -0,0 +1,214 @@
+import calendar
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from itertools import count as counter, islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import Task
+from app.services.rescheduler import ACTIVE_STATUSES
+from app.services.scheduler import as_utc
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+OCCURRENCE_KEY_FORMAT = "%Y%m%dT%H%M%SZ"
+MAX_OCCURRENCES = 1000  # per template per window
+
+
+def normalize_rule(rule: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Validate a recurrence rule and fill its defaults.
+
+    A rule is {"freq": "daily" | "weekly" | "monthly", "interval": n,
+    "byweekday": [0-6 or day names] (weekly only), "until": "YYYY-MM-DD", "count": n}.
+    """
+    if not rule:
+        return None
+    freq = str(rule.get("freq", "")).lower()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of {', '.join(FREQUENCIES)}")
+    interval = int(rule["interval"]) if rule.get("interval") is not None else 1
+    if interval < 1:
+        raise ValueError("interval must be at least 1")
+
+    normalized: Dict[str, Any] = {"freq": freq, "interval": interval}
+    if freq == "weekly" and rule.get("byweekday"):
+        days = set()
+        for day in rule["byweekday"]:
+            if isinstance(day, str):
+                if day.lower()[:3] not in [name[:3] for name in WEEKDAY_NAMES]:
+                    raise ValueError(f"Unknown weekday: {day}")
+                day = [name[:3] for name in WEEKDAY_NAMES].index(day.lower()[:3])
+            if not 0 <= int(day) <= 6:
+                raise ValueError("byweekday values must be 0 (Monday) to 6 (Sunday)")
+            days.add(int(day))
+        normalized["byweekday"] = sorted(days)
+    if rule.get("until"):
+        normalized["until"] = date.fromisoformat(str(rule["until"])[:10]).isoformat()
+    if rule.get("count"):
+        if int(rule["count"]) < 1:
+            raise ValueError("count must be at least 1")
+        normalized["count"] = int(rule["count"])
+    return normalized
+
+
+def occurrence_key(occurrence: datetime) -> str:
+    """URL-safe identifier of one occurrence of a template"""
+    return as_utc(occurrence).strftime(OCCURRENCE_KEY_FORMAT)
+
+
+def parse_occurrence_key(key: str) -> datetime:
+    return datetime.strptime(key, OCCURRENCE_KEY_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def _months_between(first: date, second: date) -> int:
+    return (second.year - first.year) * 12 + second.month - first.month
+
+
+def _candidates(rule: Dict[str, Any], start: datetime, skip_to: Optional[datetime]) -> Iterator[datetime]:
+    """Occurrence starts in order from `start` (local wall time), jumping ahead to the period containing `skip_to`"""
+    interval = rule["interval"]
+    wall_time = start.time()
+    tz = start.tzinfo
+
+    def at(day: date) -> datetime:
+        return datetime.combine(day, wall_time, tzinfo=tz)
+
+    if rule["freq"] == "daily":
+        first = max(0, (skip_to.date() - start.date()).days // interval) if skip_to else 0
+        for period in counter(first):
+            yield at(start.date() + timedelta(days=period * interval))
+
+    elif rule["freq"] == "weekly":
+        weekdays = rule.get("byweekday") or [start.weekday()]
+        week_start = start.date() - timedelta(days=start.weekday())
+        first = max(0, (skip_to.date() - week_start).days // 7 // interval) if skip_to else 0
+        for period in counter(first):
+            monday = week_start + timedelta(weeks=period * interval)
+            for weekday in weekdays:
+                occurrence = at(monday + timedelta(days=weekday))
+                if occurrence >= start:
+                    yield occurrence
+
+    else:
+        first = max(0, _months_between(start.date(), skip_to.date()) // interval) if skip_to else 0
+        for period in counter(first):
+            months = start.month - 1 + period * interval
+            year, month = start.year + months // 12, months % 12 + 1
+            # Months without this day (e.g. the 31st) are skipped, as in RFC 5545
+            if start.day <= calendar.monthrange(year, month)[1]:
+                yield at(date(year, month, start.day))
+
+
+def iter_occurrences(
+    rule: Dict[str, Any], dtstart: datetime, window_start: datetime, window_end: datetime, tz: tzinfo
+) -> Iterator[datetime]:
+    """Lazily yield the occurrences of `rule` (anchored at `dtstart`) that start inside [window_start, window_end).
+
+    Occurrences keep their local wall-clock time in `tz` across DST changes.
+    Nothing outside the window is materialized, and rules without a count
+    jump straight to the window instead of walking from dtstart.
+    """
+    start = as_utc(dtstart).astimezone(tz)
+    window_start, window_end = as_utc(window_start), as_utc(window_end)
+    until = date.fromisoformat(rule["until"]) if rule.get("until") else None
+
+    if rule.get("count"):
+        occurrences = islice(_candidates(rule, start, None), rule["count"])
+    else:
+        occurrences = _candidates(rule, start, window_start.astimezone(tz))
+
+    for occurrence in occurrences:
+        if (until is not None and occurrence.date() > until) or occurrence >= window_end:
+            return
+        if occurrence >= window_start:
+            yield occurrence
+
+
+def is_occurrence(template: Task, occurrence: datetime, tz: tzinfo) -> bool:
+    occurrence = as_utc(occurrence)
+    return any(True for _ in iter_occurrences(
+        template.recurrence, template.due_date, occurrence, occurrence + timedelta(seconds=1), tz
+    ))
+
+
+def expand_occurrences(
+    db: Session, user_id: int, window_start: datetime, window_end: datetime, tz: tzinfo
+) -> List[Dict[str, Any]]:
+    """Every occurrence of the user's active recurring tasks inside the window, in start order.
+
+    Occurrences that have been materialized (checked in or edited) are returned
+    from their own rows; the rest are generated from the template on the fly.
+    """
+    templates = db.query(Task).filter(
+        Task.user_id == user_id,
+        Task.recurrence.isnot(None),
+        Task.due_date.isnot(None),
+        Task.status.in_(ACTIVE_STATUSES)
+    ).all()
+    if not templates:
+        return []
+
+    materialized = {
+        (row.recurrence_parent_id, occurrence_key(row.occurrence_start)): row
+        for row in db.query(Task).filter(
+            Task.recurrence_parent_id.in_([template.id for template in templates]),
+            Task.occurrence_start >= window_start,
+            Task.occurrence_start < window_end
+        )
+    }
+
+    occurrences = []
+    for template in templates:
+        for start in islice(iter_occurrences(template.recurrence, template.due_date, window_start, window_end, tz), MAX_OCCURRENCES):
+            key = occurrence_key(start)
+            row = materialized.get((template.id, key), template)
+            occurrences.append({
+                "template_id": template.id,
+                "occurrence_key": key,
+                "occurrence_start": start,
+                "task_id": row.id if row is not template else None,
+                "title": row.title,
+                "description": row.description,
+                "priority": row.priority,
+                "estimated_duration": row.estimated_duration,
+                "tags": row.tags,
+                "status": row.status if row is not template else "pending",
+                "ai_suggested_time": row.ai_suggested_time if row is not template else None,
+            })
+    occurrences.sort(key=lambda occurrence: occurrence["occurrence_start"])
+    return occurrences
+
+
+def materialize_occurrence(db: Session, template: Task, start: datetime) -> Task:
+    """The concrete Task row for one occurrence, created from the template on first use"""
+    start = as_utc(start)
+
+    def existing() -> Optional[Task]:
+        return db.query(Task).filter(
+            Task.recurrence_parent_id == template.id, Task.occurrence_start == start
+        ).first()
+
+    row = existing()
+    if row is not None:
+        return row
+
+    row = Task(
+        user_id=template.user_id,
+        title=template.title,
+        description=template.description,
+        priority=template.priority,
+        estimated_duration=template.estimated_duration,
+        tags=template.tags,
+        embedding=template.embedding,
+        due_date=start,
+        recurrence_parent_id=template.id,
+        occurrence_start=start
+    )
+    try:
+        with db.begin_nested():
+            db.add(row)
+    except IntegrityError:
+        # A concurrent request materialized it first
+        return existing()
+    return row
@@ -0,0 +1,360 @@
+import asyncio
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import redis
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis import get_redis
+from app.models.models import Task, User
+from app.services.rescheduler import ACTIVE_STATUSES
+from app.services.scheduler import coerce_datetime
+
+PENDING_KEY = "reminders:pending"
+PROCESSING_KEY = "reminders:processing"
+BACKFILL_CHUNK = 5000
+STALE_AFTER = 3600  # seconds; reminders more than an hour late are dropped instead of delivered
+
+# Reminder kind -> (Task column it fires for, notification preference that enables it)
+KINDS = {
+    "due": ("due_date", "task_reminders"),
+    "start": ("ai_suggested_time", "check_ins"),
+}
+WATCHED = ("due_date", "ai_suggested_time", "status", "recurrence")
+
+
+class Reminder(NamedTuple):
+    user_id: int
+    task_id: int
+    kind: str  # due or start
+    title: str
+    at: datetime  # when the task is due or scheduled to start
+
+
+def member(user_id: int, task_id: int, kind: str) -> str:
+    return f"{user_id}:{task_id}:{kind}"
+
+
+def parse_member(value: str) -> Tuple[int, int, str]:
+    user_id, task_id, kind = value.split(":")
+    return int(user_id), int(task_id), kind
+
+
+# Atomically re-queue claims whose lease expired (the worker died), then move up
+# to ARGV[2] due members from pending to processing under a new lease
+CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, value in ipairs(expired) do
+    redis.call('ZADD', KEYS[1], ARGV[1], value)
+    redis.call('ZREM', KEYS[2], value)
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+    redis.call('ZADD', KEYS[2], ARGV[3], due[i])
+end
+return due
+"""
+
+
+class RedisReminderQueue:
+    """Pending reminders in a sorted set scored by fire time, so claiming reads only the due head of the wheel.
+
+    Claimed reminders sit in a second sorted set scored by lease expiry until
+    they are acknowledged, giving at-least-once delivery across worker crashes.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._claim = client.register_script(CLAIM_SCRIPT)
+
+    def schedule(self, entries: Dict[str, float]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(PENDING_KEY, entries)
+        pipe.zrem(PROCESSING_KEY, *entries)
+        pipe.execute()
+
+    def cancel(self, members: List[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrem(PENDING_KEY, *members)
+        pipe.zrem(PROCESSING_KEY, *members)
+        pipe.execute()
+
+    def claim(self, now: float, limit: int, lease_seconds: float) -> List[Tuple[str, float]]:
+        flat = self._claim(keys=[PENDING_KEY, PROCESSING_KEY], args=[now, limit, now + lease_seconds])
+        return [(flat[i].decode(), float(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+    def ack(self, members: List[str]) -> None:
+        self.client.zrem(PROCESSING_KEY, *members)
+
+    def __len__(self) -> int:
+        return self.client.zcard(PENDING_KEY) + self.client.zcard(PROCESSING_KEY)
+
+
+class HeapReminderQueue:
+    """In-process fallback with the same interface: a min-heap of fire times with lazy deletion.
+
+    Only reminders scheduled by this process are seen, so it suits a single
+    API process running the worker itself (settings.reminder_worker == "local").
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._scheduled: Dict[str, float] = {}
+        self._leases: Dict[str, Tuple[float, float]] = {}  # member -> (lease expiry, fire time)
+        self._lock = threading.Lock()
+
+    def schedule(self, entries: Dict[str, float]) -> None:
+        with self._lock:
+            for value, fire_at in entries.items():
+                self._leases.pop(value, None)
+                self._scheduled[value] = fire_at
+                heapq.heappush(self._heap, (fire_at, value))
+
+    def cancel(self, members: List[str]) -> None:
+        with self._lock:
+            for value in members:
+                self._scheduled.pop(value, None)
+                self._leases.pop(value, None)
+
+    def claim(self, now: float, limit: int, lease_seconds: float) -> List[Tuple[str, float]]:
+        with self._lock:
+            for value, (expiry, fire_at) in list(self._leases.items()):
+                if expiry <= now:
+                    del self._leases[value]
+                    self._scheduled[value] = fire_at
+                    heapq.heappush(self._heap, (fire_at, value))
+
+            claimed = []
+            while self._heap and self._heap[0][0] <= now and len(claimed) < limit:
+                fire_at, value = heapq.heappop(self._heap)
+                if self._scheduled.get(value) != fire_at:
+                    continue  # cancelled or rescheduled since it was pushed
+                del self._scheduled[value]
+                self._leases[value] = (now + lease_seconds, fire_at)
+                claimed.append((value, fire_at))
+            return claimed
+
+    def ack(self, members: List[str]) -> None:
+        with self._lock:
+            for value in members:
+                self._leases.pop(value, None)
+
+    def __len__(self) -> int:
+        return len(self._scheduled) + len(self._leases)
+
+
+_heap_queue = HeapReminderQueue()
+
+
+def get_reminder_queue():
+    client = get_redis()
+    return RedisReminderQueue(client) if client is not None else _heap_queue
+
+
+# Delivery sinks receive each claimed batch; the default one just logs
+def log_sink(reminders: List[Reminder]) -> None:
+    for reminder in reminders:
+        print(f"Reminder ({reminder.kind}) for user {reminder.user_id}: {reminder.title} at {reminder.at.isoformat()}")
+
+
+_sinks: Dict[str, Callable[[List[Reminder]], None]] = {"log": log_sink}
+
+
+def register_sink(name: str, sink: Callable[[List[Reminder]], None]) -> None:
+    _sinks[name] = sink
+
+
+def _fire_time(moment: Any, kind: str) -> Optional[datetime]:
+    moment = coerce_datetime(moment, datetime.now(timezone.utc))
+    if moment is None:
+        return None
+    lead = settings.reminder_lead_minutes if kind == "due" else 0
+    return moment - timedelta(minutes=lead)
+
+
+def reminder_entries(
+    user_id: int, task_id: int, values: Dict[str, Any]
+) -> Tuple[Dict[str, float], List[str]]:
+    """The reminders one task should have (member -> fire time) and the ones it should not"""
+    scheduled, cancelled = {}, []
+    active = values["status"] in ACTIVE_STATUSES and not values["recurrence"]
+    for kind, (column, _) in KINDS.items():
+        fire_at = _fire_time(values[column], kind) if active else None
+        if fire_at is not None:
+            scheduled[member(user_id, task_id, kind)] = fire_at.timestamp()
+        else:
+            cancelled.append(member(user_id, task_id, kind))
+    return scheduled, cancelled
+
+
+def _apply(changes: Dict[int, Tuple[int, Optional[Dict[str, Any]]]]) -> None:
+    scheduled, cancelled = {}, []
+    for task_id, (user_id, values) in changes.items():
+        if values is None:
+            cancelled += [member(user_id, task_id, kind) for kind in KINDS]
+        else:
+            task_scheduled, task_cancelled = reminder_entries(user_id, task_id, values)
+            scheduled.update(task_scheduled)
+            cancelled += task_cancelled
+    try:
+        queue = get_reminder_queue()
+        if scheduled:
+            queue.schedule(scheduled)
+        if cancelled:
+            queue.cancel(cancelled)
+    except redis.RedisError as e:
+        print(f"Reminder scheduling error: {e}")
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    changes = session.info.setdefault("reminder_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Task):
+            continue
+        state = inspect(obj)
+        if obj in session.new or any(state.attrs[name].history.has_changes() for name in WATCHED):
+            changes[obj.id] = (obj.user_id, {name: getattr(obj, name) for name in WATCHED})
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            changes[obj.id] = (obj.user_id, None)
+
+
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop("reminder_changes", None)
+    if changes:
+        _apply(changes)
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop("reminder_changes", None)
+
+
+def install_reminder_hooks() -> None:
+    """Keep the reminder queue in step with every committed Task change.
+
+    Scheduling rides on session events rather than calls in each endpoint
+    because tasks are moved from many places (edits, check-ins, voice input,
+    schedule placement and repair); the worker never polls the tasks table.
+    """
+    if not event.contains(Session, "after_flush", _collect_changes):
+        event.listen(Session, "after_flush", _collect_changes)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_soft_rollback)
+
+
+def backfill_reminders(db: Session, queue, now: datetime = None) -> int:
+    """Queue reminders for every upcoming task, e.g. after Redis was emptied or for the in-process heap"""
+    now = now or datetime.now(timezone.utc)
+    columns = select(Task.id, Task.user_id, *[getattr(Task, name) for name in WATCHED]).where(
+        Task.status.in_(ACTIVE_STATUSES),
+        Task.recurrence.is_(None),
+        (Task.due_date >= now) | (Task.ai_suggested_time >= now)
+    ).execution_options(yield_per=BACKFILL_CHUNK)
+
+    total = 0
+    for rows in db.execute(columns).partitions():
+        entries = {}
+        for row in rows:
+            task_id, user_id, *values = row
+            scheduled, _ = reminder_entries(user_id, task_id, dict(zip(WATCHED, values)))
+            entries.update({value: fire_at for value, fire_at in scheduled.items() if fire_at >= now.timestamp()})
+        if entries:
+            queue.schedule(entries)
+            total += len(entries)
+    return total
+
+
+def _wanted(values: Dict[str, Any], kind: str, now: float, preferences: Optional[Dict]) -> bool:
+    """False for reminders that are no longer due (the task moved or closed), far too late, or turned off"""
+    column, preference = KINDS[kind]
+    if values["status"] not in ACTIVE_STATUSES or values["recurrence"]:
+        return False
+    current = _fire_time(values[column], kind)
+    if current is None or not now - STALE_AFTER <= current.timestamp() <= now + 1:
+        return False
+    return ((preferences or {}).get("notification_preferences") or {}).get(preference, True)
+
+
+def process_due_reminders(queue=None, now: float = None, sink: Callable[[List[Reminder]], None] = None) -> int:
+    """Claim one batch of due reminders, deliver the ones still wanted and acknowledge the batch"""
+    queue = queue or get_reminder_queue()
+    sink = sink or _sinks[settings.reminder_sink]
+    now = now or time.time()
+    claimed = queue.claim(now, settings.reminder_batch_size, settings.reminder_lease_seconds)
+    if not claimed:
+        return 0
+
+    parsed = [(value, fire_at, *parse_member(value)) for value, fire_at in claimed]
+    db = SessionLocal()
+    try:
+        # Only the claimed tasks are read, with their owners' preferences
+        tasks = {
+            row[0]: row for row in db.execute(
+                select(Task.id, Task.title, *[getattr(Task, name) for name in WATCHED]).where(
+                    Task.id.in_({task_id for _, _, _, task_id, _ in parsed})
+                )
+            )
+        }
+        preferences = dict(db.execute(
+            select(User.id, User.preferences).where(User.id.in_({user_id for _, _, user_id, _, _ in parsed}))
+        ).all())
+    finally:
+        db.close()
+
+    reminders = []
+    reference = datetime.now(timezone.utc)
+    for value, fire_at, user_id, task_id, kind in parsed:
+        row = tasks.get(task_id)
+        if row is None:
+            continue
+        values = dict(zip(WATCHED, row[2:]))
+        if _wanted(values, kind, now, preferences.get(user_id)):
+            at = coerce_datetime(values[KINDS[kind][0]], reference)
+            reminders.append(Reminder(user_id, task_id, kind, row[1], at))
+    if reminders:
+        sink(reminders)  # not acknowledged if this raises, so the lease expires and they are retried
+    queue.ack([value for value, *_ in parsed])
+    return len(claimed)
+
+
+def _backfill_if_empty(queue) -> None:
+    if not len(queue):
+        db = SessionLocal()
+        try:
+            print(f"Queued {backfill_reminders(db, queue)} upcoming reminders")
+        finally:
+            db.close()
+
+
+async def run_reminder_worker(stop: asyncio.Event) -> None:
+    """Deliver reminders until `stop` is set; full batches are followed immediately by the next claim"""
+    backfilled = False
+    while not stop.is_set():
+        try:
+            queue = get_reminder_queue()
+            if not backfilled:
+                # Retried on every pass until it succeeds, so a worker started while Redis is down still refills it
+                await asyncio.to_thread(_backfill_if_empty, queue)
+                backfilled = True
+            claimed = await asyncio.to_thread(process_due_reminders, queue)
+        except Exception as e:
+            print(f"Reminder worker error: {e}")
+            claimed = 0
+        if claimed < settings.reminder_batch_size:
+            try:
+                await asyncio.wait_for(stop.wait(), settings.reminder_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+if __name__ == "__main__":
+    # Dedicated worker for settings.reminder_worker == "external": python -m app.services.reminders
+    asyncio.run(run_reminder_worker(asyncio.Event()))
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Dict, Any, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.models import Task
+from app.services.mood_analytics import user_timezone
+from app.services.scheduler import LocalScheduler, DEFAULT_DURATION, as_utc, coerce_datetime, reflow
+
+ACTIVE_STATUSES = ["pending", "in_progress"]
+
+
+def _duration(task: Task) -> int:
+    return task.estimated_duration or DEFAULT_DURATION
+
+
+def _local_now(now: Optional[datetime], tz: tzinfo) -> datetime:
+    # The schedule is laid out on the user's wall clock; everything stored is UTC
+    return as_utc(now).astimezone(tz) if now is not None else datetime.now(tz)
+
+
+def persist_schedule(tasks: List[Task], optimized_schedule: List[Dict[str, Any]], tz: tzinfo = timezone.utc) -> None:
+    """Store each task's suggested slot in Task.ai_suggested_time so later changes can be repaired in place"""
+    now = datetime.now(tz)
+    by_id = {task.id: task for task in tasks}
+
+    for item in optimized_schedule:
+        task = by_id.get(item.get("task_id"))
+        suggested_time = coerce_datetime(item.get("suggested_time"), now)
+        if task is not None and suggested_time is not None:
+            task.ai_suggested_time = suggested_time.astimezone(timezone.utc)
+
+
+def place_new_task(db: Session, task: Task, preferences: Dict, now: datetime = None) -> Optional[datetime]:
+    """Give a newly created task the first free slot in the persisted schedule without moving anything else"""
+    if task.ai_suggested_time is not None or task.status not in ACTIVE_STATUSES or task.recurrence:
+        # Recurring templates are never scheduled themselves, only their occurrences
+        return task.ai_suggested_time
+
+    tz = user_timezone(preferences)
+    now = _local_now(now, tz)
+    scheduler = LocalScheduler(preferences, horizon_days=2)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    booked = db.query(Task.ai_suggested_time, Task.estimated_duration).filter(
+        Task.user_id == task.user_id,
+        Task.id != task.id,
+        Task.status.in_(ACTIVE_STATUSES),
+        Task.ai_suggested_time >= today.astimezone(timezone.utc),
+        Task.ai_suggested_time < (today + timedelta(days=scheduler.horizon_days)).astimezone(timezone.utc)
+    ).all()
+    busy = []
+    for start, estimated_duration in booked:
+        start = as_utc(start).astimezone(tz)
+        busy.append((start, start + timedelta(minutes=estimated_duration or DEFAULT_DURATION)))
+
+    timeline, origin, now_minute = scheduler.build_timeline(now, busy)
+    deadline = None
+    due = as_utc(task.due_date).astimezone(tz) if task.due_date is not None else None
+    if due is not None:
+        deadline = int((due - origin).total_seconds() // 60)
+
+    start = timeline.find(now_minute, _duration(task), deadline)
+    if start is None:
+        start = timeline.find(now_minute, _duration(task))
+    if start is not None:
+        task.ai_suggested_time = (origin + timedelta(minutes=start)).astimezone(timezone.utc)
+    return task.ai_suggested_time
+
+
+def repair_schedule(
+    db: Session,
+    task: Task,
+    old_start: datetime,
+    old_duration: Optional[int],
+    preferences: Dict,
+    removed: bool = False,
+    now: datetime = None
+) -> List[Task]:
+    """Shift only the downstream slots affected by a change to `task`'s persisted slot.
+
+    Call after the task has been completed, deleted (`removed=True`) or had its
+    duration changed, passing its slot as it was before the change. Returns the tasks
+    whose ai_suggested_time moved or was cleared; nothing is committed here.
+    """
+    if old_start is None:
+        return []
+
+    tz = user_timezone(preferences)
+    now = _local_now(now, tz)
+    old_start = as_utc(old_start).astimezone(tz)
+    old_end = old_start + timedelta(minutes=old_duration or DEFAULT_DURATION)
+
+    if task.status in ACTIVE_STATUSES and not removed:
+        new_end = old_start + timedelta(minutes=_duration(task))
+    else:
+        # Completed or deleted: its remaining time is free from now (or from its start, if still ahead)
+        new_end = min(max(now, old_start), old_end)
+    if new_end == old_end:
+        return []
+
+    origin = old_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_end = LocalScheduler(preferences).day_end
+
+    def minutes(value: datetime) -> int:
+        return int((value - origin).total_seconds() // 60)
+
+    # Only slots starting after the changed one can be affected. They are streamed in
+    # start order, so fetching stops as soon as a gap absorbs the change.
+    downstream = db.execute(
+        select(Task).where(
+            Task.user_id == task.user_id,
+            Task.id != task.id,
+            Task.status.in_(ACTIVE_STATUSES),
+            Task.ai_suggested_time >= old_start.astimezone(timezone.utc),
+            Task.ai_suggested_time < (origin + timedelta(days=1)).astimezone(timezone.utc)
+        ).order_by(Task.ai_suggested_time).execution_options(yield_per=16)
+    ).scalars()
+
+    slots = (
+        (downstream_task, minutes(as_utc(downstream_task.ai_suggested_time).astimezone(tz)), _duration(downstream_task))
+        for downstream_task in downstream
+    )
+
+    changed = []
+    try:
+        for downstream_task, new_start in reflow(slots, minutes(old_end), minutes(new_end), minutes(now), day_end):
+            # Tasks pushed past the end of the working day are left for the next full optimization
+            downstream_task.ai_suggested_time = (
+                (origin + timedelta(minutes=new_start)).astimezone(timezone.utc) if new_start is not None else None
+            )
+            changed.append(downstream_task)
+    finally:
+        downstream.close()
+
+    return changed
@@ -0,0 +1,388 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+SLOT_GRANULARITY = 5  # minutes
+DEFAULT_DURATION = 60  # minutes
+
+# Longest stretch of back-to-back work before a break is inserted, by work style
+MAX_WORK_BLOCK = {
+    "focused": 120,
+    "structured": 90,
+    "flexible": 60,
+}
+
+PEAK_WINDOWS = {
+    "morning": (8 * 60, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 21 * 60),
+    "night": (20 * 60, 24 * 60),
+}
+
+
+def parse_clock(value: Any, default: int) -> int:
+    """Parse a wall-clock string such as "09:00", "9:30 AM" or "17:45:00" into minutes after midnight"""
+    if not value or not isinstance(value, str):
+        return default
+
+    text = value.strip().upper()
+    for fmt in ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p", "%I%p"):
+        try:
+            parsed = datetime.strptime(text, fmt)
+            return parsed.hour * 60 + parsed.minute
+        except ValueError:
+            continue
+    return default
+
+
+def as_utc(moment: datetime) -> datetime:
+    """An aware UTC datetime; naive values are read as UTC, which is how they are stored (SQLite drops the offset)"""
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def coerce_datetime(value: Any, reference: datetime) -> Optional[datetime]:
+    """Turn a due date (datetime, date or ISO string) into a datetime comparable with `reference`"""
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    elif not isinstance(value, datetime):
+        # Plain date objects
+        value = datetime(value.year, value.month, value.day)
+
+    if reference.tzinfo is None and value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    elif reference.tzinfo is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=reference.tzinfo)
+    elif reference.tzinfo is not None:
+        value = value.astimezone(reference.tzinfo)
+    return value
+
+
+class FreeTimeline:
+    """Sorted, non-overlapping free intervals on a minute axis.
+
+    Intervals are kept in two parallel lists so lookups are a bisect plus a
+    short forward scan; reserving time shrinks or splits a single interval.
+    """
+
+    def __init__(self, intervals: List[Tuple[int, int]]):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def find(self, earliest: int, duration: int, latest: Optional[int] = None) -> Optional[int]:
+        """Return the earliest start >= `earliest` with `duration` free minutes, finishing by `latest`"""
+        i = max(bisect_right(self.starts, earliest) - 1, 0)
+        for j in range(i, len(self.starts)):
+            start = max(self.starts[j], earliest)
+            if latest is not None and start + duration > latest:
+                return None
+            if start + duration <= self.ends[j]:
+                return start
+        return None
+
+    def is_free(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.ends[i] >= end
+
+    def reserve(self, start: int, end: int) -> None:
+        """Remove [start, end) from the timeline; the range must lie inside one free interval"""
+        i = bisect_right(self.starts, start) - 1
+        if i < 0 or self.ends[i] < end:
+            raise ValueError("Cannot reserve time that is not free")
+
+        interval_start, interval_end = self.starts[i], self.ends[i]
+        if start == interval_start and end == interval_end:
+            del self.starts[i]
+            del self.ends[i]
+        elif start == interval_start:
+            self.starts[i] = end
+        elif end == interval_end:
+            self.ends[i] = start
+        else:
+            self.ends[i] = start
+            self.starts.insert(i + 1, end)
+            self.ends.insert(i + 1, interval_end)
+
+    def subtract(self, start: int, end: int) -> None:
+        """Remove [start, end) wherever it overlaps free time"""
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        while i < len(self.starts) and self.starts[i] < end:
+            overlap_start = max(self.starts[i], start)
+            overlap_end = min(self.ends[i], end)
+            if overlap_start < overlap_end:
+                before = len(self.starts)
+                self.reserve(overlap_start, overlap_end)
+                if len(self.starts) < before:
+                    continue
+            i += 1
+
+
+def reflow(slots: Iterable[Tuple[Any, int, int]], old_end: int, new_end: int, floor: int, window_end: int):
+    """Repair a persisted schedule after the slot preceding `slots` moved its end from `old_end` to `new_end`.
+
+    `slots` yields (key, start, duration) in start order and is consumed lazily.
+    A later end pushes overlapping successors back; an earlier end pulls the
+    back-to-back chain that followed it forward, never before `floor`. The walk
+    stops at the first gap that absorbs the change, so the cost is proportional
+    to the number of slots that actually move. Yields (key, new_start) for each
+    moved slot, with new_start None when it no longer fits before `window_end`.
+    """
+    prev_old_end, prev_new_end = old_end, new_end
+
+    for key, start, duration in slots:
+        if prev_new_end > prev_old_end:
+            if start >= prev_new_end:
+                return
+            new_start = prev_new_end
+        else:
+            if start != prev_old_end:
+                return
+            new_start = max(prev_new_end, floor)
+            if new_start >= start:
+                return
+
+        prev_old_end = start + duration
+        if new_start + duration > window_end:
+            # Evicted: its time is released, successors see the gap it leaves
+            prev_new_end = new_start
+            yield key, None
+        else:
+            prev_new_end = new_start + duration
+            yield key, new_start
+
+
+class LocalScheduler:
+    """Deterministic constraint-based scheduler used as the AI fallback and as the LLM pre-pass.
+
+    Tasks are ordered by an effective deadline (the real due date, or a
+    priority-derived virtual one) and placed first-fit into the user's work
+    windows, preferring the productivity peak for high-priority work and
+    inserting breaks after long stretches of back-to-back tasks.
+    """
+
+    def __init__(self, preferences: Dict = None, horizon_days: int = 7):
+        preferences = preferences or {}
+        self.horizon_days = horizon_days
+        self.productivity_peak = preferences.get("productivity_peak", "morning")
+        self.break_duration = int(preferences.get("preferred_break_duration") or 15)
+        self.max_work_block = MAX_WORK_BLOCK.get(preferences.get("work_style"), 90)
+
+        wake = parse_clock(preferences.get("wake_time"), 7 * 60)
+        sleep = parse_clock(preferences.get("sleep_time"), 23 * 60)
+        self.day_start = parse_clock(preferences.get("work_hours_start"), 9 * 60)
+        self.day_end = parse_clock(preferences.get("work_hours_end"), 17 * 60)
+        if self.day_end <= self.day_start:
+            # Overnight or malformed windows fall back to the waking day
+            self.day_start, self.day_end = wake, sleep if sleep > wake else MINUTES_PER_DAY
+
+    def schedule(
+        self,
+        tasks: List[Dict],
+        current_time: datetime,
+        busy: List[Tuple[datetime, datetime]] = None,
+        mood_data: Dict = None
+    ) -> Dict[str, Any]:
+        """Place tasks into free time and return a schedule in the AIService response format"""
+
+        timeline, origin, now = self.build_timeline(current_time, busy)
+
+        max_block = self.max_work_block
+        energy = (mood_data or {}).get("energy")
+        if isinstance(energy, (int, float)) and energy <= 4:
+            max_block = min(max_block, 60)
+
+        schedule = []
+        breaks = []
+        unscheduled = []
+        run_ending_at: Dict[int, int] = {}  # minute -> length of the work run ending there
+        failed: Dict[Any, int] = {}
+
+        flexible = []
+        for task in tasks:
+            fixed = coerce_datetime(task.get("fixed_time"), current_time)
+            if fixed is None:
+                flexible.append(task)
+                continue
+            # Recurring occurrences keep their own start; everything else is planned around them
+            start = self._to_minutes(fixed, origin)
+            duration = task.get("estimated_duration") or DEFAULT_DURATION
+            timeline.subtract(start, start + duration)
+            schedule.append({
+                "task_id": task.get("id"),
+                "suggested_time": fixed.isoformat(),
+                "duration_minutes": duration,
+                "reasoning": "Recurring task kept at its set time"
+            })
+
+        for deadline, task, duration in self._order(flexible, current_time, origin, now):
+            start, on_time = self._place(timeline, task, duration, deadline, now, failed)
+            if start is None:
+                unscheduled.append(task.get("id"))
+                continue
+
+            run = run_ending_at.pop(start, 0)
+            if run and run + duration > max_block:
+                rest_end = start + self.break_duration
+                fits_deadline = deadline is None or rest_end + duration <= deadline
+                if fits_deadline and timeline.is_free(start, rest_end + duration):
+                    timeline.reserve(start, rest_end)
+                    breaks.append((start, self.break_duration))
+                    start, run = rest_end, 0
+
+            end = start + duration
+            timeline.reserve(start, end)
+            run += duration
+
+            if run >= max_block and timeline.is_free(end, end + self.break_duration):
+                timeline.reserve(end, end + self.break_duration)
+                breaks.append((end, self.break_duration))
+            elif timeline.is_free(end, end + SLOT_GRANULARITY):
+                run_ending_at[end] = run
+
+            schedule.append({
+                "task_id": task.get("id"),
+                "suggested_time": (origin + timedelta(minutes=start)).isoformat(),
+                "duration_minutes": duration,
+                "reasoning": self._reasoning(task, start, on_time)
+            })
+
+        schedule.sort(key=lambda item: item["suggested_time"])
+        breaks.sort()
+
+        return {
+            "optimized_schedule": schedule,
+            "break_suggestions": [
+                {
+                    "time": (origin + timedelta(minutes=start)).isoformat(),
+                    "duration_minutes": length,
+                    "type": "short_break"
+                }
+                for start, length in breaks
+            ],
+            "wellness_recommendations": [
+                "Stay hydrated throughout the day",
+                f"Take a {self.break_duration}-minute break after every {max_block} minutes of focused work"
+            ],
+            "schedule_insights": (
+                f"{len(schedule)} tasks scheduled within your working hours"
+                + (f"; {len(unscheduled)} did not fit in the next {self.horizon_days} days" if unscheduled else "")
+            ),
+            "unscheduled_task_ids": unscheduled,
+            "ai_confidence": 0.7
+        }
+
+    def build_timeline(self, current_time: datetime, busy: List[Tuple[datetime, datetime]] = None):
+        """Free work-hour time from `current_time` to the horizon; returns (timeline, origin, now_minute)"""
+        origin = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        now = current_time.hour * 60 + current_time.minute
+        now += -now % SLOT_GRANULARITY
+
+        timeline = FreeTimeline([
+            (max(day * MINUTES_PER_DAY + self.day_start, now), day * MINUTES_PER_DAY + self.day_end)
+            for day in range(self.horizon_days)
+        ])
+        for busy_start, busy_end in busy or []:
+            start = self._to_minutes(coerce_datetime(busy_start, current_time), origin)
+            end = self._to_minutes(coerce_datetime(busy_end, current_time), origin)
+            if start is not None and end is not None:
+                timeline.subtract(start, end)
+        return timeline, origin, now
+
+    def _order(self, tasks: List[Dict], current_time: datetime, origin: datetime, now: int):
+        """Yield (deadline, task, duration) in earliest-effective-deadline order"""
+        today_end = self.day_end
+        keyed = []
+        for index, task in enumerate(tasks):
+            priority = task.get("priority") or 1
+            duration = task.get("estimated_duration") or DEFAULT_DURATION
+            duration += -duration % SLOT_GRANULARITY
+
+            deadline = None
+            due = coerce_datetime(task.get("due_date"), current_time)
+            if due is not None:
+                deadline = self._to_minutes(due, origin)
+                if due.hour == 0 and due.minute == 0:
+                    # Date-only due dates mean "by the end of that working day"
+                    deadline += self.day_end
+                deadline = max(deadline, now)
+
+            # Undated work gets a virtual deadline: priority 5 today, priority 1 in four days
+            virtual = max(0, 5 - priority) * MINUTES_PER_DAY + today_end
+            effective = min(deadline, virtual) if deadline is not None else virtual
+            keyed.append((effective, -priority, duration, index, deadline, task))
+
+        keyed.sort(key=lambda item: item[:4])
+        for _, _, duration, _, deadline, task in keyed:
+            yield deadline, task, duration
+
+    def _place(
+        self,
+        timeline: FreeTimeline,
+        task: Dict,
+        duration: int,
+        deadline: Optional[int],
+        now: int,
+        failed: Dict[Any, int]
+    ):
+        """Pick a start minute, preferring the peak window for important work; returns (start, on_time).
+
+        Free time only ever shrinks, so `failed` remembers the shortest duration
+        that did not fit a search window and later, longer tasks skip it outright.
+        """
+        if (task.get("priority") or 1) >= 4 and self.productivity_peak in PEAK_WINDOWS:
+            peak_start, peak_end = PEAK_WINDOWS[self.productivity_peak]
+            for day in range(self.horizon_days):
+                window_start = max(day * MINUTES_PER_DAY + peak_start, now)
+                window_end = day * MINUTES_PER_DAY + peak_end
+                if deadline is not None and window_start + duration > deadline:
+                    break
+                if duration >= failed.get(day, MINUTES_PER_DAY + 1):
+                    continue
+                latest = min(window_end, deadline) if deadline is not None else window_end
+                start = timeline.find(window_start, duration, latest)
+                if start is not None:
+                    return start, True
+                if latest == window_end:
+                    failed[day] = duration
+
+        if duration >= failed.get("any", MINUTES_PER_DAY * self.horizon_days + 1):
+            return None, False
+        start = timeline.find(now, duration, deadline)
+        if start is not None:
+            return start, True
+        # Deadline cannot be met; schedule as soon as possible anyway
+        start = timeline.find(now, duration)
+        if start is None:
+            failed["any"] = duration
+        return start, deadline is None
+
+    def _reasoning(self, task: Dict, start: int, on_time: bool) -> str:
+        if not on_time:
+            return "Scheduled at the earliest free slot; the due date cannot be met"
+        minute_of_day = start % MINUTES_PER_DAY
+        peak = PEAK_WINDOWS.get(self.productivity_peak)
+        if peak and peak[0] <= minute_of_day < peak[1] and (task.get("priority") or 1) >= 4:
+            return f"High-priority task scheduled during {self.productivity_peak} productivity window"
+        if task.get("due_date"):
+            return "Scheduled ahead of its due date"
+        return "Scheduled in the next free slot by priority"
+
+    @staticmethod
+    def _to_minutes(value: Optional[datetime], origin: datetime) -> Optional[int]:
+        if value is None:
+            return None
+        return int((value - origin).total_seconds() // 60)
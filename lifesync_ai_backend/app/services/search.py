@@ -0,0 +1,183 @@
+import html
+import re
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# The databases mark matches with private-use characters; the text is HTML-escaped
+# before they become <mark> tags, so stored titles and bodies can never inject markup
+START_SENTINEL = "\ue000"
+END_SENTINEL = "\ue001"
+
+# Postgres: weighted tsvector generated columns (title/filename rank above body text) with GIN indexes
+POSTGRES_DDL = [
+    """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+    """ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(filename, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(extracted_content, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING GIN (search_vector)",
+]
+
+# SQLite (offline and tests): external-content FTS5 tables kept in sync by triggers
+SQLITE_FTS_TABLES = {
+    "tasks_fts": ("tasks", ["title", "description"]),
+    "documents_fts": ("documents", ["filename", "extracted_content"]),
+}
+
+
+def _sqlite_ddl(fts_table: str, source: str, columns: List[str]) -> List[str]:
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, content='{source}', content_rowid='id')",
+        f"""CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {source} BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {source} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER {fts_table}_au AFTER UPDATE ON {source} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END""",
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def create_search_indexes(engine: Engine) -> None:
+    """Create the full-text search columns, indexes or FTS tables for the current database (idempotent)"""
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            for statement in POSTGRES_DDL:
+                connection.execute(text(statement))
+        elif engine.dialect.name == "sqlite":
+            existing = {
+                row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+            }
+            for fts_table, (source, columns) in SQLITE_FTS_TABLES.items():
+                if fts_table not in existing:
+                    for statement in _sqlite_ddl(fts_table, source, columns):
+                        connection.execute(text(statement))
+
+
+WEBSEARCH_TOKEN = re.compile(r'(-?)"([^"]*)"?|(-?)([^\s"]+)')
+
+
+def _fts5_query(query: str) -> str:
+    """Translate websearch syntax ("phrases", OR, -term) to FTS5 the way websearch_to_tsquery reads it.
+
+    Every term is quoted so user input cannot inject FTS5 syntax, and a
+    trailing bare word matches as a prefix. FTS5 has no unary NOT, so an OR
+    branch made only of excluded terms is dropped rather than matching everything.
+    """
+    branches = [([], [])]  # OR branches of (required, excluded) quoted terms
+    last_bare = None
+    for match in WEBSEARCH_TOKEN.finditer(query):
+        phrase_negated, phrase, word_negated, word = match.groups()
+        if word is not None and word.lower() == "or" and not word_negated:
+            if branches[-1][0] or branches[-1][1]:
+                branches.append(([], []))
+            last_bare = None
+            continue
+        terms = re.findall(r"\w+", phrase if phrase is not None else word)
+        if not terms:
+            continue
+        quoted = '"' + " ".join(terms) + '"'
+        required, excluded = branches[-1]
+        if phrase_negated or word_negated:
+            excluded.append(quoted)
+            last_bare = None
+        else:
+            required.append(quoted)
+            last_bare = (required, len(required) - 1) if word is not None and len(terms) == 1 else None
+    if last_bare is not None:
+        required, index = last_bare
+        required[index] += "*"
+    rendered = [
+        "(" + " ".join(required) + "".join(f" NOT {term}" for term in excluded) + ")"
+        for required, excluded in branches if required
+    ]
+    return " OR ".join(rendered)
+
+
+def _marked(value: Optional[str]) -> Optional[str]:
+    """HTML-escape highlighted text, then turn the match sentinels into <mark> tags"""
+    if value is None:
+        return None
+    return html.escape(value).replace(START_SENTINEL, HIGHLIGHT_START).replace(END_SENTINEL, HIGHLIGHT_END)
+
+
+def search(db: Session, user_id: int, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Ranked, highlighted search over the user's tasks and uploaded document content"""
+    if not query.strip():
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        # Rank inside the indexes first; ts_headline is costly, so only run it on the page being returned
+        rows = db.execute(text(f"""
+            WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query),
+            ranked AS (
+                SELECT 'task' AS type, t.id, t.title, t.status,
+                       coalesce(t.description, '') AS body, ts_rank_cd(t.search_vector, q.query) AS rank
+                FROM tasks t, q
+                WHERE t.user_id = :user_id AND t.search_vector @@ q.query
+                UNION ALL
+                SELECT 'document' AS type, d.id, d.filename AS title, d.processing_status AS status,
+                       coalesce(d.extracted_content, '') AS body, ts_rank_cd(d.search_vector, q.query) AS rank
+                FROM documents d, q
+                WHERE d.user_id = :user_id AND d.search_vector @@ q.query
+                ORDER BY rank DESC
+                LIMIT :limit
+            )
+            SELECT ranked.type, ranked.id, ranked.title, ranked.status, ranked.rank,
+                   ts_headline('english', ranked.title, q.query,
+                               'StartSel={START_SENTINEL}, StopSel={END_SENTINEL}, HighlightAll=true') AS title_highlight,
+                   ts_headline('english', ranked.body, q.query,
+                               'StartSel={START_SENTINEL}, StopSel={END_SENTINEL}, MaxFragments=2, MaxWords=20, MinWords=5') AS snippet
+            FROM ranked, q
+            ORDER BY ranked.rank DESC
+        """), {"query": query, "user_id": user_id, "limit": limit})
+    else:
+        match = _fts5_query(query)
+        if not match:
+            return []
+        # bm25() is lower-is-better; weight the title column above the body
+        rows = db.execute(text(f"""
+            SELECT type, id, title, status, rank, title_highlight, snippet FROM (
+                SELECT 'task' AS type, t.id, t.title, t.status, -bm25(tasks_fts, 10.0, 1.0) AS rank,
+                       highlight(tasks_fts, 0, '{START_SENTINEL}', '{END_SENTINEL}') AS title_highlight,
+                       snippet(tasks_fts, 1, '{START_SENTINEL}', '{END_SENTINEL}', '…', 16) AS snippet
+                FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH :match AND t.user_id = :user_id
+                UNION ALL
+                SELECT 'document' AS type, d.id, d.filename, d.processing_status, -bm25(documents_fts, 10.0, 1.0),
+                       highlight(documents_fts, 0, '{START_SENTINEL}', '{END_SENTINEL}'),
+                       snippet(documents_fts, 1, '{START_SENTINEL}', '{END_SENTINEL}', '…', 16)
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE documents_fts MATCH :match AND d.user_id = :user_id
+            )
+            ORDER BY rank DESC
+            LIMIT :limit
+        """), {"match": match, "user_id": user_id, "limit": limit})
+
+    return [
+        {
+            "type": row.type,
+            "id": row.id,
+            "title": row.title,
+            "status": row.status,
+            "rank": float(row.rank),
+            "title_highlight": _marked(row.title_highlight),
+            "snippet": _marked(row.snippet or None),
+        }
+        for row in rows
+    ]
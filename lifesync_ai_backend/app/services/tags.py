@@ -0,0 +1,92 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.models import MoodEntry, MoodTag, Task, TaskTag
+
+MAX_TAG_LENGTH = 64
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> List[str]:
+    """Lowercase, trim and de-duplicate tags, keeping their first-seen order"""
+    normalized = []
+    for tag in tags or []:
+        if not isinstance(tag, str):
+            continue
+        tag = tag.strip().lower()[:MAX_TAG_LENGTH]
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def merge_tags(tags: Optional[Iterable[str]], more: Optional[Iterable[str]]) -> List[str]:
+    """Append the tags from `more` that `tags` does not already carry (compared normalized), keeping order"""
+    merged = list(tags or [])
+    seen = set(normalize_tags(merged))
+    for tag in more or []:
+        key = normalize_tags([tag])
+        if key and key[0] not in seen:
+            seen.add(key[0])
+            merged.append(tag)
+    return merged
+
+
+def _sync_tag_rows(owner, row_class) -> None:
+    """Make owner.tag_rows match owner.tags; flushed with the owner itself"""
+    wanted = normalize_tags(owner.tags)
+    existing = {row.tag for row in owner.tag_rows}
+    owner.tag_rows = [row for row in owner.tag_rows if row.tag in wanted] + [
+        row_class(tag=tag, user_id=owner.user_id) for tag in wanted if tag not in existing
+    ]
+
+
+def sync_task_tags(task: Task) -> None:
+    """Make the task's task_tags rows match Task.tags"""
+    _sync_tag_rows(task, TaskTag)
+
+
+def sync_mood_tags(entry: MoodEntry) -> None:
+    """Make the entry's mood_tags rows match MoodEntry.tags"""
+    _sync_tag_rows(entry, MoodTag)
+
+
+def filter_by_tags(query, user_id: int, tags: Iterable[str]):
+    """Restrict a Task query to tasks carrying every one of `tags`"""
+    for tag in normalize_tags(tags):
+        query = query.filter(Task.id.in_(
+            select(TaskTag.task_id).where(TaskTag.user_id == user_id, TaskTag.tag == tag)
+        ))
+    return query
+
+
+def tag_counts(db: Session, user_id: int, status: str = None, limit: int = 100) -> List[dict]:
+    """Number of tasks per tag, most used first"""
+    query = db.query(TaskTag.tag, func.count(TaskTag.task_id).label("count")).filter(TaskTag.user_id == user_id)
+    if status:
+        query = query.join(Task, Task.id == TaskTag.task_id).filter(Task.status == status)
+    rows = query.group_by(TaskTag.tag).order_by(func.count(TaskTag.task_id).desc(), TaskTag.tag).limit(limit)
+    return [{"tag": tag, "count": count} for tag, count in rows]
+
+
+def mood_tag_counts(db: Session, user_id: int, limit: int = 100) -> List[dict]:
+    """Number of mood entries per tag, most used first"""
+    rows = db.query(MoodTag.tag, func.count(MoodTag.entry_id)).filter(
+        MoodTag.user_id == user_id
+    ).group_by(MoodTag.tag).order_by(func.count(MoodTag.entry_id).desc(), MoodTag.tag).limit(limit)
+    return [{"tag": tag, "count": count} for tag, count in rows]
+
+
+def backfill_task_tags(engine: Engine) -> None:
+    """Populate task_tags from Task.tags for databases created before the table existed"""
+    with Session(engine) as db:
+        if db.query(TaskTag.task_id).first() is not None:
+            return
+        rows = [
+            {"task_id": task_id, "user_id": user_id, "tag": tag}
+            for task_id, user_id, tags in db.query(Task.id, Task.user_id, Task.tags).filter(Task.tags.isnot(None))
+            for tag in normalize_tags(tags)
+        ]
+        if rows:
+            db.execute(TaskTag.__table__.insert(), rows)
+            db.commit()
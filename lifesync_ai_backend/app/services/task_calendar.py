@@ -0,0 +1,67 @@
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.models import Task
+from app.services.recurrence import expand_occurrences
+from app.services.scheduler import as_utc
+
+# Exactly what the calendar renders; every column is in ix_tasks_user_due_date so
+# PostgreSQL can answer the range from the index alone
+CALENDAR_COLUMNS = (
+    Task.id, Task.title, Task.status, Task.priority, Task.due_date, Task.estimated_duration, Task.ai_suggested_time
+)
+
+
+def _local(moment: datetime, tz: tzinfo) -> datetime:
+    return as_utc(moment).astimezone(tz) if moment is not None else None
+
+
+def calendar_days(db: Session, user_id: int, first: date, last: date, tz: tzinfo) -> List[Dict[str, Any]]:
+    """Tasks due on each local day in [first, last], in start order, including recurring occurrences"""
+    window_start = datetime.combine(first, time(), tz).astimezone(timezone.utc)
+    window_end = datetime.combine(last + timedelta(days=1), time(), tz).astimezone(timezone.utc)
+
+    rows = db.execute(
+        select(*CALENDAR_COLUMNS).where(
+            Task.user_id == user_id,
+            Task.due_date >= window_start,
+            Task.due_date < window_end,
+            Task.recurrence.is_(None)
+        ).order_by(Task.due_date, Task.id)
+    ).all()
+
+    entries = [
+        {
+            "id": task_id,
+            "title": title,
+            "status": status,
+            "priority": priority,
+            "due_date": _local(due_date, tz),
+            "estimated_duration": estimated_duration,
+            "ai_suggested_time": _local(ai_suggested_time, tz),
+        }
+        for task_id, title, status, priority, due_date, estimated_duration, ai_suggested_time in rows
+    ]
+    # Materialized occurrences are already rows above; only the virtual ones are added
+    for occurrence in expand_occurrences(db, user_id, window_start, window_end, tz):
+        if occurrence["task_id"] is None:
+            entries.append({
+                "id": None,
+                "template_id": occurrence["template_id"],
+                "occurrence_key": occurrence["occurrence_key"],
+                "title": occurrence["title"],
+                "status": occurrence["status"],
+                "priority": occurrence["priority"],
+                "due_date": _local(occurrence["occurrence_start"], tz),
+                "estimated_duration": occurrence["estimated_duration"],
+                "ai_suggested_time": None,
+            })
+    entries.sort(key=lambda entry: entry["due_date"])
+
+    days = {first + timedelta(days=offset): [] for offset in range((last - first).days + 1)}
+    for entry in entries:
+        days[entry["due_date"].date()].append(entry)
+    return [{"date": day, "tasks": tasks} for day, tasks in days.items()]
@@ -0,0 +1,21 @@
+from celery import Celery
+
+from app.core.config import settings
+from app.services.document_service import process_document
+from app.services.jobs import process_job
+import app.api.v1.endpoints.tasks  # noqa: F401  registers the voice and schedule job handlers
+
+# Start with: celery -A app.worker worker --loglevel=info
+celery_app = Celery("lifesync", broker=settings.redis_url, backend=settings.redis_url)
+celery_app.conf.task_acks_late = True
+celery_app.conf.worker_prefetch_multiplier = 1
+
+
+@celery_app.task(name="documents.process")
+def process_document_task(document_id: int) -> None:
+    process_document(document_id)
+
+
+@celery_app.task(name="jobs.run")
+def run_job_task(job_id: str) -> None:
+    process_job(job_id)
@@ -0,0 +1,218 @@
+"""Shared document blobs, task recurrence/tags/embeddings, mood rollups, AI interaction metrics and jobs
+
+Brings a database created from the original models up to date. The startup
+create_all only creates missing tables, so it may already have added some of
+the new ones; every step here checks what exists first.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _columns(table: str):
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str):
+    inspector = sa.inspect(op.get_bind())
+    names = {index["name"] for index in inspector.get_indexes(table)}
+    return names | {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+
+
+def _is_sqlite() -> bool:
+    return op.get_bind().dialect.name == "sqlite"
+
+
+def _add_columns(table: str, *columns: sa.Column) -> None:
+    existing = _columns(table)
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def _add_foreign_key(name: str, source: str, referent: str, local: str, remote: str, **kw) -> None:
+    # SQLite cannot add a constraint to an existing table without rebuilding it; the column is enough there
+    if not _is_sqlite():
+        op.create_foreign_key(name, source, referent, [local], [remote], **kw)
+
+
+def upgrade() -> None:
+    tables = _tables()
+
+    if "document_blobs" not in tables:
+        op.create_table(
+            "document_blobs",
+            sa.Column("content_hash", sa.String(64), primary_key=True),
+            sa.Column("file_path", sa.String(), nullable=False),
+            sa.Column("file_size", sa.Integer()),
+            sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("extracted_content", sa.Text()),
+            sa.Column("extracted_tasks", sa.JSON()),
+            sa.Column("processing_status", sa.String()),
+            sa.Column("claimed_at", sa.DateTime(timezone=True)),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processed_at", sa.DateTime(timezone=True)),
+        )
+    else:
+        _add_columns("document_blobs", sa.Column("claimed_at", sa.DateTime(timezone=True)))
+
+    if "content_hash" not in _columns("documents"):
+        op.add_column("documents", sa.Column("content_hash", sa.String(64)))
+        _add_foreign_key(
+            "fk_documents_content_hash", "documents", "document_blobs", "content_hash", "content_hash"
+        )
+    if "ix_documents_content_hash" not in _indexes("documents"):
+        op.create_index("ix_documents_content_hash", "documents", ["content_hash"])
+
+    task_columns = _columns("tasks")
+    _add_columns(
+        "tasks",
+        sa.Column("embedding", sa.LargeBinary()),
+        sa.Column("recurrence", sa.JSON()),
+        sa.Column("recurrence_parent_id", sa.Integer()),
+        sa.Column("occurrence_start", sa.DateTime(timezone=True)),
+        sa.Column("duplicate_of", sa.Integer()),
+    )
+    for column in ("recurrence_parent_id", "duplicate_of"):
+        if column not in task_columns:
+            _add_foreign_key(f"fk_tasks_{column}", "tasks", "tasks", column, "id", ondelete="SET NULL")
+
+    task_indexes = _indexes("tasks")
+    if "ix_tasks_recurrence_parent_id" not in task_indexes:
+        op.create_index("ix_tasks_recurrence_parent_id", "tasks", ["recurrence_parent_id"])
+    if "ix_tasks_user_suggested_time" not in task_indexes:
+        op.create_index("ix_tasks_user_suggested_time", "tasks", ["user_id", "ai_suggested_time"])
+    if "ix_tasks_user_due_date" not in task_indexes:
+        op.create_index(
+            "ix_tasks_user_due_date", "tasks", ["user_id", "due_date"],
+            postgresql_include=["title", "status", "priority", "estimated_duration", "ai_suggested_time"],
+            postgresql_where=sa.text("recurrence IS NULL"),
+            sqlite_where=sa.text("recurrence IS NULL"),
+        )
+    if "uq_tasks_occurrence" not in task_indexes:
+        if _is_sqlite():
+            op.create_index("uq_tasks_occurrence", "tasks", ["recurrence_parent_id", "occurrence_start"], unique=True)
+        else:
+            op.create_unique_constraint("uq_tasks_occurrence", "tasks", ["recurrence_parent_id", "occurrence_start"])
+
+    if "task_tags" not in tables:
+        op.create_table(
+            "task_tags",
+            sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("tag", sa.String(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_task_tags_user_tag", "task_tags", ["user_id", "tag", "task_id"])
+
+    if "duration_stats" not in tables:
+        op.create_table(
+            "duration_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("tag", sa.String(), primary_key=True),
+            sa.Column("samples", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("log_mean", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("log_var", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    if "ix_mood_entries_user_created" not in _indexes("mood_entries"):
+        op.create_index("ix_mood_entries_user_created", "mood_entries", ["user_id", "created_at"])
+
+    if "mood_tags" not in tables:
+        op.create_table(
+            "mood_tags",
+            sa.Column("entry_id", sa.Integer(), sa.ForeignKey("mood_entries.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("tag", sa.String(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_mood_tags_user_tag", "mood_tags", ["user_id", "tag", "entry_id"])
+
+    if "mood_rollups" not in tables:
+        op.create_table(
+            "mood_rollups",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("period", sa.String(4), primary_key=True),
+            sa.Column("period_start", sa.Date(), primary_key=True),
+            sa.Column("entry_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("mood_sum", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("mood_min", sa.Integer()),
+            sa.Column("mood_max", sa.Integer()),
+            sa.Column("energy_sum", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("energy_min", sa.Integer()),
+            sa.Column("energy_max", sa.Integer()),
+            sa.Column("stress_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("stress_sum", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("stress_min", sa.Integer()),
+            sa.Column("stress_max", sa.Integer()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    _add_columns(
+        "ai_interactions",
+        sa.Column("model", sa.String()),
+        sa.Column("latency_ms", sa.Float()),
+        sa.Column("prompt_tokens", sa.Integer()),
+        sa.Column("completion_tokens", sa.Integer()),
+        sa.Column("used_fallback", sa.Boolean()),
+    )
+
+    if "jobs" not in tables:
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.String(32), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("kind", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("payload", sa.JSON()),
+            sa.Column("result", sa.JSON()),
+            sa.Column("error", sa.Text()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("finished_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_jobs_user_id", "jobs", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("jobs")
+    for column in ("used_fallback", "completion_tokens", "prompt_tokens", "latency_ms", "model"):
+        op.drop_column("ai_interactions", column)
+    op.drop_table("mood_rollups")
+    op.drop_table("mood_tags")
+    op.drop_index("ix_mood_entries_user_created", table_name="mood_entries")
+    op.drop_table("duration_stats")
+    op.drop_table("task_tags")
+
+    with op.batch_alter_table("tasks") as batch:
+        if _is_sqlite():
+            batch.drop_index("uq_tasks_occurrence")
+        else:
+            batch.drop_constraint("uq_tasks_occurrence", type_="unique")
+            batch.drop_constraint("fk_tasks_duplicate_of", type_="foreignkey")
+            batch.drop_constraint("fk_tasks_recurrence_parent_id", type_="foreignkey")
+        batch.drop_index("ix_tasks_user_due_date")
+        batch.drop_index("ix_tasks_user_suggested_time")
+        batch.drop_index("ix_tasks_recurrence_parent_id")
+        for column in ("duplicate_of", "occurrence_start", "recurrence_parent_id", "recurrence", "embedding"):
+            batch.drop_column(column)
+
+    with op.batch_alter_table("documents") as batch:
+        batch.drop_index("ix_documents_content_hash")
+        if not _is_sqlite():
+            batch.drop_constraint("fk_documents_content_hash", type_="foreignkey")
+        batch.drop_column("content_hash")
+    op.drop_table("document_blobs")
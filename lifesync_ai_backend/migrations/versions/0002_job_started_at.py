@@ -0,0 +1,27 @@
+"""Record when a job was claimed, so jobs lost with their worker can be failed
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # create_all at startup may already have created the jobs table with the column
+    if "started_at" not in {column["name"] for column in sa.inspect(op.get_bind()).get_columns("jobs")}:
+        op.add_column("jobs", sa.Column("started_at", sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch:
+        batch.drop_column("started_at")
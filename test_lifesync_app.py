@@ -5,14 +5,21 @@ Tests all major components: Frontend, Backend, Authentication, Voice Input, etc.
 For Class Project
 """
 
+import hashlib
 import json
+import math
 import asyncio
 import requests
 import unittest
-from datetime import datetime, timedelta
+import uuid
+from datetime import date, datetime, timedelta, timezone
 from unittest.mock import Mock, patch, AsyncMock
+from typing import List
 import sys
 import os
+import tempfile
+import io
+import pytest
 
 # Add the backend directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'lifesync_ai_backend'))
@@ -22,6 +29,61 @@ try:
     from app.models.models import User, Task
     from app.schemas.user import UserCreate, UserLogin
     from app.schemas.task import TaskCreate, TaskUpdate
+    from app.services.scheduler import LocalScheduler, reflow
+    from app.services.duration_model import Estimate, predict_duration
+    from app.services.recurrence import iter_occurrences, normalize_rule
+    from app.services.reminders import HeapReminderQueue
+    from app.core.metrics import Histogram
+    from app.core.query_profiler import profile_queries
+    from app.core import tracing
+    from app.core.config import settings
+    from app.core.database import Base
+    from sqlalchemy import create_engine, text
+    from benchmarks.run import comparable, summarize
+    from benchmarks.corpus import voice_corpus
+    from app.core.serialization import FastJSONResponse, row_dicts
+    from app.api.v1.endpoints.tasks import TASK_LIST_COLUMNS, _task_dicts
+    from app.schemas.task import Task as TaskSchema, VoiceTaskInput
+    from pydantic import TypeAdapter
+    from app.services.rate_limit import FairQueue, MemoryTokenBuckets
+    from app.services.idempotency import idempotent
+    from app.services import jobs
+    from app.models.models import Job
+    from fastapi import HTTPException
+    from starlette.responses import JSONResponse
+    from sqlalchemy.orm import Session, selectinload, sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.services.search import _fts5_query, create_search_indexes, search
+    from app.services import embeddings
+    from app.services.embeddings import embedding_bytes, find_duplicates, hashed_embedding
+    from app.models.models import Document, DocumentBlob
+    from app.services.document_service import acquire_blob, process_document, release_blob, remove_blob_file
+    from app.services import document_service
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.v1.endpoints import documents as documents_endpoint
+    from app.api.v1.endpoints.auth import get_current_user
+    from app.core.database import get_db
+    from app.models.models import TaskTag
+    from app.services.tags import backfill_task_tags, filter_by_tags, merge_tags, sync_task_tags, tag_counts
+    from zoneinfo import ZoneInfo
+    from app.models.models import MoodEntry, MoodRollup
+    from app.services.mood_analytics import mood_trends, rebuild_rollups, record_entry, rolling_averages
+    from collections import OrderedDict
+    from app.models.models import TaskCheckIn
+    from app.services import insights
+    from app.services import events
+    from app.models.models import AIInteraction
+    from app.services.ai_logging import InteractionLog, interaction_user_id, write_interactions
+    from app.services.rescheduler import persist_schedule, place_new_task, repair_schedule
+    from app.services.scheduler import as_utc
+    from app.api.v1.endpoints import tasks as tasks_endpoint
+    from app.models.models import DurationStat
+    from app.services import reminders
+    from redis import RedisError
+    from app.services.recurrence import parse_occurrence_key
 except ImportError as e:
     print(f"Warning: Could not import backend modules: {e}")
 
@@ -477,6 +539,1390 @@ Local Date/Time: {local_time}
         self.assertIn(".", valid_email)
         print("  ✅ Email validation working")
 
+class TestSchedulingEngine(unittest.TestCase):
+    """Local scheduler tests (no server required)"""
+    
+    def setUp(self):
+        self.now = datetime(2024, 1, 15, 8, 30)
+        self.preferences = {
+            "work_hours_start": "09:00",
+            "work_hours_end": "17:00",
+            "productivity_peak": "morning",
+            "preferred_break_duration": 15,
+            "work_style": "structured"
+        }
+    
+    def test_schedule_respects_work_hours_and_overlaps(self):
+        """Scheduled tasks stay inside work hours and never overlap"""
+        print("\n🧪 Scheduling Engine: Work Hours and Overlaps")
+        
+        tasks = [
+            {"id": i, "title": f"Task {i}", "priority": (i % 5) + 1, "estimated_duration": 45, "due_date": None}
+            for i in range(30)
+        ]
+        result = LocalScheduler(self.preferences).schedule(tasks, self.now)
+        
+        slots = sorted(
+            (datetime.fromisoformat(item["suggested_time"]), item["duration_minutes"])
+            for item in result["optimized_schedule"]
+        )
+        self.assertEqual(len(slots) + len(result["unscheduled_task_ids"]), len(tasks))
+        for start, duration in slots:
+            end = start + timedelta(minutes=duration)
+            self.assertGreaterEqual(start.hour, 9)
+            self.assertLessEqual((end.hour, end.minute), (17, 0))
+        for (start, duration), (next_start, _) in zip(slots, slots[1:]):
+            self.assertLessEqual(start + timedelta(minutes=duration), next_start)
+        print("  ✅ Schedule is overlap-free and inside work hours")
+    
+    def test_schedule_orders_by_deadline(self):
+        """Tasks due sooner are placed before undated, low-priority work"""
+        print("\n🧪 Scheduling Engine: Deadlines")
+        
+        tasks = [
+            {"id": 1, "title": "Someday", "priority": 1, "estimated_duration": 60, "due_date": None},
+            {"id": 2, "title": "Due today", "priority": 2, "estimated_duration": 60, "due_date": "2024-01-15"},
+        ]
+        result = LocalScheduler(self.preferences).schedule(tasks, self.now)
+        
+        order = [item["task_id"] for item in result["optimized_schedule"]]
+        self.assertEqual(order, [2, 1])
+        self.assertTrue(result["optimized_schedule"][0]["suggested_time"].startswith("2024-01-15T09:00"))
+        print("  ✅ Earliest deadline scheduled first")
+    
+    def test_reflow_only_moves_affected_slots(self):
+        """Growing a slot pushes overlapping successors; a gap stops the repair"""
+        print("\n🧪 Scheduling Engine: Incremental Repair")
+        
+        # 09:00-10:00 grows to 10:30; 10:00 and 10:30 are back to back, 13:00 is after a gap
+        slots = [("a", 600, 30), ("b", 630, 60), ("c", 780, 30)]
+        moved = list(reflow(iter(slots), 600, 630, floor=540, window_end=1020))
+        self.assertEqual(moved, [("a", 630), ("b", 660)])
+        
+        # Completing the 09:00-10:00 task at 09:15 pulls the back-to-back chain forward
+        pulled = list(reflow(iter(slots), 600, 555, floor=555, window_end=1020))
+        self.assertEqual(pulled, [("a", 555), ("b", 585)])
+        
+        # Slots pushed past the end of the working day are evicted
+        evicted = list(reflow(iter([("late", 990, 30)]), 990, 1000, floor=540, window_end=1020))
+        self.assertEqual(evicted, [("late", None)])
+        print("  ✅ Only downstream slots were shifted")
+    
+    def test_duration_prediction_prefers_tag_history(self):
+        """Learned durations use tags with enough history, then the user's overall estimate"""
+        print("\n🧪 Scheduling Engine: Learned Durations")
+        
+        model = {
+            "*": Estimate(samples=20, log_mean=math.log(45), log_var=0.2),
+            "gym": Estimate(samples=5, log_mean=math.log(90), log_var=0.01),
+            "email": Estimate(samples=1, log_mean=math.log(10), log_var=0.0),
+        }
+        self.assertEqual(predict_duration(model, ["Gym"]), 90)
+        self.assertEqual(predict_duration(model, ["email"]), 45)  # too few samples for the tag
+        self.assertEqual(predict_duration(model, None), 45)
+        self.assertIsNone(predict_duration({}, ["gym"]))
+        print("  ✅ Durations predicted from completion history")
+
+    def test_recurrence_expands_only_the_window(self):
+        """Recurring occurrences are generated for the requested window and keep local time across DST"""
+        print("\n🧪 Scheduling Engine: Recurring Occurrences")
+        from datetime import timezone
+        from zoneinfo import ZoneInfo
+        
+        berlin = ZoneInfo("Europe/Berlin")
+        rule = normalize_rule({"freq": "weekly", "byweekday": ["mon", "fri"]})
+        dtstart = datetime(2020, 1, 6, 8, 0, tzinfo=timezone.utc)  # 09:00 in Berlin
+        occurrences = list(iter_occurrences(
+            rule, dtstart, datetime(2026, 3, 23, tzinfo=timezone.utc), datetime(2026, 4, 4, tzinfo=timezone.utc), berlin
+        ))
+        self.assertEqual([o.day for o in occurrences], [23, 27, 30, 3])
+        self.assertTrue(all(o.hour == 9 for o in occurrences))
+        self.assertEqual(occurrences[-1].utcoffset(), timedelta(hours=2))
+        
+        limited = normalize_rule({"freq": "daily", "count": 3})
+        self.assertEqual(len(list(iter_occurrences(
+            limited, dtstart, dtstart, dtstart + timedelta(days=30), timezone.utc
+        ))), 3)
+        with self.assertRaises(ValueError):
+            normalize_rule({"freq": "hourly"})
+        print("  ✅ Occurrences expanded lazily within the window")
+
+    def test_reminder_queue_claims_due_batches(self):
+        """The in-process reminder queue claims due reminders in order and retries expired leases"""
+        print("\n🧪 Scheduling Engine: Reminder Queue")
+        
+        queue = HeapReminderQueue()
+        queue.schedule({"1:1:due": 100.0, "1:2:due": 50.0, "1:3:due": 500.0, "1:4:due": 80.0})
+        queue.schedule({"1:4:due": 400.0})  # rescheduled
+        queue.cancel(["1:2:due"])
+        
+        self.assertEqual(queue.claim(now=200.0, limit=10, lease_seconds=30), [("1:1:due", 100.0)])
+        self.assertEqual(queue.claim(now=210.0, limit=10, lease_seconds=30), [])
+        # Not acknowledged in time, so it is handed out again
+        self.assertEqual(queue.claim(now=231.0, limit=10, lease_seconds=30), [("1:1:due", 100.0)])
+        queue.ack(["1:1:due"])
+        self.assertEqual([m for m, _ in queue.claim(now=1000.0, limit=1, lease_seconds=30)], ["1:4:due"])
+        self.assertEqual(len(queue), 2)
+        print("  ✅ Reminders claimed in fire-time order")
+
+    def test_reminder_worker_survives_redis_down_at_startup(self):
+        """A failing startup backfill is logged and retried on the next pass instead of killing the worker"""
+        print("\n🧪 Scheduling Engine: Reminder Worker Startup")
+        
+        class FlakyQueue(HeapReminderQueue):
+            calls = 0
+            
+            def __len__(self):
+                FlakyQueue.calls += 1
+                if FlakyQueue.calls == 1:
+                    raise RedisError("Connection refused")
+                return 0
+        
+        async def run():
+            stop = asyncio.Event()
+            passes = []
+            
+            def process(queue):
+                passes.append(queue)
+                if len(passes) == 2:
+                    stop.set()
+                return 0
+            
+            with patch.object(reminders, "get_reminder_queue", FlakyQueue), \
+                    patch.object(reminders, "SessionLocal", Mock()), \
+                    patch.object(reminders, "backfill_reminders", Mock(return_value=0)) as backfill, \
+                    patch.object(reminders, "process_due_reminders", process), \
+                    patch.object(settings, "reminder_poll_seconds", 0.01):
+                await asyncio.wait_for(reminders.run_reminder_worker(stop), 5)
+            return passes, backfill
+        
+        passes, backfill = asyncio.run(run())
+        self.assertEqual(len(passes), 2)
+        backfill.assert_called_once()
+        print("  ✅ Worker kept running and backfilled once Redis answered")
+
+class TestSearch(unittest.TestCase):
+    """Full-text search over tasks on the SQLite FTS5 backend"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(cls.engine)
+        create_search_indexes(cls.engine)
+        with Session(cls.engine) as db:
+            user = User(email="search@example.com", username="search", hashed_password="x")
+            db.add(user)
+            db.flush()
+            cls.user_id = user.id
+            db.add_all([
+                Task(user_id=user.id, title="Finish <script>alert(1)</script> essay", description="History essay & sources"),
+                Task(user_id=user.id, title="Call mom", description="Ask about the weekend"),
+                Task(user_id=user.id, title="Buy flowers", description="For mom's birthday"),
+                Task(user_id=user.id, title="Call dad"),
+            ])
+            db.commit()
+    
+    def test_highlights_are_html_escaped(self):
+        """Stored markup comes back escaped; only the match markers are tags"""
+        print("\n🧪 Search: Escaped Highlights")
+        
+        with Session(self.engine) as db:
+            result, = search(db, self.user_id, "essay")
+        self.assertEqual(result["title_highlight"], "Finish &lt;script&gt;alert(1)&lt;/script&gt; <mark>essay</mark>")
+        self.assertIn("<mark>essay</mark> &amp; sources", result["snippet"])
+        print("  ✅ Titles and snippets escaped")
+    
+    def test_title_matches_rank_first_and_operators_work(self):
+        """Title hits outrank body hits; OR and -term behave like websearch_to_tsquery"""
+        print("\n🧪 Search: Ranking and Operators")
+        
+        with Session(self.engine) as db:
+            titles = lambda query: [row["title"] for row in search(db, self.user_id, query)]
+            self.assertEqual(titles("mom"), ["Call mom", "Buy flowers"])
+            self.assertEqual(titles("mom OR"), ["Call mom", "Buy flowers"])
+            self.assertEqual(sorted(titles("flowers OR dad")), ["Buy flowers", "Call dad"])
+            self.assertEqual(titles("call -dad"), ["Call mom"])
+            self.assertEqual(titles('"call mom"'), ["Call mom"])
+        self.assertEqual(_fts5_query("-dad"), "")
+        print("  ✅ Ranked and parsed like Postgres")
+
+class TestDuplicateDetection(unittest.TestCase):
+    """Embedding-based duplicate detection for new tasks"""
+    
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        with Session(self.engine) as db:
+            user = User(email="duplicates@example.com", username="duplicates", hashed_password="x")
+            db.add(user)
+            db.flush()
+            task = Task(user_id=user.id, title="Call mom", embedding=embedding_bytes(hashed_embedding("Call mom", 64)))
+            db.add(task)
+            db.commit()
+            self.user_id, self.task_id = user.id, task.id
+    
+    def test_matches_existing_tasks_and_earlier_batch_items(self):
+        """Repeats point at the stored task or the earlier item of the same batch"""
+        print("\n🧪 Duplicate Detection: Existing and In-Batch Matches")
+        
+        vectors = [hashed_embedding(title, 64) for title in ("call mom", "Buy milk", "Renew passport", "buy milk")]
+        with Session(self.engine) as db:
+            matches = find_duplicates(db, self.user_id, vectors, 0.85)
+        self.assertEqual(matches, [("task", self.task_id), None, None, ("batch", 1)])
+        print("  ✅ Duplicates found in the table and in the batch")
+    
+    def test_index_cache_is_reused_and_bounded(self):
+        """An unchanged user reuses the cached index; the cache keeps only the most recent users"""
+        print("\n🧪 Duplicate Detection: Index Cache")
+        
+        with Session(self.engine) as db, patch.object(embeddings, "INDEX_CACHE_SIZE", 1):
+            first = embeddings.get_task_index(db, self.user_id, 64)
+            self.assertIs(embeddings.get_task_index(db, self.user_id, 64), first)
+            embeddings.get_task_index(db, self.user_id + 1, 64)
+            self.assertEqual(list(embeddings._indexes), [self.user_id + 1])
+            self.assertIsNot(embeddings.get_task_index(db, self.user_id, 64), first)
+        print("  ✅ Least recently used index evicted")
+
+class TestDocumentBlobs(unittest.TestCase):
+    """Content-addressed document storage shared between identical uploads"""
+    
+    def setUp(self):
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        self.upload_dir = upload_dir.name
+        settings_patch = patch.object(settings, "upload_dir", self.upload_dir)
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        with Session(self.engine) as db:
+            user = User(email="blobs@example.com", username="blobs", hashed_password="x")
+            db.add(user)
+            db.commit()
+            self.user_id = user.id
+    
+    def _upload(self, db, content=b"syllabus"):
+        temp_path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}.part")
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        blob = acquire_blob(db, "ab" * 32, temp_path, len(content), ".txt")
+        self.assertFalse(os.path.exists(temp_path))
+        return blob
+    
+    def test_identical_uploads_share_a_blob_until_the_last_release(self):
+        """The second upload only counts a reference; the file goes once the last one is released and committed"""
+        print("\n🧪 Document Blobs: Reference Counting")
+        
+        with Session(self.engine) as db:
+            first = self._upload(db)
+            db.commit()
+            second = self._upload(db)
+            db.commit()
+            self.assertEqual(second.file_path, first.file_path)
+            self.assertEqual(db.query(DocumentBlob).count(), 1)
+            self.assertEqual(db.query(DocumentBlob.ref_count).scalar(), 2)
+            
+            self.assertIsNone(release_blob(db, "ab" * 32))
+            db.commit()
+            self.assertTrue(os.path.exists(first.file_path))
+            
+            orphaned = release_blob(db, "ab" * 32)
+            self.assertEqual(orphaned, first.file_path)
+            db.rollback()
+            # A rolled back delete keeps both the row and the file
+            self.assertEqual(db.query(DocumentBlob.ref_count).scalar(), 1)
+            self.assertTrue(os.path.exists(first.file_path))
+            
+            orphaned = release_blob(db, "ab" * 32)
+            db.commit()
+            remove_blob_file(db, "ab" * 32, orphaned)
+            self.assertEqual(db.query(DocumentBlob).count(), 0)
+            self.assertFalse(os.path.exists(orphaned))
+        print("  ✅ One file per content, deleted after the last reference")
+    
+    def test_reupload_before_file_removal_keeps_the_file(self):
+        """A blob recreated between the releasing commit and the file removal keeps its file"""
+        print("\n🧪 Document Blobs: Re-upload Race")
+        
+        with Session(self.engine) as db:
+            self._upload(db)
+            db.commit()
+            orphaned = release_blob(db, "ab" * 32)
+            db.commit()
+            self._upload(db)
+            db.commit()
+            remove_blob_file(db, "ab" * 32, orphaned)
+            self.assertTrue(os.path.exists(orphaned))
+        print("  ✅ Recreated blob keeps its file")
+    
+    def test_stale_processing_claim_is_taken_over(self):
+        """A claim inside its lease is left alone; one past it belongs to a dead worker and is re-run"""
+        print("\n🧪 Document Blobs: Claim Lease")
+        
+        with Session(self.engine) as db:
+            blob = self._upload(db)
+            blob.processing_status = "processing"
+            blob.claimed_at = datetime.utcnow() - timedelta(seconds=60)
+            document = Document(
+                user_id=self.user_id, filename="a.txt", file_path=blob.file_path,
+                content_hash=blob.content_hash, processing_status="processing"
+            )
+            db.add(document)
+            db.commit()
+            document_id = document.id
+        
+        extract = AsyncMock(return_value=("syllabus", [{"title": "Read chapter 1"}]))
+        with patch("app.services.document_service.SessionLocal", sessionmaker(bind=self.engine)), \
+                patch("app.services.document_service.extract_document", extract):
+            process_document(document_id)
+            extract.assert_not_called()
+            
+            with Session(self.engine) as db:
+                db.query(DocumentBlob).update({DocumentBlob.claimed_at: datetime.utcnow() - timedelta(hours=1)})
+                db.commit()
+            with patch.object(settings, "document_lease_seconds", 900.0):
+                process_document(document_id)
+            extract.assert_called_once()
+        
+        with Session(self.engine) as db:
+            document = db.get(Document, document_id)
+            self.assertEqual((document.processing_status, document.extracted_tasks), ("completed", [{"title": "Read chapter 1"}]))
+        print("  ✅ Abandoned claim re-run and results shared")
+
+class TestPageCache(unittest.TestCase):
+    """Per-page PDF text cache keyed by content fingerprints"""
+    
+    def setUp(self):
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        self.upload_dir = upload_dir.name
+        settings_patch = patch.multiple(settings, upload_dir=self.upload_dir, page_cache_dir=None)
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+    
+    def _pdf(self, cmap=b"cmap-a", form=b"BT /F1 12 Tf 10 10 Td (form) Tj ET", padding=0):
+        """A one-page PDF drawing text directly and through a Form XObject with a ToUnicode font"""
+        def stream(data, **entries):
+            obj = DecodedStreamObject()
+            obj.set_data(data)
+            obj.update({NameObject(key): value for key, value in entries.items()})
+            return obj
+        
+        writer = PdfWriter()
+        writer.add_blank_page(200, 200)
+        for _ in range(padding):
+            writer._add_object(stream(b"unused"))  # shifts the object numbers of everything below
+        font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"), NameObject("/ToUnicode"): writer._add_object(stream(cmap)),
+        })
+        fonts = DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+        form_xobject = stream(
+            form, **{"/Type": NameObject("/XObject"), "/Subtype": NameObject("/Form"),
+                     "/BBox": ArrayObject([NumberObject(0)] * 4), "/Resources": DictionaryObject({NameObject("/Font"): fonts})}
+        )
+        page = writer.pages[0]
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): fonts,
+            NameObject("/XObject"): DictionaryObject({NameObject("/X1"): writer._add_object(form_xobject)}),
+        })
+        page[NameObject("/Contents")] = writer._add_object(stream(b"BT /F1 12 Tf 10 50 Td (page) Tj ET /X1 Do"))
+        out = io.BytesIO()
+        writer.write(out)
+        return out.getvalue()
+    
+    def _fingerprint(self, pdf: bytes) -> str:
+        return document_service._pdf_page_fingerprint(PdfReader(io.BytesIO(pdf)).pages[0])
+    
+    def test_fingerprint_covers_to_unicode_maps_and_forms(self):
+        """Same page text, same fingerprint; a different ToUnicode map or form content, a different one"""
+        print("\n🧪 Page Cache: Fingerprints")
+        
+        base = self._fingerprint(self._pdf())
+        self.assertEqual(self._fingerprint(self._pdf(padding=3)), base)
+        self.assertNotEqual(self._fingerprint(self._pdf(cmap=b"cmap-b")), base)
+        self.assertNotEqual(self._fingerprint(self._pdf(form=b"BT /F1 12 Tf 10 10 Td (other) Tj ET")), base)
+        print("  ✅ Resolved fonts and form XObjects are part of the fingerprint")
+    
+    def test_cached_pages_are_reused_and_least_recently_used_pruned(self):
+        """A second pass reads the cache; past page_cache_max_mb the oldest pages go first"""
+        print("\n🧪 Page Cache: Reuse and Pruning")
+        
+        path = os.path.join(self.upload_dir, "a.pdf")
+        with open(path, "wb") as f:
+            f.write(self._pdf())
+        first = list(document_service.iter_pdf_pages(path))
+        self.assertIn("page", first[0])
+        with patch("PyPDF2._page.PageObject.extract_text", side_effect=AssertionError("extracted again")):
+            self.assertEqual(list(document_service.iter_pdf_pages(path)), first)
+        
+        for number, fingerprint in enumerate(["11" * 32, "22" * 32, "33" * 32]):
+            document_service._write_cached_page(fingerprint, "x" * 100)
+            os.utime(document_service._page_cache_path(fingerprint), (number, number))
+        document_service._read_cached_page("11" * 32)  # used again, so no longer the oldest
+        with patch.object(settings, "page_cache_max_mb", 250 / (1024 * 1024)):
+            document_service._prune_page_cache()
+        self.assertIsNotNone(document_service._read_cached_page("11" * 32))
+        self.assertIsNone(document_service._read_cached_page("22" * 32))
+        print("  ✅ Cache hit on the second pass, oldest pages pruned")
+
+class TestDocumentUpload(unittest.TestCase):
+    """Streaming raw-body document uploads"""
+    
+    def setUp(self):
+        upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_dir.cleanup)
+        self.upload_dir = upload_dir.name
+        settings_patch = patch.multiple(settings, upload_dir=self.upload_dir, max_file_size=100, upload_chunk_size=16)
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+        enqueue_patch = patch("app.api.v1.endpoints.documents.enqueue_document")
+        self.enqueue = enqueue_patch.start()
+        self.addCleanup(enqueue_patch.stop)
+        
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        make_session = sessionmaker(bind=engine)
+        with make_session() as db:
+            user = User(email="uploads@example.com", username="uploads", hashed_password="x")
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            db.expunge(user)
+        
+        def session():
+            db = make_session()
+            try:
+                yield db
+            finally:
+                db.close()
+        
+        app = FastAPI()
+        app.include_router(documents_endpoint.router, prefix="/documents")
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_db] = session
+        self.client = TestClient(app)
+    
+    def _leftovers(self):
+        incoming = os.path.join(self.upload_dir, ".incoming")
+        return os.listdir(incoming) if os.path.isdir(incoming) else []
+    
+    def test_upload_is_stored_in_blocks_and_queued(self):
+        """A body arriving in small pieces is stored intact and handed to the worker"""
+        print("\n🧪 Document Upload: Streamed Body")
+        
+        body = [b"Week 1: read chapter 1\n", b"Week 2: essay due\n", b"Week 3: quiz\n"]
+        response = self.client.post("/documents/upload", params={"filename": "syllabus.txt"}, content=iter(body))
+        self.assertEqual(response.status_code, 202)
+        stored = document_service.blob_path(hashlib.sha256(b"".join(body)).hexdigest(), ".txt")
+        with open(stored, "rb") as f:
+            self.assertEqual(f.read(), b"".join(body))
+        self.enqueue.assert_called_once_with(response.json()["id"])
+        self.assertEqual(self._leftovers(), [])
+        print("  ✅ File stored and queued")
+    
+    def test_oversized_disallowed_and_empty_bodies_are_refused(self):
+        """413 from Content-Length or mid-stream, 415 for unsupported types, 400 for empty bodies; nothing is kept"""
+        print("\n🧪 Document Upload: Refused Bodies")
+        
+        upload = lambda filename, content: self.client.post(
+            "/documents/upload", params={"filename": filename}, content=content
+        )
+        self.assertEqual(upload("big.txt", b"x" * 101).status_code, 413)
+        self.assertEqual(upload("big.txt", iter([b"x" * 60, b"x" * 60])).status_code, 413)
+        self.assertEqual(upload("script.exe", b"MZ").status_code, 415)
+        self.assertEqual(upload("empty.txt", b"").status_code, 400)
+        self.assertEqual(self._leftovers(), [])
+        self.enqueue.assert_not_called()
+        print("  ✅ Bad uploads refused and their partial files removed")
+
+class TestTags(unittest.TestCase):
+    """Normalized task tags: merging, filtering, counting and backfill"""
+    
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        with Session(self.engine) as db:
+            users = [User(email=f"tags{n}@example.com", username=f"tags{n}", hashed_password="x") for n in range(2)]
+            db.add_all(users)
+            db.flush()
+            self.user_id, self.other_id = users[0].id, users[1].id
+            specs = [
+                (self.user_id, ["Work", "urgent"], "pending"),
+                (self.user_id, ["work"], "completed"),
+                (self.user_id, ["home", "Urgent"], "pending"),
+                (self.other_id, ["work"], "pending"),
+            ]
+            tasks = [Task(user_id=user_id, title=f"Task {n}", tags=tags, status=status) for n, (user_id, tags, status) in enumerate(specs)]
+            for task in tasks:
+                sync_task_tags(task)
+            db.add_all(tasks)
+            db.commit()
+            self.task_ids = [task.id for task in tasks]
+    
+    def test_merge_keeps_first_spelling_and_order(self):
+        """Merged tags keep their order and gain only tags not already present in any spelling"""
+        print("\n🧪 Tags: Merge")
+        
+        self.assertEqual(merge_tags(["Work", "urgent"], ["work", "Home", "home", " URGENT ", ""]), ["Work", "urgent", "Home"])
+        self.assertEqual(merge_tags(None, ["a", "A"]), ["a"])
+        print("  ✅ No duplicate tags after a merge")
+    
+    def test_filter_requires_every_tag_and_counts_follow_status(self):
+        """Filters match case-insensitively and need every tag; counts stay within the user"""
+        print("\n🧪 Tags: Filters and Counts")
+        
+        with Session(self.engine) as db:
+            user_tasks = db.query(Task.id).filter(Task.user_id == self.user_id)
+            self.assertEqual(sorted(id for id, in filter_by_tags(user_tasks, self.user_id, ["WORK"])), self.task_ids[:2])
+            self.assertEqual([id for id, in filter_by_tags(user_tasks, self.user_id, ["work", "urgent"])], [self.task_ids[0]])
+            self.assertEqual(
+                tag_counts(db, self.user_id),
+                [{"tag": "urgent", "count": 2}, {"tag": "work", "count": 2}, {"tag": "home", "count": 1}]
+            )
+            self.assertEqual(
+                tag_counts(db, self.user_id, status="completed"), [{"tag": "work", "count": 1}]
+            )
+        print("  ✅ Tag filters and counts")
+    
+    def test_backfill_fills_an_empty_tag_table_once(self):
+        """Tasks written before task_tags existed get their rows on the first startup only"""
+        print("\n🧪 Tags: Backfill")
+        
+        with Session(self.engine) as db:
+            db.query(TaskTag).delete()
+            db.commit()
+        backfill_task_tags(self.engine)
+        with Session(self.engine) as db:
+            self.assertEqual(db.query(TaskTag).count(), 6)
+            self.assertEqual(tag_counts(db, self.other_id), [{"tag": "work", "count": 1}])
+            db.query(TaskTag).filter(TaskTag.user_id == self.other_id).delete()
+            db.commit()
+        backfill_task_tags(self.engine)
+        with Session(self.engine) as db:
+            self.assertEqual(db.query(TaskTag).count(), 5)
+        print("  ✅ Tag rows backfilled from Task.tags")
+
+class TestMoodAnalytics(unittest.TestCase):
+    """Incremental mood rollups and the statistics read from them"""
+    
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = Session(self.engine)
+        self.addCleanup(self.db.close)
+        user = User(email="mood@example.com", username="mood", hashed_password="x")
+        self.db.add(user)
+        self.db.commit()
+        self.user_id = user.id
+    
+    def _record(self, at, mood, energy, stress=None, tz=timezone.utc):
+        entry = MoodEntry(user_id=self.user_id, mood_level=mood, energy_level=energy, stress_level=stress, created_at=at)
+        self.db.add(entry)
+        self.db.flush()
+        record_entry(self.db, entry, tz)
+        self.db.commit()
+        return entry
+    
+    def _rollup(self, period, period_start):
+        return self.db.query(MoodRollup).filter(
+            MoodRollup.user_id == self.user_id, MoodRollup.period == period, MoodRollup.period_start == period_start
+        ).first()
+    
+    def test_record_entry_folds_into_local_day_and_week(self):
+        """Entries land in the user's local day and week, with sums, extremes and optional stress counted"""
+        print("\n🧪 Mood Analytics: Recording Entries")
+        
+        new_york = ZoneInfo("America/New_York")
+        self._record(datetime(2024, 5, 1, 15, tzinfo=timezone.utc), 4, 6, stress=7, tz=new_york)
+        self._record(datetime(2024, 5, 2, 2, tzinfo=timezone.utc), 8, 2, tz=new_york)  # 22:00 on May 1 in New York
+        
+        for period, period_start in (("day", date(2024, 5, 1)), ("week", date(2024, 4, 29))):
+            rollup = self._rollup(period, period_start)
+            self.assertEqual(
+                (rollup.entry_count, rollup.mood_sum, rollup.mood_min, rollup.mood_max, rollup.stress_count, rollup.stress_sum),
+                (2, 12, 4, 8, 1, 7)
+            )
+        self.assertIsNone(self._rollup("day", date(2024, 5, 2)))
+        trend = mood_trends(self.db, self.user_id, "day", date(2024, 5, 1), date(2024, 5, 1))[0]
+        self.assertEqual((trend["mood"]["mean"], trend["energy"]["min"], trend["stress"]["mean"]), (6.0, 2, 7.0))
+        print("  ✅ Day and week rollups updated in the local timezone")
+    
+    def test_rebuild_after_delete_recomputes_extremes(self):
+        """Deleting an entry recomputes its buckets from what is left, and drops emptied ones"""
+        print("\n🧪 Mood Analytics: Rebuilding After Deletes")
+        
+        low = self._record(datetime(2024, 5, 1, 9, tzinfo=timezone.utc), 2, 3)
+        high = self._record(datetime(2024, 5, 1, 18, tzinfo=timezone.utc), 9, 8)
+        for entry in (low, high):
+            created_at = entry.created_at
+            self.db.delete(entry)
+            self.db.flush()
+            rebuild_rollups(self.db, self.user_id, created_at, timezone.utc)
+            self.db.commit()
+            if entry is low:
+                rollup = self._rollup("day", date(2024, 5, 1))
+                self.assertEqual((rollup.entry_count, rollup.mood_sum, rollup.mood_min, rollup.mood_max), (1, 9, 9, 9))
+        self.assertEqual(self.db.query(MoodRollup).count(), 0)
+        print("  ✅ Minimum and maximum restored, empty buckets removed")
+    
+    def test_rolling_averages_weight_days_by_entry_count(self):
+        """A trailing window averages its entries, not its days, and slides day by day"""
+        print("\n🧪 Mood Analytics: Rolling Averages")
+        
+        self._record(datetime(2024, 5, 1, 9, tzinfo=timezone.utc), 2, 2)
+        self._record(datetime(2024, 5, 1, 20, tzinfo=timezone.utc), 4, 4)
+        self._record(datetime(2024, 5, 3, 12, tzinfo=timezone.utc), 9, 9, stress=5)
+        
+        averages = rolling_averages(self.db, self.user_id, 3, date(2024, 5, 1), date(2024, 5, 4))
+        self.assertEqual(
+            [(day["date"].day, day["count"], day["mood"], day["stress"]) for day in averages],
+            [(1, 2, 3.0, None), (2, 2, 3.0, None), (3, 3, 5.0, 5.0), (4, 1, 9.0, 5.0)]
+        )
+        print("  ✅ Entry-weighted trailing averages")
+
+class TestInsights(unittest.TestCase):
+    """Mood and productivity correlations and their per-user cache"""
+    
+    def setUp(self):
+        cache_patch = patch.object(insights, "_cache", OrderedDict())
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = Session(self.engine)
+        self.addCleanup(self.db.close)
+        user = User(email="insights@example.com", username="insights", hashed_password="x")
+        self.db.add(user)
+        self.db.flush()
+        self.user_id = user.id
+        
+        # Four completions three hours apart; the better the mood logged an hour before,
+        # the earlier against the due date and the closer to the estimate the task finished
+        base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+        for i, mood in enumerate([2, 4, 6, 8]):
+            completed_at = base + timedelta(hours=3 * i)
+            task = Task(
+                user_id=self.user_id, title=f"Task {i}", status="completed", completed_at=completed_at,
+                due_date=completed_at - timedelta(hours=3 - i), estimated_duration=60, actual_duration=120 - 30 * i
+            )
+            self.db.add(task)
+            self.db.flush()
+            self.db.add_all([
+                TaskCheckIn(task_id=task.id, mood_at_checkin=mood - 1, energy_at_checkin=5),
+                TaskCheckIn(task_id=task.id, mood_at_checkin=mood + 1, energy_at_checkin=5),
+                MoodEntry(user_id=self.user_id, mood_level=mood, energy_level=5, created_at=completed_at - timedelta(hours=1)),
+            ])
+        self.db.commit()
+    
+    def test_correlations_from_a_known_dataset(self):
+        """Mood before completion and check-in mood both track lateness and overruns exactly"""
+        print("\n🧪 Insights: Correlations")
+        
+        result = insights.compute_insights(self.db, self.user_id, 30, timezone.utc)
+        self.assertEqual((result["completed_tasks"], result["on_time_rate"], result["median_duration_ratio"]), (4, 0.25, 1.25))
+        by_pair = {(c["feature"], c["outcome"]): (c["r"], c["samples"]) for c in result["correlations"]}
+        for feature in ("mood", "checkin_mood"):
+            self.assertEqual(by_pair[(feature, "lateness_hours")], (-1.0, 4))
+            self.assertEqual(by_pair[(feature, "duration_ratio")], (-1.0, 4))
+        # Constant energy cannot correlate with anything
+        self.assertFalse([pair for pair in by_pair if pair[0] in ("energy", "checkin_energy")])
+        self.assertEqual(abs(result["correlations"][0]["r"]), 1.0)
+        self.assertEqual(sum(row["completed"] for row in result["by_hour"]), 4)
+        self.assertEqual(sum(row["completed"] for row in result["by_weekday"]), 4)
+        print("  ✅ Correlations, rates and breakdowns match the dataset")
+    
+    def test_cache_is_reused_until_the_data_changes(self):
+        """Unchanged data is served from the cache; a new mood entry or check-in recomputes"""
+        print("\n🧪 Insights: Cache Invalidation")
+        
+        first = insights.get_insights(self.db, self.user_id, 30, timezone.utc)
+        self.assertIs(insights.get_insights(self.db, self.user_id, 30, timezone.utc), first)
+        
+        self.db.add(MoodEntry(user_id=self.user_id, mood_level=3, energy_level=3, created_at=datetime.now(timezone.utc)))
+        self.db.commit()
+        second = insights.get_insights(self.db, self.user_id, 30, timezone.utc)
+        self.assertIsNot(second, first)
+        
+        task_id = self.db.query(Task.id).first()[0]
+        self.db.add(TaskCheckIn(task_id=task_id, mood_at_checkin=10, energy_at_checkin=1))
+        self.db.commit()
+        third = insights.get_insights(self.db, self.user_id, 30, timezone.utc)
+        self.assertIsNot(third, second)
+        self.assertIsNot(insights.get_insights(self.db, self.user_id, 7, timezone.utc), third)
+        print("  ✅ Cached until tasks, check-ins or mood entries change")
+
+class TestEventBroker(unittest.TestCase):
+    """In-process fan-out of push events to open streams"""
+    
+    def setUp(self):
+        redis_patch = patch("app.services.events.get_redis", return_value=None)
+        redis_patch.start()
+        self.addCleanup(redis_patch.stop)
+        self.broker = events.EventBroker()
+        broker_patch = patch.object(events, "broker", self.broker)
+        broker_patch.start()
+        self.addCleanup(broker_patch.stop)
+    
+    @staticmethod
+    def _drain(queue):
+        items = []
+        while not queue.empty():
+            items.append(json.loads(queue.get_nowait()))
+        return items
+    
+    def test_publish_fans_out_per_user_from_any_thread(self):
+        """Every stream of a user gets each event, other users' streams get none, worker threads included"""
+        print("\n🧪 Event Broker: Publish Fan-out")
+        
+        async def run():
+            phone, laptop = self.broker.subscribe(1), self.broker.subscribe(1)
+            other = self.broker.subscribe(2)
+            events.publish([{"user_id": 1, "type": "task.created", "task": {"id": 7}}, {"user_id": 3, "type": "task.deleted"}])
+            await asyncio.to_thread(events.publish, [{"user_id": 2, "type": "reminder"}])
+            await asyncio.sleep(0)  # let the cross-thread delivery run
+            received = [self._drain(queue) for queue in (phone, laptop, other)]
+            self.broker.unsubscribe(1, phone)
+            self.broker.unsubscribe(1, laptop)
+            self.broker.unsubscribe(2, other)
+            return received
+        
+        phone, laptop, other = asyncio.run(run())
+        self.assertEqual(phone, [{"user_id": 1, "type": "task.created", "task": {"id": 7}}])
+        self.assertEqual(laptop, phone)
+        self.assertEqual(other, [{"user_id": 2, "type": "reminder"}])
+        self.assertFalse(self.broker.has_streams)
+        print("  ✅ Events reach exactly their user's streams")
+    
+    def test_full_queue_is_replaced_by_a_resync(self):
+        """A stream that falls a queue behind drops its backlog for one resync message, then carries on"""
+        print("\n🧪 Event Broker: Overflow and Resync")
+        
+        async def run():
+            with patch.object(events, "QUEUE_SIZE", 3):
+                slow, fast = self.broker.subscribe(1), self.broker.subscribe(1)
+            for n in range(3):
+                self.broker.deliver(1, json.dumps({"n": n}))
+            fast_backlog = self._drain(fast)
+            for n in range(3, 5):
+                self.broker.deliver(1, json.dumps({"n": n}))
+            return self._drain(slow), fast_backlog + self._drain(fast)
+        
+        slow, fast = asyncio.run(run())
+        self.assertEqual(slow, [{"type": "resync"}, {"n": 4}])
+        self.assertEqual(fast, [{"n": n} for n in range(5)])
+        print("  ✅ Overflowing stream told to resync, others unaffected")
+
+class TestInteractionLog(unittest.TestCase):
+    """Write-behind batching of AIInteraction rows"""
+    
+    def setUp(self):
+        self.batches = []
+        writer_patch = patch("app.services.ai_logging.write_interactions", side_effect=lambda rows: self.batches.append(rows))
+        self.writer = writer_patch.start()
+        self.addCleanup(writer_patch.stop)
+    
+    def test_full_batches_are_written_at_once_and_the_rest_on_flush(self):
+        """batch_size rows go out together without waiting; a partial batch waits for flush()"""
+        print("\n🧪 Interaction Log: Batch Flush")
+        
+        log = InteractionLog(batch_size=3, flush_seconds=60, max_pending=100)
+        
+        async def run():
+            interaction_user_id.set(5)
+            for n in range(4):
+                log.record(interaction_type="voice_command", n=n)
+            await asyncio.sleep(0.1)  # the writer thread, well short of flush_seconds
+            written_before_flush = [len(batch) for batch in self.batches]
+            await log.flush()
+            return written_before_flush
+        
+        self.assertEqual(asyncio.run(run()), [3])
+        self.assertEqual([[row["n"] for row in batch] for batch in self.batches], [[0, 1, 2], [3]])
+        self.assertTrue(all(row["user_id"] == 5 for batch in self.batches for row in batch))
+        print("  ✅ Full batch written immediately, remainder on flush")
+    
+    def test_partial_batch_is_written_after_the_interval(self):
+        """A lone row is written flush_seconds after it arrived"""
+        print("\n🧪 Interaction Log: Interval Flush")
+        
+        log = InteractionLog(batch_size=100, flush_seconds=0.05, max_pending=100)
+        
+        async def run():
+            log.record(interaction_type="embedding", user_id=1)
+            log.record(interaction_type="embedding", user_id=1)
+            await asyncio.sleep(0.01)
+            early = len(self.batches)
+            await asyncio.sleep(0.2)
+            return early
+        
+        self.assertEqual(asyncio.run(run()), 0)
+        self.assertEqual([len(batch) for batch in self.batches], [2])
+        print("  ✅ Partial batch written on the timer")
+    
+    def test_rows_are_dropped_and_counted_when_full_or_failing(self):
+        """Rows beyond max_pending, and batches the database refuses, are counted as dropped"""
+        print("\n🧪 Interaction Log: Dropped Rows")
+        
+        log = InteractionLog(batch_size=100, flush_seconds=60, max_pending=2)
+        
+        async def run():
+            for _ in range(5):
+                log.record(interaction_type="voice_command", user_id=1)
+            self.writer.side_effect = RuntimeError("database is down")
+            await log.flush()
+        
+        asyncio.run(run())
+        self.assertEqual(log.dropped, 5)
+        print("  ✅ Overflow and failed writes counted")
+    
+    def test_a_new_event_loop_gets_a_fresh_queue(self):
+        """Each worker job runs its own loop; rows recorded on it are written by its own flush"""
+        print("\n🧪 Interaction Log: Loop Change")
+        
+        log = InteractionLog(batch_size=100, flush_seconds=60, max_pending=100)
+        
+        async def job(n):
+            log.record(interaction_type="document_extraction", user_id=1, n=n)
+            await log.flush()
+        
+        asyncio.run(job(1))
+        asyncio.run(job(2))
+        self.assertEqual([[row["n"] for row in batch] for batch in self.batches], [[1], [2]])
+        print("  ✅ Each loop writes its own rows")
+    
+    def test_write_skips_rows_without_a_user(self):
+        """Calls made outside any user's context are not stored; the rest go in one insert"""
+        print("\n🧪 Interaction Log: Writing Rows")
+        
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(email="ai-log@example.com", username="ai-log", hashed_password="x")
+            db.add(user)
+            db.commit()
+            user_id = user.id
+        rows = [
+            {"user_id": user_id, "interaction_type": "voice_command", "model": "llama3.2", "latency_ms": 12.5, "used_fallback": False},
+            {"user_id": None, "interaction_type": "embedding", "model": "nomic-embed-text", "latency_ms": 3.0, "used_fallback": True},
+        ]
+        with patch("app.services.ai_logging.SessionLocal", sessionmaker(bind=engine)):
+            write_interactions(rows)
+        with Session(engine) as db:
+            self.assertEqual(db.query(AIInteraction.interaction_type, AIInteraction.latency_ms).all(), [("voice_command", 12.5)])
+        print("  ✅ Rows without a user skipped")
+
+class TestUserTimezoneScheduling(unittest.TestCase):
+    """Incremental scheduling on the user's wall clock, stored as UTC"""
+    
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.preferences = {"timezone": "Asia/Tokyo", "work_hours_start": "09:00", "work_hours_end": "17:00"}
+        with Session(self.engine) as db:
+            user = User(email="tokyo@example.com", username="tokyo", hashed_password="x", preferences=self.preferences)
+            db.add(user)
+            db.commit()
+            self.user_id = user.id
+        # 08:00 on 2026-10-20 in Tokyo, still the 19th in UTC
+        self.now = datetime(2026, 10, 19, 23, 0, tzinfo=timezone.utc)
+    
+    def _place(self, db, title, duration):
+        task = Task(user_id=self.user_id, title=title, status="pending", priority=3, estimated_duration=duration)
+        db.add(task)
+        db.flush()
+        place_new_task(db, task, self.preferences, now=self.now)
+        db.commit()
+        return task
+    
+    def test_new_tasks_land_in_local_work_hours(self):
+        """A Tokyo user's first slot is 09:00 Tokyo, stored as midnight UTC, and later tasks queue behind it"""
+        print("\n🧪 User Timezone: Placement")
+        
+        with Session(self.engine) as db:
+            first = self._place(db, "Standup notes", 60)
+            second = self._place(db, "Inbox", 30)
+            db.expire_all()
+            self.assertEqual(as_utc(first.ai_suggested_time), datetime(2026, 10, 20, 0, 0, tzinfo=timezone.utc))
+            self.assertEqual(as_utc(second.ai_suggested_time), datetime(2026, 10, 20, 1, 0, tzinfo=timezone.utc))
+            self.assertEqual(as_utc(second.ai_suggested_time).astimezone(ZoneInfo("Asia/Tokyo")).hour, 10)
+        print("  ✅ Slots follow the user's work hours")
+    
+    def test_repair_and_persist_store_utc(self):
+        """Repairs read stored UTC slots back on the local day; persisted AI slots are converted to UTC"""
+        print("\n🧪 User Timezone: Repair and Persist")
+        
+        with Session(self.engine) as db:
+            first = self._place(db, "Standup notes", 60)
+            second = self._place(db, "Inbox", 30)
+            old_start = first.ai_suggested_time
+            first.estimated_duration = 90
+            changed = repair_schedule(db, first, old_start, 60, self.preferences, now=self.now)
+            db.commit()
+            db.expire_all()
+            self.assertEqual([task.id for task in changed], [second.id])
+            self.assertEqual(as_utc(second.ai_suggested_time), datetime(2026, 10, 20, 1, 30, tzinfo=timezone.utc))
+            
+            persist_schedule([second], [{"task_id": second.id, "suggested_time": "2026-10-20T14:00:00"}], ZoneInfo("Asia/Tokyo"))
+            db.commit()
+            db.expire_all()
+            self.assertEqual(as_utc(second.ai_suggested_time), datetime(2026, 10, 20, 5, 0, tzinfo=timezone.utc))
+        print("  ✅ Stored slots are UTC")
+
+class TestRecurringSchedule(unittest.TestCase):
+    """Recurring occurrences keep their own slot when the schedule is optimized"""
+    
+    def test_occurrences_stay_on_their_day_and_time(self):
+        """Each virtual occurrence is scheduled at its start and other work is planned around it"""
+        print("\n🧪 Recurring Schedule: Fixed Occurrences")
+        
+        tokyo = ZoneInfo("Asia/Tokyo")
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(
+                email="gym@example.com", username="gym", hashed_password="x",
+                preferences={"timezone": "Asia/Tokyo", "work_hours_start": "09:00", "work_hours_end": "17:00"}
+            )
+            db.add(user)
+            db.flush()
+            anchor = (datetime.now(tokyo) - timedelta(days=3)).replace(hour=12, minute=0, second=0, microsecond=0)
+            db.add_all([
+                Task(
+                    user_id=user.id, title="Gym", status="pending", priority=2, estimated_duration=60,
+                    due_date=anchor.astimezone(timezone.utc), recurrence={"freq": "daily", "interval": 1}
+                ),
+                Task(user_id=user.id, title="Quarterly report", status="pending", priority=5, estimated_duration=240),
+            ])
+            db.commit()
+            user_id = user.id
+        
+        with patch.object(tasks_endpoint, "SessionLocal", sessionmaker(bind=engine)), \
+                patch.object(tasks_endpoint.ai_service, "_generate", AsyncMock(return_value=None)):
+            result = asyncio.run(tasks_endpoint._optimized_schedule(user_id))
+        
+        occurrences = [item for item in result["optimized_schedule"] if isinstance(item["task_id"], str)]
+        self.assertGreaterEqual(len(occurrences), 6)
+        for item in occurrences:
+            start = datetime.fromisoformat(item["suggested_time"])
+            self.assertEqual(start, parse_occurrence_key(item["task_id"].split(":")[1]))
+            self.assertEqual((start.astimezone(tokyo).hour, start.astimezone(tokyo).minute), (12, 0))
+        
+        report = next(item for item in result["optimized_schedule"] if not isinstance(item["task_id"], str))
+        report_start = datetime.fromisoformat(report["suggested_time"])
+        report_end = report_start + timedelta(minutes=report["duration_minutes"])
+        for item in occurrences:
+            start = datetime.fromisoformat(item["suggested_time"])
+            self.assertTrue(report_end <= start or start + timedelta(minutes=60) <= report_start)
+        print("  ✅ Occurrences kept at their local start time")
+
+class TestTaskEndpoints(unittest.TestCase):
+    """Task endpoints against an in-memory database for a user in New York"""
+    
+    def setUp(self):
+        embedding_patch = patch.object(tasks_endpoint, "_store_embedding", AsyncMock())
+        self.store_embedding = embedding_patch.start()
+        self.addCleanup(embedding_patch.stop)
+        
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        make_session = sessionmaker(bind=engine)
+        with make_session() as db:
+            user = User(
+                email="calendar@example.com", username="calendar", hashed_password="x",
+                preferences={"timezone": "America/New_York"}
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            db.expunge(user)
+        self.make_session = make_session
+        self.user_id = user.id
+        
+        def session():
+            db = make_session()
+            try:
+                yield db
+            finally:
+                db.close()
+        
+        app = FastAPI()
+        app.include_router(tasks_endpoint.router, prefix="/tasks")
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_db] = session
+        self.client = TestClient(app)
+    
+    def test_days_are_local_and_include_occurrences(self):
+        """Naive due dates are New York time, UTC rows near midnight land on the local day, occurrences fill each day"""
+        print("\n🧪 Task Calendar: Local Days")
+        
+        create = lambda body: self.client.post("/tasks/", json=body)
+        # 02:00 in New York is 06:00 UTC; read back as 02:00 UTC it would slip to the evening before
+        self.assertEqual(create({"title": "Early flight", "due_date": "2026-10-21T02:00:00"}).status_code, 200)
+        # 03:30 UTC on the 21st is still the evening of the 20th in New York
+        self.assertEqual(create({"title": "Late call", "due_date": "2026-10-21T03:30:00Z"}).status_code, 200)
+        self.assertEqual(create({
+            "title": "Gym", "due_date": "2026-10-19T18:00:00", "recurrence": {"freq": "daily"}
+        }).status_code, 200)
+        
+        response = self.client.get("/tasks/calendar", params={"start": "2026-10-19", "end": "2026-10-21"})
+        self.assertEqual(response.status_code, 200)
+        days = {day["date"]: [task["title"] for task in day["tasks"]] for day in response.json()}
+        self.assertEqual(days, {
+            "2026-10-19": ["Gym"],
+            "2026-10-20": ["Gym", "Late call"],
+            "2026-10-21": ["Early flight", "Gym"],
+        })
+        
+        with self.make_session() as db:
+            stored = db.query(Task.due_date).filter(Task.title == "Early flight").scalar()
+        self.assertEqual(as_utc(stored), datetime(2026, 10, 21, 6, 0, tzinfo=timezone.utc))
+        print("  ✅ Tasks grouped by New York day, recurring occurrences included")
+    
+    def test_title_change_embeds_after_the_response(self):
+        """Renaming a task clears its embedding and leaves the new one to a background task"""
+        print("\n🧪 Task Endpoints: Rename")
+        
+        task_id = self.client.post("/tasks/", json={"title": "Draft essay"}).json()["id"]
+        with self.make_session() as db:
+            db.query(Task).filter(Task.id == task_id).update({Task.embedding: b"old"})
+            db.commit()
+        self.store_embedding.reset_mock()
+        
+        with patch.object(tasks_endpoint.ai_service, "embed_texts", AsyncMock()) as embed_texts:
+            response = self.client.put(f"/tasks/{task_id}", json={"title": "Final essay"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["title"], "Final essay")
+            embed_texts.assert_not_awaited()
+        self.store_embedding.assert_awaited_once_with(task_id, "Final essay")
+        with self.make_session() as db:
+            self.assertIsNone(db.get(Task, task_id).embedding)
+        
+        self.store_embedding.reset_mock()
+        self.client.put(f"/tasks/{task_id}", json={"priority": 4})
+        self.store_embedding.assert_not_awaited()
+        print("  ✅ Embedding refreshed in the background")
+    
+    def test_corrected_duration_replaces_its_sample(self):
+        """Only completing a task records a sample; correcting its duration later replaces that sample"""
+        print("\n🧪 Task Endpoints: Duration Correction")
+        
+        first, second = [
+            self.client.post("/tasks/", json={"title": title, "tags": ["writing"]}).json()["id"] for title in ("Outline", "Essay")
+        ]
+        self.client.put(f"/tasks/{first}", json={"status": "completed", "actual_duration": 30})
+        self.client.put(f"/tasks/{second}", json={"status": "completed", "actual_duration": 40})
+        self.client.put(f"/tasks/{second}", json={"actual_duration": 90})
+        self.client.put(f"/tasks/{second}", json={"priority": 3})
+        
+        with self.make_session() as db:
+            stats = {stat.tag: stat for stat in db.query(DurationStat)}
+            self.assertEqual(set(stats), {"*", "writing"})
+            for stat in stats.values():
+                self.assertEqual(stat.samples, 2)
+                self.assertAlmostEqual(stat.log_mean, (math.log(30) + math.log(90)) / 2)
+        print("  ✅ One sample per completed task")
+    
+    def test_voice_due_dates_are_stored_as_local_days(self):
+        """A spoken "tomorrow" becomes midnight in New York, both for new tasks and for a merged repeat"""
+        print("\n🧪 Task Endpoints: Voice Due Dates")
+        
+        existing = self.client.post("/tasks/", json={"title": "Buy groceries"}).json()["id"]
+        with self.make_session() as db:
+            db.get(Task, existing).embedding = embedding_bytes(hashed_embedding("Buy groceries", settings.embedding_dim))
+            db.commit()
+        context = "Timezone: America/New_York\nLocal Date/Time: October 19, 2026 at 10:00:00 PM"
+        with patch.object(tasks_endpoint, "SessionLocal", self.make_session), \
+                patch.object(tasks_endpoint.ai_service, "_generate", AsyncMock(return_value=None)), \
+                patch.object(tasks_endpoint.ai_service, "embed_texts", AsyncMock(
+                    side_effect=lambda texts: [hashed_embedding(text, settings.embedding_dim) for text in texts]
+                )):
+            created = asyncio.run(tasks_endpoint._voice_tasks(
+                self.user_id, VoiceTaskInput(voice_text="Call the dentist tomorrow", context=context)
+            ))
+            merged = asyncio.run(tasks_endpoint._voice_tasks(
+                self.user_id, VoiceTaskInput(voice_text="Buy groceries tomorrow", context=context)
+            ))
+        
+        self.assertEqual([task["id"] for task in merged], [existing])
+        midnight = datetime(2026, 10, 20, 4, 0, tzinfo=timezone.utc)
+        with self.make_session() as db:
+            for task_id in (created[0]["id"], existing):
+                self.assertEqual(as_utc(db.get(Task, task_id).due_date), midnight)
+        print("  ✅ Spoken dates stored as the user's day")
+
+class TestMetrics(unittest.TestCase):
+    """Prometheus metrics rendering"""
+    
+    def test_latency_histogram_renders_prometheus_buckets(self):
+        """Latency histograms export cumulative Prometheus buckets per label set"""
+        print("\n🧪 Metrics: Latency Histogram")
+        
+        histogram = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/api/v1/tasks/voice")
+        lines = histogram.render().splitlines()
+        self.assertIn('test_latency_seconds_bucket{route="/api/v1/tasks/voice",le="0.1"} 2', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/api/v1/tasks/voice",le="1"} 3', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/api/v1/tasks/voice",le="+Inf"} 4', lines)
+        self.assertIn('test_latency_seconds_count{route="/api/v1/tasks/voice"} 4', lines)
+        print("  ✅ Histogram buckets are cumulative")
+
+class TestQueryProfiler(unittest.TestCase):
+    """SQL query counting and N+1 detection"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(cls.engine)
+        with Session(cls.engine) as db:
+            user = User(email="profiler@example.com", username="profiler", hashed_password="x")
+            db.add(user)
+            db.flush()
+            db.add_all([Task(user_id=user.id, title=f"Task {i}") for i in range(6)])
+            db.commit()
+    
+    def test_lazy_loads_are_flagged(self):
+        """Loading check-ins task by task shows up as one repeated statement shape"""
+        print("\n🧪 Query Profiler: N+1 Detection")
+        
+        with Session(self.engine) as db, profile_queries() as profile:
+            for task in db.query(Task).all():
+                task.check_ins
+        self.assertEqual(profile.count, 7)
+        shape, count = profile.repeated()[0]
+        self.assertEqual(count, 6)
+        self.assertIn("task_check_ins", shape)
+        print("  ✅ Repeated lazy loads reported")
+    
+    @pytest.mark.query_budget(2)
+    def test_eager_loading_stays_within_budget(self):
+        """selectinload keeps the same work at two statements"""
+        print("\n🧪 Query Profiler: Query Budget")
+        
+        with Session(self.engine) as db:
+            tasks = db.query(Task).options(selectinload(Task.check_ins)).all()
+            self.assertEqual(sum(len(task.check_ins) for task in tasks), 0)
+        print("  ✅ Within the query budget")
+
+class TestTracing(unittest.TestCase):
+    """Request, SQL and Ollama tracing spans"""
+    
+    def test_trace_spans_nest_sql_under_request(self):
+        """SQL statements become child spans and a trace is exported when its root ends"""
+        print("\n🧪 Tracing: SQL Spans and traceparent")
+        
+        exported = []
+        tracing.register_exporter("test", exported.append)
+        engine = create_engine("sqlite://")
+        with patch.object(settings, "trace_exporter", "test"):
+            tracing.install_tracing()
+            try:
+                with tracing.span("POST /api/v1/tasks/voice", kind="server") as root:
+                    with tracing.span("ai.parse_voice_input"):
+                        headers = tracing.trace_headers()
+                    with engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+            finally:
+                settings.trace_exporter = "off"
+                tracing.install_tracing()
+        
+        self.assertEqual(len(exported), 1)
+        spans = {item.name: item for item in exported[0]}
+        self.assertEqual(spans["db.SELECT"].parent_id, root.span_id)
+        self.assertEqual(spans["db.SELECT"].attributes["db.statement"], "SELECT 1")
+        self.assertEqual(headers["traceparent"], f"00-{root.trace_id}-{spans['ai.parse_voice_input'].span_id}-01")
+        self.assertEqual(tracing.parse_traceparent(headers["traceparent"]), (root.trace_id, spans["ai.parse_voice_input"].span_id, True))
+        print("  ✅ Spans share one trace and propagate traceparent")
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Load benchmark result summaries"""
+    
+    def test_benchmark_summary_reports_percentiles(self):
+        """Benchmark results carry throughput and tail latency, compared only with like-for-like runs"""
+        print("\n🧪 Benchmarks: Result Summary")
+        
+        latencies = [i / 1000 for i in range(1, 101)]  # 1ms..100ms
+        result = summarize("task_list_polling", latencies, errors=2, wall_seconds=0.5, concurrency=4)
+        self.assertEqual(result["rps"], 200.0)
+        self.assertAlmostEqual(result["p50_ms"], 50.5)
+        self.assertAlmostEqual(result["p99_ms"], 99.01)
+        self.assertEqual(result["errors"], 2)
+        self.assertTrue(comparable(result, dict(result, rps=1.0)))
+        self.assertFalse(comparable(result, dict(result, concurrency=8)))
+        print("  ✅ Percentiles and throughput computed")
+
+class TestFallbackParsing(unittest.TestCase):
+    """AIService text processing without the model"""
+    
+    def test_fallback_parsing_handles_benchmark_corpus(self):
+        """Every utterance in the micro-benchmark corpus parses without the model"""
+        print("\n🧪 Fallback Parsing: Benchmark Corpus")
+        
+        ai_service = AIService()
+        for voice_text, context in voice_corpus(500):
+            result = ai_service._fallback_voice_parsing_with_context(voice_text, context)
+            self.assertTrue(result["tasks"])
+            self.assertTrue(all(task["title"] for task in result["tasks"]))
+        
+        # "next month" on the 31st lands on the last day of a shorter month
+        context = "Local Date/Time: January 31, 2024 at 09:00:00 AM\nTimezone: UTC"
+        self.assertEqual(ai_service._extract_date_from_text("renew passport next month", context), "2024-02-29")
+        print("  ✅ Corpus parsed without errors")
+
+class TestSerialization(unittest.TestCase):
+    """Column projection and orjson list responses"""
+    
+    def test_task_list_fast_path_matches_schema_output(self):
+        """Projected rows encoded without validation give the same JSON as the response_model path"""
+        print("\n🧪 Serialization: Task List Fast Path")
+        
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(email="serializer@example.com", username="serializer", hashed_password="x")
+            db.add(user)
+            db.flush()
+            db.add_all([
+                Task(user_id=user.id, title="Café \"review\"", tags=["work"], due_date=datetime(2024, 5, 1, 9, 30, 0, 123456)),
+                Task(user_id=user.id, title="Standup", recurrence={"freq": "weekly", "interval": 1, "byweekday": [0]}),
+            ])
+            db.commit()
+            
+            adapter = TypeAdapter(List[TaskSchema])
+            objects = db.query(Task).order_by(Task.id).all()
+            expected = JSONResponse(adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json"))
+            rows = db.query(*TASK_LIST_COLUMNS).order_by(Task.id).all()
+            actual = FastJSONResponse(_task_dicts(row_dicts(rows, TaskSchema, Task)))
+        self.assertEqual(actual.body, expected.body)
+        print("  ✅ Fast path output is byte-identical")
+
+class TestRateLimiting(unittest.TestCase):
+    """Per-user token buckets and fair Ollama slots"""
+    
+    def test_rate_limits_and_fair_queue(self):
+        """Token buckets refuse bursts with a retry time and Ollama slots rotate between users"""
+        print("\n🧪 Rate Limiting: Token Buckets and Fair Queue")
+        
+        buckets = MemoryTokenBuckets()
+        decisions = [buckets.take("voice:1", rate=0.5, burst=2) for _ in range(3)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        self.assertAlmostEqual(decisions[2].retry_after, 2.0, delta=0.1)
+        self.assertTrue(buckets.take("voice:2", rate=0.5, burst=2).allowed)
+        
+        async def run():
+            queue, order = FairQueue(1), []
+            async def call(user, n):
+                async with queue.slot(user):
+                    order.append(f"{user}{n}")
+                    await asyncio.sleep(0)
+            # User a floods the queue first; b's single call still runs second
+            await asyncio.gather(*[call("a", n) for n in range(3)], call("b", 0))
+            return order
+        self.assertEqual(asyncio.run(run()), ["a0", "a1", "b0", "a2"])
+        print("  ✅ Bursts refused and slots shared fairly")
+
+class TestIdempotency(unittest.TestCase):
+    """Idempotency-Key replay of stored responses"""
+    
+    def test_idempotency_keys(self):
+        """Repeated and concurrent requests with one Idempotency-Key run once and replay the first response"""
+        print("\n🧪 Idempotency: Replay and Concurrent Duplicates")
+        
+        key, payload, calls = str(uuid.uuid4()), VoiceTaskInput(voice_text="buy milk"), []
+        async def handler():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return JSONResponse([{"id": len(calls)}])
+        async def run():
+            return await asyncio.gather(*[idempotent(key, "voice", 1, payload, handler) for _ in range(3)])
+        responses = asyncio.run(run()) + asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({r.body for r in responses}, {b'[{"id":1}]'})
+        self.assertEqual(sum(r.headers.get("idempotent-replayed") == "true" for r in responses), 5)
+        
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(idempotent(key, "voice", 1, VoiceTaskInput(voice_text="buy eggs"), handler))
+        self.assertEqual(raised.exception.status_code, 422)
+        print("  ✅ Handler ran once for six requests")
+
+class TestJobMode(unittest.TestCase):
+    """202 job mode for slow AI endpoints"""
+    
+    def test_job_mode(self):
+        """Jobs answer 202 at once, then store the handler's result (or error) and announce it"""
+        print("\n🧪 Job Mode: Results and Failures")
+        
+        self.assertTrue(jobs.wants_job("wait=10, respond-async"))
+        self.assertFalse(jobs.wants_job(None))
+        
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            user = User(email="jobs@example.com", username="jobs", hashed_password="x")
+            db.add(user)
+            db.commit()
+            user_id = user.id
+        
+        self.addCleanup(jobs.HANDLERS.pop, "test-echo", None)
+        @jobs.job_handler("test-echo")
+        async def echo(user_id, payload):
+            if payload.get("fail"):
+                raise ValueError("model unavailable")
+            return {"user_id": user_id, "at": datetime(2024, 5, 1, 9, 30), **payload}
+        
+        async def run():
+            accepted = [await jobs.accept_job(user_id, "test-echo", payload) for payload in ({"n": 1}, {"fail": True})]
+            await jobs.wait_for_local_jobs(timeout=5)
+            return accepted
+        with patch("app.services.jobs.SessionLocal", sessionmaker(bind=engine)), \
+                patch("app.services.jobs.publish") as publish:
+            accepted = asyncio.run(run())
+        
+        self.assertEqual([r.status_code for r in accepted], [202, 202])
+        ok_id, failed_id = [json.loads(r.body)["id"] for r in accepted]
+        self.assertEqual(accepted[0].headers["location"], f"/api/v1/jobs/{ok_id}")
+        with Session(engine) as db:
+            ok, failed = db.get(Job, ok_id), db.get(Job, failed_id)
+            self.assertEqual((ok.status, ok.result), ("completed", {"user_id": user_id, "at": "2024-05-01T09:30:00", "n": 1}))
+            self.assertEqual((failed.status, failed.error), ("failed", "model unavailable"))
+        self.assertEqual(
+            sorted(call.args[0][0]["type"] for call in publish.call_args_list), ["job.completed", "job.failed"]
+        )
+        print("  ✅ Results and failures stored for polling")
+    
+    def test_lost_jobs_fail_and_unstarted_jobs_resume(self):
+        """At startup, jobs running past their lease fail and pending ones are queued again"""
+        print("\n🧪 Job Mode: Recovery After a Restart")
+        
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        now = datetime.utcnow()
+        with Session(engine) as db:
+            user = User(email="lost-jobs@example.com", username="lost-jobs", hashed_password="x")
+            db.add(user)
+            db.flush()
+            db.add_all([
+                Job(id="lost", user_id=user.id, kind="voice", status="running", started_at=now - timedelta(hours=1)),
+                Job(id="busy", user_id=user.id, kind="voice", status="running", started_at=now),
+                Job(id="queued", user_id=user.id, kind="voice", status="pending"),
+            ])
+            db.commit()
+        
+        with patch("app.services.jobs.SessionLocal", sessionmaker(bind=engine)), \
+                patch("app.services.jobs.publish") as publish, \
+                patch("app.services.jobs.enqueue_job") as enqueue, \
+                patch.object(settings, "job_lease_seconds", 600.0):
+            self.assertEqual(jobs.resume_jobs(), 1)
+        
+        enqueue.assert_called_once_with("queued")
+        self.assertEqual(publish.call_args.args[0][0]["job"]["id"], "lost")
+        with Session(engine) as db:
+            statuses = dict(db.query(Job.id, Job.status))
+            self.assertEqual(statuses, {"lost": "failed", "busy": "running", "queued": "pending"})
+            self.assertEqual(db.get(Job, "lost").error, jobs.LOST_JOB_ERROR)
+        print("  ✅ Lost job failed, unstarted job queued again")
+
 def run_comprehensive_tests():
     """Run all comprehensive tests"""
     print("🚀 LifeSync Application - Comprehensive Test Suite")
@@ -491,6 +1937,29 @@ def run_comprehensive_tests():
     # Add test classes
     suite.addTests(loader.loadTestsFromTestCase(TestLifeSyncApplication))
     suite.addTests(loader.loadTestsFromTestCase(TestLifeSyncFeatures))
+    suite.addTests(loader.loadTestsFromTestCase(TestSchedulingEngine))
+    suite.addTests(loader.loadTestsFromTestCase(TestSearch))
+    suite.addTests(loader.loadTestsFromTestCase(TestDuplicateDetection))
+    suite.addTests(loader.loadTestsFromTestCase(TestDocumentBlobs))
+    suite.addTests(loader.loadTestsFromTestCase(TestPageCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestDocumentUpload))
+    suite.addTests(loader.loadTestsFromTestCase(TestTags))
+    suite.addTests(loader.loadTestsFromTestCase(TestMoodAnalytics))
+    suite.addTests(loader.loadTestsFromTestCase(TestInsights))
+    suite.addTests(loader.loadTestsFromTestCase(TestEventBroker))
+    suite.addTests(loader.loadTestsFromTestCase(TestInteractionLog))
+    suite.addTests(loader.loadTestsFromTestCase(TestUserTimezoneScheduling))
+    suite.addTests(loader.loadTestsFromTestCase(TestRecurringSchedule))
+    suite.addTests(loader.loadTestsFromTestCase(TestTaskEndpoints))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryProfiler))
+    suite.addTests(loader.loadTestsFromTestCase(TestTracing))
+    suite.addTests(loader.loadTestsFromTestCase(TestBenchmarkSuite))
+    suite.addTests(loader.loadTestsFromTestCase(TestFallbackParsing))
+    suite.addTests(loader.loadTestsFromTestCase(TestSerialization))
+    suite.addTests(loader.loadTestsFromTestCase(TestRateLimiting))
+    suite.addTests(loader.loadTestsFromTestCase(TestIdempotency))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobMode))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)